@@ -0,0 +1,182 @@
+"""
+Campos parciales para las vistas de la API: ?fields= y ?omit=
+
+    GET /api/ventas/?fields=id,cliente_info,saldo_pendiente
+    GET /api/motos/modelos/?omit=inventario,descripcion
+
+La respuesta se limita a los campos pedidos y el queryset se poda en
+consecuencia: se descartan los select_related/prefetch_related que ningún
+campo usa y se cargan solo las columnas necesarias con .only().
+
+Las columnas se deducen del source de cada campo. Los campos calculados
+(SerializerMethodField, propiedades del modelo) declaran lo que leen en
+Meta.dependencias_campos del serializer; si alguno no lo declara, no se poda
+el queryset (solo la respuesta), para no provocar una consulta por fila. Los
+serializers que redefinen to_representation declaran en la clave '*' lo que
+ese método lee siempre, o tampoco se podan.
+"""
+import re
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch, QuerySet
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+PATRON_DISPLAY = re.compile(r'^get_(\w+)_display$')
+
+
+def leer_lista(valor):
+    """'a, b,,c' -> ['a', 'b', 'c']"""
+    return [nombre.strip() for nombre in (valor or '').split(',') if nombre.strip()]
+
+
+def serializer_de_fila(serializer):
+    """El serializer de cada elemento cuando se serializa con many=True"""
+    if isinstance(serializer, serializers.ListSerializer):
+        return serializer.child
+    return serializer
+
+
+def aplicar_campos(serializer, campos=(), omitidos=()):
+    """
+    Quita del serializer los campos no pedidos en campos o pedidos en omitidos.
+
+    Raises:
+        ValidationError: Si se nombra un campo que el serializer no tiene
+    """
+    disponibles = list(serializer.fields)
+    desconocidos = sorted((set(campos) | set(omitidos)) - set(disponibles))
+    if desconocidos:
+        raise ValidationError({
+            'fields': f"Campos inválidos: {', '.join(desconocidos)}. "
+                      f"Disponibles: {', '.join(disponibles)}"
+        })
+    for nombre in disponibles:
+        if (campos and nombre not in campos) or nombre in omitidos:
+            serializer.fields.pop(nombre)
+
+
+def dependencias_serializer(serializer, queryset):
+    """
+    Columnas y relaciones del modelo que leen los campos del serializer.
+
+    Returns:
+        tuple[set, set] | None: (columnas, relaciones), o None si algún campo
+        lee algo que no se puede deducir
+    """
+    opciones = queryset.model._meta
+    declaradas = getattr(getattr(serializer, 'Meta', None), 'dependencias_campos', {})
+    accesores = {relacion.get_accessor_name(): relacion for relacion in opciones.related_objects}
+    columnas, relaciones = set(), set()
+    extra = declaradas.get('*')
+    if extra is None and type(serializer).to_representation is not serializers.Serializer.to_representation:
+        return None
+
+    def agregar(atributo, cargar_relacion=True):
+        coincidencia = PATRON_DISPLAY.match(atributo)
+        if coincidencia:
+            atributo = coincidencia.group(1)
+        if atributo in queryset.query.annotations:
+            return True
+        if atributo in accesores:
+            relaciones.add(atributo)
+            return True
+        try:
+            campo = opciones.get_field(atributo)
+        except FieldDoesNotExist:
+            return False
+        if campo.many_to_many or campo.one_to_many or not campo.concrete:
+            relaciones.add(atributo)
+        else:
+            columnas.add(campo.name)
+            if campo.is_relation and cargar_relacion:
+                relaciones.add(campo.name)
+        return True
+
+    if not all(agregar(atributo) for atributo in extra or []):
+        return None
+    for nombre, campo in serializer.fields.items():
+        if campo.write_only:
+            continue
+        if nombre in declaradas:
+            atributos = declaradas[nombre]
+        elif campo.source == '*':
+            return None
+        else:
+            atributos = [campo.source_attrs[0]]
+        # Un PrimaryKeyRelatedField solo lee la columna <relación>_id, sin JOIN
+        solo_id = isinstance(campo, serializers.PrimaryKeyRelatedField) and len(campo.source_attrs) == 1
+        if not all(agregar(atributo, cargar_relacion=not solo_id) for atributo in atributos):
+            return None
+    return columnas, relaciones
+
+
+def _rutas_select_related(arbol, prefijo=''):
+    rutas = []
+    for clave, subarbol in arbol.items():
+        ruta = f'{prefijo}{clave}'
+        rutas.extend(_rutas_select_related(subarbol, f'{ruta}{LOOKUP_SEP}') if subarbol else [ruta])
+    return rutas
+
+
+def podar_queryset(queryset, serializer):
+    """
+    Ajusta select_related, prefetch_related y .only() a los campos del serializer.
+
+    Solo descarta relaciones y columnas; nunca agrega consultas.
+    """
+    dependencias = dependencias_serializer(serializer, queryset)
+    if dependencias is None:
+        return queryset
+    columnas, relaciones = dependencias
+    consulta = queryset.query
+
+    if isinstance(consulta.select_related, dict):
+        arbol = {clave: subarbol for clave, subarbol in consulta.select_related.items() if clave in relaciones}
+        queryset = queryset.select_related(None)
+        if arbol:
+            queryset = queryset.select_related(*_rutas_select_related(arbol))
+
+    prefetch = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if (lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup).split(LOOKUP_SEP)[0] in relaciones
+    ]
+    queryset = queryset.prefetch_related(None).prefetch_related(*prefetch)
+
+    # No se pisa un .only()/.defer() que ya haya puesto la vista, ni se difiere
+    # con un select_related() sin argumentos (sigue todas las relaciones)
+    diferidos, es_defer = consulta.deferred_loading
+    if es_defer and not diferidos and queryset.query.select_related is not True:
+        # Las relaciones que siguen en select_related (incluidas las inversas) no pueden diferirse
+        queryset = queryset.only(*columnas, *(queryset.query.select_related or {}))
+    return queryset
+
+
+class CamposParcialesMixin:
+    """
+    Mezcla para vistas genéricas de DRF que habilita ?fields= y ?omit= en las
+    lecturas (GET). Se aplica al serializer que devuelve get_serializer y al
+    queryset que pasa por filter_queryset.
+    """
+
+    def get_campos_parciales(self):
+        """(campos, omitidos) pedidos en la consulta; vacíos fuera de GET"""
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return [], []
+        return leer_lista(request.query_params.get('fields')), leer_lista(request.query_params.get('omit'))
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        campos, omitidos = self.get_campos_parciales()
+        if campos or omitidos:
+            aplicar_campos(serializer_de_fila(serializer), campos, omitidos)
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        campos, omitidos = self.get_campos_parciales()
+        if (campos or omitidos) and isinstance(queryset, QuerySet):
+            queryset = podar_queryset(queryset, serializer_de_fila(self.get_serializer()))
+        return queryset
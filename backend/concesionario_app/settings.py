@@ -245,6 +245,9 @@ CORS_ALLOW_ALL_ORIGINS = config('CORS_ALLOW_ALL_ORIGINS', default=False, cast=bo
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Cabeceras de respuesta legibles desde el frontend (caché y exportaciones incrementales)
+CORS_EXPOSE_HEADERS = ['ETag', 'X-Export-Cursor']
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -259,3 +262,9 @@ if not DEBUG:
 
 # Static files for production
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# Importaciones: con un worker (python manage.py procesar_importaciones) las vistas
+# solo encolan el archivo; sin él se procesa dentro de la misma petición
+IMPORTACIONES_EN_SEGUNDO_PLANO = config('IMPORTACIONES_EN_SEGUNDO_PLANO', default=False, cast=bool)
+# Un trabajo que lleva más que esto en 'procesando' se da por perdido (worker caído)
+IMPORTACIONES_MINUTOS_MAXIMOS = config('IMPORTACIONES_MINUTOS_MAXIMOS', default=60, cast=int)
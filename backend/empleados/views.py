@@ -9,6 +9,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from datetime import date, timedelta, datetime
 import calendar
 
+from concesionario_app.campos_parciales import CamposParcialesMixin
 from .models import (
     Departamento, Posicion, Empleado, SolicitudTiempo, 
     RegistroAsistencia, Nomina, DocumentoEmpleado, EvaluacionDesempeno
@@ -22,7 +23,7 @@ from .serializers import (
 )
 
 
-class DepartamentoViewSet(viewsets.ModelViewSet):
+class DepartamentoViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     queryset = Departamento.objects.all()
     serializer_class = DepartamentoSerializer
     permission_classes = [IsAuthenticated]
@@ -33,7 +34,7 @@ class DepartamentoViewSet(viewsets.ModelViewSet):
     ordering = ['nombre']
 
 
-class PosicionViewSet(viewsets.ModelViewSet):
+class PosicionViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     queryset = Posicion.objects.select_related('departamento')
     serializer_class = PosicionSerializer
     permission_classes = [IsAuthenticated]
@@ -44,7 +45,7 @@ class PosicionViewSet(viewsets.ModelViewSet):
     ordering = ['departamento__nombre', 'titulo']
 
 
-class EmpleadoViewSet(viewsets.ModelViewSet):
+class EmpleadoViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     queryset = Empleado.objects.select_related('posicion', 'posicion__departamento', 'supervisor')
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -145,7 +146,7 @@ class EmpleadoViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class SolicitudTiempoViewSet(viewsets.ModelViewSet):
+class SolicitudTiempoViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     queryset = SolicitudTiempo.objects.select_related('empleado', 'aprobada_por')
     serializer_class = SolicitudTiempoSerializer
     permission_classes = [IsAuthenticated]
@@ -219,7 +220,7 @@ class SolicitudTiempoViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class RegistroAsistenciaViewSet(viewsets.ModelViewSet):
+class RegistroAsistenciaViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     queryset = RegistroAsistencia.objects.select_related('empleado')
     serializer_class = RegistroAsistenciaSerializer
     permission_classes = [IsAuthenticated]
@@ -762,7 +763,7 @@ class RegistroAsistenciaViewSet(viewsets.ModelViewSet):
         return Response(estadisticas)
 
 
-class NominaViewSet(viewsets.ModelViewSet):
+class NominaViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     queryset = Nomina.objects.select_related('empleado')
     serializer_class = NominaSerializer
     permission_classes = [IsAuthenticated]
@@ -860,7 +861,7 @@ class NominaViewSet(viewsets.ModelViewSet):
         })
 
 
-class DocumentoEmpleadoViewSet(viewsets.ModelViewSet):
+class DocumentoEmpleadoViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     queryset = DocumentoEmpleado.objects.select_related('empleado')
     serializer_class = DocumentoEmpleadoSerializer
     permission_classes = [IsAuthenticated]
@@ -896,7 +897,7 @@ class DocumentoEmpleadoViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class EvaluacionDesempenoViewSet(viewsets.ModelViewSet):
+class EvaluacionDesempenoViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     queryset = EvaluacionDesempeno.objects.select_related('empleado', 'evaluador')
     serializer_class = EvaluacionDesempenoSerializer
     permission_classes = [IsAuthenticated]
@@ -10,6 +10,7 @@ from decimal import Decimal, ROUND_HALF_UP
 from datetime import datetime, timedelta
 import calendar
 
+from concesionario_app.campos_parciales import CamposParcialesMixin
 from .models import (
     EntidadFinanciera, TipoCredito, SolicitudCredito, DocumentoCredito,
     HistorialCredito, EsquemaComision, ComisionCalculada, MetaVendedor,
@@ -31,7 +32,7 @@ from ventas.models import Venta
 # VISTAS DE FINANCIAMIENTO
 # ========================
 
-class EntidadesFinancierasListView(generics.ListAPIView):
+class EntidadesFinancierasListView(CamposParcialesMixin, generics.ListAPIView):
     """Lista todas las entidades financieras activas"""
     queryset = EntidadFinanciera.objects.filter(activa=True).prefetch_related('tipos_credito')
     serializer_class = EntidadFinancieraSerializer
@@ -67,7 +68,7 @@ class CalculadoraCreditoView(APIView):
             )
 
 
-class SolicitudCreditoListCreateView(generics.ListCreateAPIView):
+class SolicitudCreditoListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     """Lista y crea solicitudes de crédito"""
     serializer_class = SolicitudCreditoSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -252,7 +253,7 @@ class ActualizarEstadoSolicitudView(APIView):
             )
 
 
-class DocumentosCreditoView(generics.ListCreateAPIView):
+class DocumentosCreditoView(CamposParcialesMixin, generics.ListCreateAPIView):
     """Lista y sube documentos para una solicitud de crédito"""
     serializer_class = DocumentoCreditoSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -347,7 +348,7 @@ class EstadisticasFinanciamientoView(APIView):
 # VISTAS DE COMISIONES
 # ========================
 
-class EsquemaComisionListCreateView(generics.ListCreateAPIView):
+class EsquemaComisionListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     """Lista y crea esquemas de comisión"""
     queryset = EsquemaComision.objects.filter(activo=True).prefetch_related('tramos')
     serializer_class = EsquemaComisionSerializer
@@ -361,7 +362,7 @@ class EsquemaComisionDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
 
-class AsignacionComisionListCreateView(generics.ListCreateAPIView):
+class AsignacionComisionListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     """Lista y crea asignaciones de comisión"""
     serializer_class = AsignacionComisionSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -382,7 +383,7 @@ class AsignacionComisionListCreateView(generics.ListCreateAPIView):
         return queryset.order_by('-fecha_creacion')
 
 
-class ComisionCalculadaListView(generics.ListAPIView):
+class ComisionCalculadaListView(CamposParcialesMixin, generics.ListAPIView):
     """Lista comisiones calculadas con filtros"""
     serializer_class = ComisionCalculadaSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -488,7 +489,7 @@ class PagarComisionView(APIView):
         return Response(serializer.data)
 
 
-class MetaVendedorListCreateView(generics.ListCreateAPIView):
+class MetaVendedorListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     """Lista y crea metas de vendedores"""
     serializer_class = MetaVendedorSerializer
     permission_classes = [permissions.IsAuthenticated]
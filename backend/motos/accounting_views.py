@@ -7,7 +7,8 @@ from django.shortcuts import get_object_or_404
 from django.db.models import Sum, Q
 from django_filters.rest_framework import DjangoFilterBackend
 from django.template.loader import render_to_string
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet
@@ -16,11 +17,15 @@ from reportlab.lib import colors
 from reportlab.lib.units import inch
 import io
 from datetime import date, timedelta, datetime
+from decimal import Decimal
 
+from concesionario_app.campos_parciales import CamposParcialesMixin
 from .models import (
     Proveedor, FacturaProveedor, PagoProveedor, 
     OrdenCompra, DetalleOrdenCompra, MotoModelo, MotoInventario
 )
+from .exportacion import generar_csv
+from .services import AntiguedadSaldosService, PlanificadorRestockService
 from .serializers import (
     FacturaProveedorSerializer, PagoProveedorSerializer,
     OrdenCompraSerializer, DetalleOrdenCompraSerializer
@@ -28,9 +33,10 @@ from .serializers import (
 
 # ===== VISTAS DE FACTURAS =====
 
-class FacturaProveedorListCreateView(generics.ListCreateAPIView):
+class FacturaProveedorListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     """Vista para listar y crear facturas de proveedores"""
-    queryset = FacturaProveedor.objects.all()
+    # monto_pendiente y proveedor_nombre sin consultas adicionales por factura
+    queryset = FacturaProveedor.objects.con_saldo().select_related('proveedor')
     serializer_class = FacturaProveedorSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -41,13 +47,13 @@ class FacturaProveedorListCreateView(generics.ListCreateAPIView):
 
 class FacturaProveedorDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Vista para detalles de factura de proveedor"""
-    queryset = FacturaProveedor.objects.all()
+    queryset = FacturaProveedor.objects.con_saldo().select_related('proveedor')
     serializer_class = FacturaProveedorSerializer
     permission_classes = [IsAuthenticated]
 
 # ===== VISTAS DE PAGOS =====
 
-class PagoProveedorListCreateView(generics.ListCreateAPIView):
+class PagoProveedorListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     """Vista para listar y crear pagos a proveedores"""
     queryset = PagoProveedor.objects.all()
     serializer_class = PagoProveedorSerializer
@@ -66,7 +72,7 @@ class PagoProveedorDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 # ===== VISTAS DE ÓRDENES DE COMPRA =====
 
-class OrdenCompraListCreateView(generics.ListCreateAPIView):
+class OrdenCompraListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     """Vista para listar y crear órdenes de compra"""
     queryset = OrdenCompra.objects.all()
     serializer_class = OrdenCompraSerializer
@@ -94,7 +100,7 @@ class OrdenCompraDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = OrdenCompraSerializer
     permission_classes = [IsAuthenticated]
 
-class DetalleOrdenCompraListCreateView(generics.ListCreateAPIView):
+class DetalleOrdenCompraListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     """Vista para listar y crear detalles de orden de compra"""
     queryset = DetalleOrdenCompra.objects.all()
     serializer_class = DetalleOrdenCompraSerializer
@@ -109,14 +115,14 @@ class EstadisticasProveedorView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request, proveedor_id):
-        proveedor = get_object_or_404(Proveedor, id=proveedor_id)
+        proveedor = get_object_or_404(Proveedor.objects.con_totales(), id=proveedor_id)
         
         # Facturas
         facturas_pendientes = proveedor.facturas_proveedor.filter(estado='pendiente')
         facturas_vencidas = proveedor.facturas_proveedor.filter(estado='pendiente', fecha_vencimiento__lt=date.today())
         
         # Totales
-        total_deuda = facturas_pendientes.aggregate(total=Sum('total'))['total'] or 0
+        total_deuda = proveedor.saldo_actual()
         total_vencido = facturas_vencidas.aggregate(total=Sum('total'))['total'] or 0
         
         # Pagos últimos 30 días
@@ -141,42 +147,119 @@ class EstadisticasProveedorView(APIView):
             'total_compras': proveedor.total_compras(),
         })
 
+def _servicio_antiguedad(request):
+    fecha_corte = request.GET.get('fecha_corte')
+    if not fecha_corte:
+        return AntiguedadSaldosService()
+    fecha = parse_date(fecha_corte)
+    if fecha is None:
+        raise ValueError('Parámetro fecha_corte inválido, use el formato YYYY-MM-DD')
+    return AntiguedadSaldosService(fecha)
+
+
+def _respuesta_csv(filas, nombre_archivo):
+    response = StreamingHttpResponse(generar_csv(filas), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return response
+
+
+class AntiguedadSaldosView(APIView):
+    """Antigüedad de cuentas por pagar de todos los proveedores (?export_format=csv para descargar)"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        try:
+            servicio = _servicio_antiguedad(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        filas = servicio.resumen()
+        
+        if request.GET.get('export_format') == 'csv':
+            return _respuesta_csv(
+                (
+                    {
+                        'ID_Proveedor': fila['proveedor_id'],
+                        'Proveedor': fila['nombre_proveedor'],
+                        'Facturas': fila['facturas'],
+                        'Corriente': fila['corriente'],
+                        'Dias_1_30': fila['dias_1_30'],
+                        'Dias_31_60': fila['dias_31_60'],
+                        'Dias_61_90': fila['dias_61_90'],
+                        'Dias_90_Mas': fila['dias_90_mas'],
+                        'Total': fila['total'],
+                    }
+                    for fila in filas
+                ),
+                f'antiguedad_saldos_{servicio.fecha_corte:%Y%m%d}.csv'
+            )
+        
+        return Response({
+            'fecha_corte': servicio.fecha_corte,
+            'proveedores': filas,
+            'totales': servicio.totales(filas),
+        })
+
+
+class AntiguedadSaldosProveedorView(APIView):
+    """Facturas abiertas de un proveedor con su tramo de antigüedad"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, proveedor_id):
+        proveedor = get_object_or_404(Proveedor, id=proveedor_id)
+        try:
+            servicio = _servicio_antiguedad(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        facturas = servicio.detalle(proveedor.id)
+        
+        if request.GET.get('export_format') == 'csv':
+            return _respuesta_csv(
+                (
+                    {
+                        'Numero_Factura': factura['numero_factura'],
+                        'Fecha_Emision': factura['fecha_emision'],
+                        'Fecha_Vencimiento': factura['fecha_vencimiento'],
+                        'Moneda': factura['moneda'],
+                        'Total': factura['total'],
+                        'Pagado': factura['total_pagado'],
+                        'Saldo': factura['saldo'],
+                        'Dias_Vencido': factura['dias_vencido'],
+                        'Tramo': factura['tramo'],
+                    }
+                    for factura in facturas
+                ),
+                f'antiguedad_saldos_proveedor_{proveedor.id}_{servicio.fecha_corte:%Y%m%d}.csv'
+            )
+        
+        saldos = {clave: Decimal('0') for clave, _, _ in servicio.TRAMOS}
+        for factura in facturas:
+            saldos[factura['tramo']] += factura['saldo']
+        
+        return Response({
+            'fecha_corte': servicio.fecha_corte,
+            'proveedor': {'id': proveedor.id, 'nombre': proveedor.nombre_completo},
+            'tramos': saldos,
+            'total': sum(saldos.values(), Decimal('0')),
+            'facturas': facturas,
+        })
+
 # ===== VISTAS DE RE-STOCK Y PEDIDOS =====
 
 class SugerenciasRestockView(APIView):
-    """Vista para sugerencias de re-stock basadas en inventario"""
+    """Vista para sugerencias de re-stock (punto de reorden, stock de seguridad y EOQ por modelo)"""
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         # Filtros
-        stock_minimo = int(request.GET.get('stock_minimo', 5))
+        try:
+            stock_minimo = int(request.GET.get('stock_minimo', 5))
+        except ValueError:
+            return Response({'error': 'stock_minimo debe ser un número entero'}, status=status.HTTP_400_BAD_REQUEST)
         proveedor_id = request.GET.get('proveedor')
         
-        # Base queryset
-        modelos_query = MotoModelo.objects.filter(activa=True)
-        if proveedor_id:
-            modelos_query = modelos_query.filter(proveedor_id=proveedor_id)
-        
-        sugerencias = []
-        
-        for modelo in modelos_query:
-            stock_total = modelo.total_stock
-            
-            if stock_total <= stock_minimo:
-                # Calcular ventas promedio (si hay datos de ventas)
-                cantidad_sugerida = max(10, stock_minimo * 2)  # Lógica básica
-                
-                sugerencias.append({
-                    'modelo_id': modelo.id,
-                    'modelo_nombre': str(modelo),
-                    'proveedor': modelo.proveedor.nombre_completo if modelo.proveedor else 'Sin proveedor',
-                    'proveedor_id': modelo.proveedor.id if modelo.proveedor else None,
-                    'stock_actual': stock_total,
-                    'stock_minimo': stock_minimo,
-                    'cantidad_sugerida': cantidad_sugerida,
-                    'precio_compra': modelo.precio_compra,
-                    'total_estimado': modelo.precio_compra * cantidad_sugerida,
-                })
+        sugerencias = PlanificadorRestockService().sugerencias(proveedor_id=proveedor_id, stock_minimo=stock_minimo)
         
         return Response({
             'sugerencias': sugerencias,
@@ -185,12 +268,16 @@ class SugerenciasRestockView(APIView):
         })
 
 class CrearOrdenCompraAutomaticaView(APIView):
-    """Vista para crear orden de compra automática basada en sugerencias"""
+    """
+    Vista para crear orden de compra automática basada en sugerencias.
+    
+    Sin 'sugerencias' en el cuerpo se usan las del planificador para el proveedor.
+    """
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
         proveedor_id = request.data.get('proveedor_id')
-        sugerencias = request.data.get('sugerencias', [])
+        sugerencias = request.data.get('sugerencias')
         fecha_entrega = request.data.get('fecha_entrega_esperada')
         
         # Validate required fields
@@ -200,12 +287,6 @@ class CrearOrdenCompraAutomaticaView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if not sugerencias or len(sugerencias) == 0:
-            return Response(
-                {'error': 'sugerencias es requerido y debe contener al menos un elemento'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
         try:
             proveedor = Proveedor.objects.get(id=proveedor_id)
         except Proveedor.DoesNotExist:
@@ -214,34 +295,30 @@ class CrearOrdenCompraAutomaticaView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Generar número de orden único
-        import uuid
-        numero_orden = f"OC-{date.today().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
+        planificador = PlanificadorRestockService()
+        if sugerencias is None:
+            sugerencias = planificador.sugerencias(proveedor_id=proveedor.id)
+        
+        if not sugerencias or len(sugerencias) == 0:
+            return Response(
+                {'error': 'sugerencias es requerido y debe contener al menos un elemento'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Procesar fecha de entrega
+        fecha_entrega_date = None
         if fecha_entrega:
             try:
                 # Parse the date string (format: YYYY-MM-DD)
                 fecha_entrega_date = datetime.strptime(fecha_entrega, '%Y-%m-%d').date()
             except (ValueError, TypeError):
-                fecha_entrega_date = date.today() + timedelta(days=15)
-        else:
-            fecha_entrega_date = date.today() + timedelta(days=15)
+                pass
         
-        # Crear orden
-        orden = OrdenCompra.objects.create(
-            proveedor=proveedor,
-            numero_orden=numero_orden,
-            fecha_orden=date.today(),
-            fecha_entrega_esperada=fecha_entrega_date,
-            estado='borrador',
-            prioridad='normal',
-            creado_por=request.user,
-            notas='Orden generada automáticamente por sugerencias de re-stock'
+        # Todos los modelos en una consulta; se valida todo antes de crear la orden
+        modelos = MotoModelo.objects.in_bulk(
+            [sugerencia.get('modelo_id') for sugerencia in sugerencias if sugerencia.get('modelo_id')]
         )
-        
-        # Crear detalles
-        subtotal = 0
+        lineas = []
         for i, sugerencia in enumerate(sugerencias):
             # Validate each suggestion
             if not sugerencia.get('modelo_id'):
@@ -250,9 +327,8 @@ class CrearOrdenCompraAutomaticaView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            try:
-                modelo = MotoModelo.objects.get(id=sugerencia['modelo_id'])
-            except MotoModelo.DoesNotExist:
+            modelo = modelos.get(sugerencia['modelo_id'])
+            if modelo is None:
                 return Response(
                     {'error': f'Modelo con ID {sugerencia["modelo_id"]} no encontrado en sugerencia {i+1}'},
                     status=status.HTTP_404_NOT_FOUND
@@ -265,24 +341,9 @@ class CrearOrdenCompraAutomaticaView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            precio = modelo.precio_compra or 0
-            subtotal_item = precio * cantidad
-            
-            DetalleOrdenCompra.objects.create(
-                orden=orden,
-                modelo_moto=modelo,
-                color=sugerencia.get('color', 'Varios'),
-                cantidad_solicitada=cantidad,
-                precio_unitario=precio,
-                subtotal=subtotal_item
-            )
-            
-            subtotal += subtotal_item
+            lineas.append({'modelo': modelo, 'cantidad': cantidad, 'color': sugerencia.get('color', 'Varios')})
         
-        # Actualizar totales de la orden
-        orden.subtotal = subtotal
-        orden.total = subtotal  # Sin impuestos por ahora
-        orden.save()
+        orden = planificador.crear_orden(proveedor, lineas, request.user, fecha_entrega_date)
         
         serializer = OrdenCompraSerializer(orden)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -1,31 +1,49 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Sum, Count, Avg, F
-from datetime import datetime, timedelta
+from django.db.models import Sum, Max, Q
+from django.utils import timezone
+from datetime import timedelta
 from .models import MotoModelo
-from ventas.models import VentaDetalle
+from ventas.models import VentaDiariaModelo
 
 class AlertasInteligentesView(APIView):
-    """Vista para generar alertas inteligentes del inventario"""
+    """
+    Vista para generar alertas inteligentes del inventario.
+
+    Usa el resumen de stock y el resumen diario de ventas por modelo, así que el
+    costo es de dos consultas sin importar cuántos modelos activos haya.
+    """
     
     def get(self, request):
         try:
             alertas = []
+            hoy = timezone.localdate()
+            
+            # Consulta 1: modelos activos con su stock desnormalizado
+            modelos = MotoModelo.objects.filter(activa=True).values(
+                'id', 'marca', 'modelo', 'precio_compra', 'fecha_creacion', 'stock_resumen__total_unidades'
+            )
             
-            # Obtener modelos activos
-            modelos = MotoModelo.objects.filter(activa=True).prefetch_related('inventario')
+            # Consulta 2: ventas de los últimos 180 días por modelo desde el resumen diario
+            ventas_por_modelo = {
+                fila['modelo_moto_id']: fila
+                for fila in VentaDiariaModelo.objects.filter(
+                    fecha__gte=hoy - timedelta(days=180)
+                ).values('modelo_moto_id').annotate(
+                    ventas_6_meses=Sum('unidades'),
+                    ventas_mes=Sum('unidades', filter=Q(fecha__gte=hoy - timedelta(days=30))),
+                    ultima_venta=Max('fecha', filter=Q(unidades__gt=0))
+                ).order_by()
+            }
             
             for modelo in modelos:
-                stock_actual = sum(item.cantidad_stock for item in modelo.inventario.all())
+                stock_actual = modelo['stock_resumen__total_unidades'] or 0
+                nombre_modelo = f"{modelo['marca']} {modelo['modelo']}"
+                ventas = ventas_por_modelo.get(modelo['id'], {})
                 
                 # 1. ALERTAS DE STOCK BAJO (punto de reorden)
-                fecha_inicio = datetime.now() - timedelta(days=180)
-                ventas_6_meses = VentaDetalle.objects.filter(
-                    moto__marca=modelo.marca,
-                    moto__modelo=modelo.modelo,
-                    venta__fecha_venta__gte=fecha_inicio
-                ).aggregate(total=Sum('cantidad'))['total'] or 0
+                ventas_6_meses = ventas.get('ventas_6_meses') or 0
                 
                 venta_promedio_mensual = ventas_6_meses / 6 if ventas_6_meses > 0 else 0
                 punto_reorden = venta_promedio_mensual * 2  # 2 meses de inventario
@@ -38,8 +56,8 @@ class AlertasInteligentesView(APIView):
                         alertas.append({
                             'tipo': 'stock_bajo',
                             'prioridad': prioridad,
-                            'modelo_id': modelo.id,
-                            'modelo': f"{modelo.marca} {modelo.modelo}",
+                            'modelo_id': modelo['id'],
+                            'modelo': nombre_modelo,
                             'stock_actual': stock_actual,
                             'punto_reorden': round(punto_reorden, 1),
                             'dias_restantes': round(dias_restantes, 1),
@@ -52,13 +70,13 @@ class AlertasInteligentesView(APIView):
                 # 2. ALERTAS DE EXCESO DE INVENTARIO
                 if venta_promedio_mensual > 0 and stock_actual > (venta_promedio_mensual * 6):
                     meses_exceso = (stock_actual / venta_promedio_mensual) - 6
-                    valor_exceso = float(modelo.precio_compra) * (meses_exceso * venta_promedio_mensual)
+                    valor_exceso = float(modelo['precio_compra']) * (meses_exceso * venta_promedio_mensual)
                     
                     alertas.append({
                         'tipo': 'exceso_inventario',
                         'prioridad': 'media',
-                        'modelo_id': modelo.id,
-                        'modelo': f"{modelo.marca} {modelo.modelo}",
+                        'modelo_id': modelo['id'],
+                        'modelo': nombre_modelo,
                         'stock_actual': stock_actual,
                         'meses_inventario': round(stock_actual / venta_promedio_mensual, 1),
                         'exceso_unidades': round(meses_exceso * venta_promedio_mensual),
@@ -68,24 +86,21 @@ class AlertasInteligentesView(APIView):
                     })
                 
                 # 3. ALERTAS DE PRODUCTOS SIN MOVIMIENTO
-                fecha_sin_movimiento = datetime.now() - timedelta(days=120)
+                fecha_sin_movimiento = hoy - timedelta(days=120)
                 if stock_actual > 0:
-                    tiene_ventas_recientes = VentaDetalle.objects.filter(
-                        moto__marca=modelo.marca,
-                        moto__modelo=modelo.modelo,
-                        venta__fecha_venta__gte=fecha_sin_movimiento
-                    ).exists()
+                    ultima_venta = ventas.get('ultima_venta')
+                    tiene_ventas_recientes = ultima_venta is not None and ultima_venta >= fecha_sin_movimiento
                     
                     if not tiene_ventas_recientes:
-                        valor_riesgo = float(modelo.precio_compra) * stock_actual
-                        dias_sin_movimiento = (datetime.now().date() - modelo.fecha_creacion.date()).days
+                        valor_riesgo = float(modelo['precio_compra']) * stock_actual
+                        dias_sin_movimiento = (hoy - timezone.localdate(modelo['fecha_creacion'])).days
                         
                         if dias_sin_movimiento > 120:
                             alertas.append({
                                 'tipo': 'sin_movimiento',
                                 'prioridad': 'alta' if dias_sin_movimiento > 180 else 'media',
-                                'modelo_id': modelo.id,
-                                'modelo': f"{modelo.marca} {modelo.modelo}",
+                                'modelo_id': modelo['id'],
+                                'modelo': nombre_modelo,
                                 'stock_actual': stock_actual,
                                 'dias_sin_movimiento': dias_sin_movimiento,
                                 'valor_riesgo': valor_riesgo,
@@ -94,19 +109,14 @@ class AlertasInteligentesView(APIView):
                             })
                 
                 # 4. ALERTAS DE ALTA DEMANDA
-                fecha_alta_demanda = datetime.now() - timedelta(days=30)
-                ventas_mes = VentaDetalle.objects.filter(
-                    moto__marca=modelo.marca,
-                    moto__modelo=modelo.modelo,
-                    venta__fecha_venta__gte=fecha_alta_demanda
-                ).aggregate(total=Sum('cantidad'))['total'] or 0
+                ventas_mes = ventas.get('ventas_mes') or 0
                 
                 if ventas_mes > stock_actual and stock_actual > 0:
                     alertas.append({
                         'tipo': 'alta_demanda',
                         'prioridad': 'media',
-                        'modelo_id': modelo.id,
-                        'modelo': f"{modelo.marca} {modelo.modelo}",
+                        'modelo_id': modelo['id'],
+                        'modelo': nombre_modelo,
                         'stock_actual': stock_actual,
                         'ventas_mes': ventas_mes,
                         'ratio_demanda': round(ventas_mes / stock_actual, 2),
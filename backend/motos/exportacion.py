@@ -0,0 +1,366 @@
+import csv
+import hashlib
+import itertools
+import json
+import tempfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import parse_etags, quote_etag, urlsafe_base64_decode, urlsafe_base64_encode
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, NamedStyle
+from openpyxl.utils import get_column_letter
+
+from .models import VersionDatos
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Dependencia opcional: solo la necesita el formato parquet
+    pa = pq = None
+
+
+# Filas leídas de la base por viaje y líneas CSV agrupadas por fragmento enviado
+TAMANO_LOTE = 2000
+LINEAS_POR_FRAGMENTO = 500
+
+# El ancho de cada columna se estima con las primeras filas en lugar de recorrer toda la hoja
+FILAS_MUESTRA_ANCHO = 200
+ANCHO_MAXIMO_COLUMNA = 50
+
+CONTENT_TYPE_EXCEL = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': CONTENT_TYPE_EXCEL,
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Todos los importes del sistema tienen dos decimales y a lo sumo 20 dígitos
+PRECISION_DECIMAL = 20
+ESCALA_DECIMAL = 2
+
+# Una transacción en curso puede confirmar filas con fecha_actualizacion anterior al momento de la
+# consulta; el cursor retrocede este margen para volver a incluirlas (entrega al menos una vez)
+MARGEN_CURSOR = timedelta(minutes=5)
+
+# Tablas de las que depende cada exportación; un cambio en cualquiera invalida sus archivos en caché
+TABLAS_EXPORTACION = {
+    'inventario': [
+        'motos.MotoModelo', 'motos.MotoInventario', 'motos.MotoInventarioLocation',
+        'motos.Ubicacion', 'motos.Pasillo', 'motos.Zona', 'motos.Almacen',
+    ],
+    'ubicaciones': [
+        'motos.Ubicacion', 'motos.Pasillo', 'motos.Zona', 'motos.Almacen',
+        'motos.MotoInventarioLocation', 'motos.MotoInventario',
+    ],
+    'clientes': ['usuarios.Cliente'],
+    'proveedores': ['motos.Proveedor', 'motos.MotoModelo'],
+    'ventas': ['ventas.Venta', 'ventas.VentaDetalle', 'usuarios.Cliente', 'usuarios.Usuario', 'motos.Moto'],
+    'pagos': ['pagos.Pago', 'ventas.Venta', 'usuarios.Cliente', 'usuarios.Usuario'],
+    'cuotas': ['pagos.CuotaVencimiento', 'ventas.Venta', 'usuarios.Cliente'],
+    'documentos': ['usuarios.Documento', 'usuarios.Cliente'],
+}
+
+
+def leer_cursor(request):
+    """
+    Momento a partir del cual exportar, según ?cursor= (opaco) o ?since= (ISO 8601)
+
+    Returns:
+        datetime | None: None si la exportación es completa
+
+    Raises:
+        ValueError: Si el cursor o la fecha no son válidos
+    """
+    cursor = request.GET.get('cursor')
+    since = request.GET.get('since')
+    if cursor:
+        try:
+            datos = json.loads(urlsafe_base64_decode(cursor))
+            return datetime.fromisoformat(datos['desde'])
+        except (ValueError, KeyError, TypeError):
+            raise ValueError('Cursor inválido')
+    if since:
+        desde = parse_datetime(since)
+        if desde is None and parse_date(since):
+            desde = datetime.combine(parse_date(since), time.min)
+        if desde is None:
+            raise ValueError('Parámetro since inválido, use el formato ISO 8601 (YYYY-MM-DD[THH:MM:SS])')
+        return timezone.make_aware(desde) if timezone.is_naive(desde) else desde
+    return None
+
+
+def generar_cursor(desde, inicio):
+    """
+    Cursor para la siguiente exportación incremental.
+
+    Args:
+        desde: Momento desde el que se exportó esta vez (None si fue completa)
+        inicio: Momento en que empezó la consulta
+    """
+    limite = inicio - MARGEN_CURSOR
+    siguiente = max(desde, limite) if desde else limite
+    return urlsafe_base64_encode(json.dumps({'desde': siguiente.isoformat()}).encode())
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea escrita en lugar de guardarla"""
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(filas, bom=False):
+    """
+    Fragmentos de texto CSV generados mientras se recorre la consulta.
+
+    Args:
+        filas: Iterable de dicts (normalmente sobre queryset.iterator());
+            las claves de la primera fila forman el encabezado
+        bom: Anteponer el BOM UTF-8 para que Excel detecte la codificación
+    """
+    escritor = csv.writer(_Eco(), lineterminator='\n')
+    if bom:
+        yield '\ufeff'
+    columnas = None
+    fragmento = []
+    for fila in filas:
+        if columnas is None:
+            columnas = list(fila)
+            fragmento.append(escritor.writerow(columnas))
+        fragmento.append(escritor.writerow([fila[columna] for columna in columnas]))
+        if len(fragmento) >= LINEAS_POR_FRAGMENTO:
+            yield ''.join(fragmento)
+            fragmento = []
+    if fragmento:
+        yield ''.join(fragmento)
+
+
+def escribir_excel(filas, archivo, hoja, columnas_moneda=()):
+    """
+    Escribe las filas en un libro openpyxl en modo solo escritura.
+
+    Las filas se vuelcan al disco a medida que llegan, así que la memoria no
+    crece con el tamaño de la exportación. Los anchos se calculan con una
+    muestra inicial y los estilos se registran una sola vez en el libro.
+
+    Args:
+        filas: Iterable de dicts; las claves de la primera fila forman el encabezado
+        archivo: Ruta o archivo binario donde guardar el libro
+        hoja: Nombre de la hoja
+        columnas_moneda: Encabezados que llevan formato monetario
+    """
+    libro = Workbook(write_only=True)
+    agregar_hoja(libro, filas, hoja, columnas_moneda)
+    libro.save(archivo)
+
+
+def agregar_hoja(libro, filas, hoja, columnas_moneda=()):
+    """Agrega una hoja a un libro en modo solo escritura (ver escribir_excel)"""
+    worksheet = libro.create_sheet(hoja)
+
+    filas = iter(filas)
+    muestra = list(itertools.islice(filas, FILAS_MUESTRA_ANCHO))
+    if not muestra:
+        return
+    if 'encabezado' not in libro.named_styles:
+        libro.add_named_style(NamedStyle(name='encabezado', font=Font(bold=True)))
+        libro.add_named_style(NamedStyle(name='moneda', number_format='#,##0.00'))
+
+    columnas = list(muestra[0])
+    for indice, columna in enumerate(columnas, start=1):
+        largo = max(
+            [len(columna)] + [len(str(fila[columna])) for fila in muestra if fila[columna] is not None]
+        )
+        worksheet.column_dimensions[get_column_letter(indice)].width = min(largo + 2, ANCHO_MAXIMO_COLUMNA)
+
+    def celda(valor, estilo):
+        resultado = WriteOnlyCell(worksheet, value=valor)
+        resultado.style = estilo
+        return resultado
+
+    worksheet.append([celda(columna, 'encabezado') for columna in columnas])
+    posiciones_moneda = [indice for indice, columna in enumerate(columnas) if columna in columnas_moneda]
+    for fila in itertools.chain(muestra, filas):
+        valores = [fila[columna] for columna in columnas]
+        for indice in posiciones_moneda:
+            valores[indice] = celda(valores[indice], 'moneda')
+        worksheet.append(valores)
+
+
+def _tipo_arrow(tipo):
+    return {
+        'entero': pa.int64(),
+        'decimal': pa.decimal128(PRECISION_DECIMAL, ESCALA_DECIMAL),
+        'fecha': pa.date32(),
+        'fecha_hora': pa.timestamp('us', tz='UTC'),
+        'categoria': pa.dictionary(pa.int32(), pa.string()),
+        'texto': pa.string(),
+    }[tipo]
+
+
+def _valor_parquet(valor, tipo):
+    """Normaliza el valor de la fila al tipo de la columna ('' y None son nulos)"""
+    if valor is None or (isinstance(valor, str) and not valor):
+        return None
+    if tipo == 'decimal':
+        return Decimal(str(valor)).quantize(Decimal(1).scaleb(-ESCALA_DECIMAL))
+    if tipo == 'fecha':
+        if isinstance(valor, datetime):
+            return valor.date()
+        return valor if isinstance(valor, date) else date.fromisoformat(valor[:10])
+    if tipo == 'fecha_hora':
+        return valor if isinstance(valor, datetime) else datetime.fromisoformat(valor)
+    if tipo in ('texto', 'categoria'):
+        return str(valor)
+    return valor
+
+
+def escribir_parquet(filas, archivo, esquema):
+    """
+    Escribe las filas en un archivo Parquet con columnas tipadas.
+
+    Las filas se agrupan en record batches de TAMANO_LOTE, así que la memoria
+    no crece con el tamaño de la exportación. Los importes se guardan como
+    decimal exacto y los textos repetitivos (marca, estado...) como categorías.
+
+    Args:
+        filas: Iterable de dicts
+        archivo: Ruta o archivo binario donde guardar el Parquet
+        esquema: Dict ordenado {columna: tipo}, con tipo entre 'entero', 'decimal',
+            'fecha', 'fecha_hora', 'categoria' y 'texto'; define las columnas del archivo
+    """
+    schema = pa.schema([(columna, _tipo_arrow(tipo)) for columna, tipo in esquema.items()])
+    filas = iter(filas)
+    with pq.ParquetWriter(archivo, schema, compression='zstd') as escritor:
+        while lote := list(itertools.islice(filas, TAMANO_LOTE)):
+            columnas = [
+                pa.array([_valor_parquet(fila[columna], tipo) for fila in lote], type=schema.field(columna).type)
+                for columna, tipo in esquema.items()
+            ]
+            escritor.write_batch(pa.record_batch(columnas, schema=schema))
+
+
+class ExportacionCacheada:
+    """
+    Archivos de exportación guardados en el almacenamiento y servidos con ETag.
+
+    La versión de un archivo sale de los contadores de VersionDatos de las
+    tablas de la exportación más sus filtros. Mientras nada cambie se sirve
+    el archivo ya generado (o un 304 si el cliente manda If-None-Match); al
+    cambiar cualquiera de las tablas se regenera y se borra el anterior.
+
+    Con cachear=False (exportaciones incrementales, cada una con su propio
+    cursor) el archivo se genera y se envía sin guardarlo.
+    """
+
+    DIRECTORIO = 'exportaciones'
+    # Subir al cambiar columnas o formato de alguna exportación para invalidar los archivos viejos
+    VERSION_FORMATO = 2
+
+    def __init__(self, tipo, filtros=None, cachear=True):
+        self.tipo = tipo
+        self.tablas = TABLAS_EXPORTACION[tipo]
+        self.filtros = {clave: valor for clave, valor in (filtros or {}).items() if valor}
+        self.cachear = cachear
+
+    def responder_csv(self, request, filas, nombre_archivo, bom=False):
+        return self._responder(request, 'csv', nombre_archivo, lambda: generar_csv(filas, bom))
+
+    def responder_excel(self, request, filas, nombre_archivo, hoja, columnas_moneda=()):
+        return self._responder(
+            request, 'xlsx', nombre_archivo, lambda archivo: escribir_excel(filas, archivo, hoja, columnas_moneda)
+        )
+
+    def responder_parquet(self, request, filas, nombre_archivo, esquema):
+        if pa is None:
+            return JsonResponse({'error': 'El formato parquet requiere instalar pyarrow'}, status=501)
+        return self._responder(request, 'parquet', nombre_archivo, lambda archivo: escribir_parquet(filas, archivo, esquema))
+
+    def etag(self, extension):
+        versiones = VersionDatos.versiones(self.tablas)
+        firma = json.dumps(
+            [self.VERSION_FORMATO, self._clave(extension), sorted(versiones.items())], default=str
+        )
+        return hashlib.sha1(firma.encode()).hexdigest()[:24]
+
+    def _clave(self, extension):
+        """Identifica la combinación de tipo, formato y filtros (sin la versión de los datos)"""
+        firma = json.dumps([self.tipo, extension, sorted(self.filtros.items())], default=str)
+        return hashlib.sha1(firma.encode()).hexdigest()[:12]
+
+    def _ruta(self, extension, etag):
+        return f'{self.DIRECTORIO}/{self.tipo}/{self._clave(extension)}-{etag}.{extension}'
+
+    def _responder(self, request, extension, nombre_archivo, generar):
+        content_type = CONTENT_TYPES[extension]
+        if not self.cachear:
+            return self._responder_sin_cache(extension, nombre_archivo, generar, content_type)
+
+        etag = quote_etag(self.etag(extension))
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            ruta = self._ruta(extension, etag.strip('"'))
+            if default_storage.exists(ruta):
+                response = FileResponse(
+                    default_storage.open(ruta, 'rb'), as_attachment=True,
+                    filename=nombre_archivo, content_type=content_type
+                )
+            elif extension == 'csv':
+                # El CSV se envía mientras se escribe; se publica en caché solo si se completa
+                response = StreamingHttpResponse(self._guardar_al_enviar(generar(), ruta), content_type=content_type)
+                response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+            else:
+                with tempfile.TemporaryFile() as temporal:
+                    generar(temporal)
+                    temporal.seek(0)
+                    self._publicar(temporal, ruta)
+                response = FileResponse(
+                    default_storage.open(ruta, 'rb'), as_attachment=True,
+                    filename=nombre_archivo, content_type=content_type
+                )
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def _responder_sin_cache(self, extension, nombre_archivo, generar, content_type):
+        if extension == 'csv':
+            response = StreamingHttpResponse(generar(), content_type=content_type)
+            response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+            return response
+
+        temporal = tempfile.TemporaryFile()
+        generar(temporal)
+        temporal.seek(0)
+        return FileResponse(temporal, as_attachment=True, filename=nombre_archivo, content_type=content_type)
+
+    def _guardar_al_enviar(self, fragmentos, ruta):
+        with tempfile.TemporaryFile() as temporal:
+            for fragmento in fragmentos:
+                temporal.write(fragmento.encode('utf-8'))
+                yield fragmento
+            temporal.seek(0)
+            self._publicar(temporal, ruta)
+
+    def _publicar(self, archivo, ruta):
+        """Guarda el archivo generado y elimina las versiones anteriores de la misma exportación"""
+        directorio, nombre = ruta.rsplit('/', 1)
+        prefijo = nombre.split('-', 1)[0] + '-'
+        try:
+            _, existentes = default_storage.listdir(directorio)
+        except FileNotFoundError:
+            existentes = []
+        for anterior in existentes:
+            if anterior.startswith(prefijo) and anterior != nombre:
+                default_storage.delete(f'{directorio}/{anterior}')
+
+        # Otra petición pudo generar la misma versión mientras tanto
+        if not default_storage.exists(ruta):
+            default_storage.save(ruta, File(archivo, name=nombre))
@@ -2,17 +2,22 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from rest_framework import status
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.http import HttpResponse
+from django.urls import reverse
 from django.utils import timezone
-import pandas as pd
-import json
+import csv
 import uuid
 from datetime import datetime
 from .models import (
-    MotoModelo, MotoInventario, Proveedor,
+    MotoModelo, MotoInventario, Proveedor, TrabajoImportacion,
     Almacen, Zona, Pasillo, Ubicacion
 )
+from .importacion import (
+    ImportadorInventario, ImportadorUbicaciones, TrabajoImportacionService, leer_en_bloques
+)
 from .serializers import (
     MotoModeloSerializer, MotoInventarioSerializer, ProveedorSerializer,
     AlmacenSerializer, ZonaSerializer, PasilloSerializer, UbicacionSerializer
@@ -33,39 +38,94 @@ class ImportValidationMixin:
         
         return True, "OK"
     
-    def read_file_data(self, file_obj):
-        """Lee datos del archivo según su formato"""
-        filename = file_obj.name.lower()
+    def vista_previa(self, importador, file_obj, filas_muestra=10):
+        """
+        Valida el archivo completo con las reglas del importador (sin escribir
+        nada) y muestra las primeras filas, con sus columnas requeridas y sus
+        errores. can_import depende de todo el archivo, no solo de la muestra.
+        """
+        muestra = []
+        
+        def bloques():
+            for bloque in leer_en_bloques(file_obj, importador.tamano_bloque):
+                if not muestra:
+                    muestra.extend(bloque.head(filas_muestra).to_dict('records'))
+                yield bloque
         
         try:
-            if filename.endswith('.xlsx'):
-                df = pd.read_excel(file_obj)
-                return df.to_dict('records'), None
-            elif filename.endswith('.csv'):
-                df = pd.read_csv(file_obj)
-                return df.to_dict('records'), None
-            elif filename.endswith('.json'):
-                data = json.load(file_obj)
-                return data, None
-        except Exception as e:
-            return None, f"Error al leer archivo: {str(e)}"
-    
-    def validate_required_columns(self, data, required_columns):
-        """Valida que existan las columnas requeridas"""
-        if not data:
-            return False, "Archivo vacío"
+            validacion = importador.validar(bloques(), tamano_pagina=TrabajoImportacionService.MAX_ERRORES_RESPUESTA)
+        except ValueError as e:
+            # Columnas faltantes
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not validacion['total_rows']:
+            return Response({'error': 'Archivo vacío'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        errores_por_fila = {error['fila']: error['errores'] for error in validacion['errores']}
+        preview_items = []
+        for i, row in enumerate(muestra):
+            item = {'row': i + 1, **{columna: row.get(columna, '') for columna in importador.COLUMNAS_REQUERIDAS}, 'status': 'ok'}
+            row_errors = errores_por_fila.get(i + 1)
+            if row_errors:
+                item['status'] = 'error'
+                item['errors'] = row_errors
+            preview_items.append(item)
         
-        first_row = data[0] if isinstance(data, list) else data
-        missing_columns = [col for col in required_columns if col not in first_row]
+        return Response({
+            'preview': True,
+            'total_rows': validacion['total_rows'],
+            'preview_rows': len(preview_items),
+            'items': preview_items,
+            'errors': [
+                f"Fila {error['fila']}: {mensaje}"
+                for error in validacion['errores'] for mensaje in error['errores']
+            ],
+            'can_import': validacion['valid']
+        })
+    
+    def encolar_importacion(self, tipo, importador_cls, file_obj):
+        """
+        Verifica las columnas del archivo y lo encola.
+
+        Con un worker (IMPORTACIONES_EN_SEGUNDO_PLANO) responde 202 con el id del
+        trabajo; sin él lo procesa aquí mismo y responde 200 con el estado final,
+        en el mismo formato que el endpoint de estado.
+        """
+        importador = importador_cls()
+        primer_bloque = next(leer_en_bloques(file_obj, importador.tamano_bloque), None)
+        if primer_bloque is None or primer_bloque.empty:
+            return Response({'error': 'Archivo vacío'}, status=status.HTTP_400_BAD_REQUEST)
         
-        if missing_columns:
-            return False, f"Columnas faltantes: {', '.join(missing_columns)}"
+        faltantes = importador.columnas_faltantes(primer_bloque)
+        if faltantes:
+            return Response(
+                {'error': f"Columnas faltantes: {', '.join(faltantes)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        return True, "OK"
+        servicio = TrabajoImportacionService()
+        trabajo = servicio.encolar(tipo, file_obj, self.request.user)
+        if not settings.IMPORTACIONES_EN_SEGUNDO_PLANO:
+            trabajo = servicio.procesar(servicio.tomar(trabajo.id))
+            datos = servicio.estado(trabajo)
+            datos['status_url'] = reverse('motos:import-job-status', args=[trabajo.id])
+            datos['errores_url'] = reverse('motos:import-job-errors', args=[trabajo.id]) if trabajo.filas_fallidas else None
+            return Response(datos)
+
+        return Response({
+            'job_id': trabajo.id,
+            'estado': trabajo.estado,
+            'status_url': reverse('motos:import-job-status', args=[trabajo.id]),
+            'message': 'Importación en cola. Consulte el estado para ver el progreso.'
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 class ImportInventoryView(APIView, ImportValidationMixin):
-    """Vista para importar inventario de motocicletas"""
+    """
+    Vista para importar inventario de motocicletas.
+
+    El archivo se procesa por bloques con ImportadorInventario, así que el uso de
+    memoria no depende del tamaño del archivo.
+    """
     permission_classes = [AllowAny]
     
     def post(self, request):
@@ -76,24 +136,13 @@ class ImportInventoryView(APIView, ImportValidationMixin):
             if not is_valid:
                 return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Leer datos
-            data, error = self.read_file_data(file_obj)
-            if error:
-                return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Validar columnas requeridas
-            required_columns = ['marca', 'modelo', 'color', 'precio_venta', 'numero_chasis']
-            is_valid, message = self.validate_required_columns(data, required_columns)
-            if not is_valid:
-                return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
-            
             # Procesar datos
             preview_mode = request.data.get('preview', 'false').lower() == 'true'
             
             if preview_mode:
-                return self.preview_import(data)
+                return self.preview_import(file_obj)
             else:
-                return self.execute_import(data)
+                return self.execute_import(file_obj)
                 
         except Exception as e:
             return Response(
@@ -101,119 +150,13 @@ class ImportInventoryView(APIView, ImportValidationMixin):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-    def preview_import(self, data):
-        """Muestra una vista previa de los datos a importar"""
-        preview_items = []
-        errors = []
-        
-        for i, row in enumerate(data[:10]):  # Mostrar solo primeros 10
-            item = {
-                'row': i + 1,
-                'marca': row.get('marca', ''),
-                'modelo': row.get('modelo', ''),
-                'color': row.get('color', ''),
-                'precio_venta': row.get('precio_venta', ''),
-                'numero_chasis': row.get('numero_chasis', ''),
-                'status': 'pending'
-            }
-            
-            # Validaciones básicas
-            row_errors = []
-            if not row.get('marca'):
-                row_errors.append('Marca requerida')
-            if not row.get('modelo'):
-                row_errors.append('Modelo requerido')
-            if not row.get('numero_chasis'):
-                row_errors.append('Número de chasis requerido')
-            
-            # Verificar duplicados
-            if MotoInventario.objects.filter(numero_chasis=row.get('numero_chasis')).exists():
-                row_errors.append('Chasis ya existe')
-            
-            if row_errors:
-                item['status'] = 'error'
-                item['errors'] = row_errors
-                errors.extend([f"Fila {i+1}: {err}" for err in row_errors])
-            else:
-                item['status'] = 'ok'
-            
-            preview_items.append(item)
-        
-        return Response({
-            'preview': True,
-            'total_rows': len(data),
-            'preview_rows': len(preview_items),
-            'items': preview_items,
-            'errors': errors,
-            'can_import': len(errors) == 0
-        })
+    def preview_import(self, file_obj):
+        """Vista previa: valida el archivo completo y muestra las primeras 10 filas"""
+        return self.vista_previa(ImportadorInventario(), file_obj)
     
-    def execute_import(self, data):
-        """Ejecuta la importación real"""
-        created_count = 0
-        error_count = 0
-        errors = []
-        
-        with transaction.atomic():
-            try:
-                for i, row in enumerate(data):
-                    try:
-                        # Obtener o crear modelo
-                        modelo, created_modelo = MotoModelo.objects.get_or_create(
-                            marca=row['marca'],
-                            modelo=row['modelo'],
-                            defaults={
-                                'cilindrada': row.get('cilindrada', 150),
-                                'tipo': row.get('tipo', 'scooter'),
-                                'precio_base': row.get('precio_base', row.get('precio_venta', 0))
-                            }
-                        )
-                        
-                        # Obtener proveedor si se especifica
-                        proveedor = None
-                        if row.get('proveedor'):
-                            proveedor, _ = Proveedor.objects.get_or_create(
-                                nombre=row['proveedor'],
-                                defaults={
-                                    'contacto': row.get('contacto_proveedor', ''),
-                                    'telefono': row.get('telefono_proveedor', ''),
-                                    'email': row.get('email_proveedor', ''),
-                                    'activo': True
-                                }
-                            )
-                        
-                        # Crear inventario
-                        inventario = MotoInventario.objects.create(
-                            modelo=modelo,
-                            color=row['color'],
-                            numero_chasis=row['numero_chasis'],
-                            precio_venta=row['precio_venta'],
-                            precio_costo=row.get('precio_costo', row['precio_venta'] * 0.8),
-                            proveedor=proveedor,
-                            disponible=row.get('disponible', True),
-                            notas=row.get('notas', f'Importado el {timezone.now().date()}')
-                        )
-                        
-                        created_count += 1
-                        
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f"Fila {i+1}: {str(e)}")
-                        
-                return Response({
-                    'success': True,
-                    'created_count': created_count,
-                    'error_count': error_count,
-                    'errors': errors,
-                    'message': f'Importación completada. {created_count} registros creados, {error_count} errores.'
-                })
-                
-            except Exception as e:
-                transaction.rollback()
-                return Response(
-                    {'error': f'Error en la transacción: {str(e)}'}, 
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+    def execute_import(self, file_obj):
+        """Encola la importación real; el worker procesar_importaciones la ejecuta"""
+        return self.encolar_importacion('inventario', ImportadorInventario, file_obj)
 
 
 class ImportLocationsView(APIView, ImportValidationMixin):
@@ -228,24 +171,13 @@ class ImportLocationsView(APIView, ImportValidationMixin):
             if not is_valid:
                 return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Leer datos
-            data, error = self.read_file_data(file_obj)
-            if error:
-                return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Validar columnas requeridas
-            required_columns = ['almacen_nombre', 'zona_nombre', 'pasillo_nombre', 'ubicacion_nombre']
-            is_valid, message = self.validate_required_columns(data, required_columns)
-            if not is_valid:
-                return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
-            
             # Procesar datos
             preview_mode = request.data.get('preview', 'false').lower() == 'true'
             
             if preview_mode:
-                return self.preview_import(data)
+                return self.preview_import(file_obj)
             else:
-                return self.execute_import(data)
+                return self.execute_import(file_obj)
                 
         except Exception as e:
             return Response(
@@ -253,134 +185,65 @@ class ImportLocationsView(APIView, ImportValidationMixin):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-    def preview_import(self, data):
-        """Vista previa de ubicaciones"""
-        preview_items = []
-        errors = []
-        
-        for i, row in enumerate(data[:10]):
-            item = {
-                'row': i + 1,
-                'almacen_nombre': row.get('almacen_nombre', ''),
-                'zona_nombre': row.get('zona_nombre', ''),
-                'pasillo_nombre': row.get('pasillo_nombre', ''),
-                'ubicacion_nombre': row.get('ubicacion_nombre', ''),
-                'status': 'pending'
-            }
-            
-            # Validaciones
-            row_errors = []
-            if not row.get('almacen_nombre'):
-                row_errors.append('Nombre de almacén requerido')
-            if not row.get('zona_nombre'):
-                row_errors.append('Nombre de zona requerido')
-            if not row.get('ubicacion_nombre'):
-                row_errors.append('Nombre de ubicación requerido')
-            
-            if row_errors:
-                item['status'] = 'error'
-                item['errors'] = row_errors
-                errors.extend([f"Fila {i+1}: {err}" for err in row_errors])
-            else:
-                item['status'] = 'ok'
-            
-            preview_items.append(item)
+    def preview_import(self, file_obj):
+        """Vista previa: valida el archivo completo y muestra las primeras 10 filas"""
+        return self.vista_previa(ImportadorUbicaciones(), file_obj)
+    
+    def execute_import(self, file_obj):
+        """Encola la importación de ubicaciones; el worker procesar_importaciones la ejecuta"""
+        return self.encolar_importacion('ubicaciones', ImportadorUbicaciones, file_obj)
+
+
+class ImportJobStatusView(APIView):
+    """Estado y progreso de un trabajo de importación en segundo plano"""
+    permission_classes = [AllowAny]
+    
+    def get(self, request, job_id):
+        try:
+            trabajo = TrabajoImportacion.objects.get(id=job_id)
+        except TrabajoImportacion.DoesNotExist:
+            return Response({'error': 'Trabajo de importación no encontrado'}, status=status.HTTP_404_NOT_FOUND)
         
-        return Response({
-            'preview': True,
-            'total_rows': len(data),
-            'preview_rows': len(preview_items),
-            'items': preview_items,
-            'errors': errors,
-            'can_import': len(errors) == 0
-        })
+        datos = TrabajoImportacionService().estado(trabajo)
+        datos['errores_url'] = reverse('motos:import-job-errors', args=[trabajo.id]) if trabajo.filas_fallidas else None
+        return Response(datos)
+
+
+class ImportJobErrorsView(APIView):
+    """Descarga en CSV de los errores por fila de un trabajo de importación"""
+    permission_classes = [AllowAny]
     
-    def execute_import(self, data):
-        """Ejecuta la importación de ubicaciones"""
-        created_count = 0
-        error_count = 0
-        errors = []
+    def get(self, request, job_id):
+        try:
+            trabajo = TrabajoImportacion.objects.get(id=job_id)
+        except TrabajoImportacion.DoesNotExist:
+            return Response({'error': 'Trabajo de importación no encontrado'}, status=status.HTTP_404_NOT_FOUND)
         
-        with transaction.atomic():
-            try:
-                for i, row in enumerate(data):
-                    try:
-                        # Obtener o crear almacén
-                        almacen, _ = Almacen.objects.get_or_create(
-                            nombre=row['almacen_nombre'],
-                            defaults={
-                                'codigo': row.get('almacen_codigo', row['almacen_nombre'][:10]),
-                                'direccion': row.get('almacen_direccion', ''),
-                                'descripcion': row.get('almacen_descripcion', ''),
-                                'activo': True
-                            }
-                        )
-                        
-                        # Obtener o crear zona
-                        zona, _ = Zona.objects.get_or_create(
-                            almacen=almacen,
-                            nombre=row['zona_nombre'],
-                            defaults={
-                                'codigo': row.get('zona_codigo', row['zona_nombre'][:10]),
-                                'tipo': row.get('zona_tipo', 'almacenamiento'),
-                                'capacidad_maxima': row.get('zona_capacidad', 100),
-                                'descripcion': row.get('zona_descripcion', ''),
-                                'activo': True
-                            }
-                        )
-                        
-                        # Obtener o crear pasillo
-                        pasillo, _ = Pasillo.objects.get_or_create(
-                            zona=zona,
-                            nombre=row.get('pasillo_nombre', 'A'),
-                            defaults={
-                                'codigo': row.get('pasillo_codigo', row.get('pasillo_nombre', 'A')),
-                                'numero_orden': row.get('pasillo_orden', 1),
-                                'activo': True
-                            }
-                        )
-                        
-                        # Crear ubicación
-                        ubicacion = Ubicacion.objects.create(
-                            pasillo=pasillo,
-                            nombre=row['ubicacion_nombre'],
-                            codigo=row.get('ubicacion_codigo', row['ubicacion_nombre']),
-                            tipo=row.get('ubicacion_tipo', 'estante'),
-                            nivel=row.get('ubicacion_nivel', ''),
-                            posicion=row.get('ubicacion_posicion', ''),
-                            capacidad_maxima=row.get('ubicacion_capacidad', 1),
-                            largo_cm=row.get('largo_cm'),
-                            ancho_cm=row.get('ancho_cm'),
-                            alto_cm=row.get('alto_cm'),
-                            notas=row.get('ubicacion_notas', f'Importado el {timezone.now().date()}')
-                        )
-                        
-                        created_count += 1
-                        
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f"Fila {i+1}: {str(e)}")
-                        
-                return Response({
-                    'success': True,
-                    'created_count': created_count,
-                    'error_count': error_count,
-                    'errors': errors,
-                    'message': f'Importación completada. {created_count} ubicaciones creadas, {error_count} errores.'
-                })
-                
-            except Exception as e:
-                transaction.rollback()
-                return Response(
-                    {'error': f'Error en la transacción: {str(e)}'}, 
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="errores_importacion_{trabajo.id}.csv"'
+        writer = csv.writer(response)
+        writer.writerow(['fila', 'errores'])
+        for error in trabajo.errores:
+            writer.writerow([error['fila'], '; '.join(error['errores'])])
+        return response
 
 
 class ImportValidationView(APIView):
-    """Vista para validar archivos de importación sin procesarlos"""
+    """
+    Vista para validar archivos de importación sin procesarlos.
+
+    Valida el archivo completo con las mismas reglas vectorizadas de la
+    importación y devuelve un resumen más una página de errores por fila
+    (?page=1&page_size=50, también aceptados en el cuerpo del formulario).
+    """
     permission_classes = [AllowAny]
     
+    IMPORTADORES = {
+        'inventory': ImportadorInventario,
+        'locations': ImportadorUbicaciones,
+    }
+    MAX_PAGE_SIZE = 500
+    
     def post(self, request):
         try:
             file_obj = request.FILES.get('file')
@@ -400,61 +263,52 @@ class ImportValidationView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Leer datos para validación
+            # Validar según el tipo
+            importador_cls = self.IMPORTADORES.get(import_type)
+            if importador_cls is None:
+                return Response(
+                    {'error': 'Tipo de importación no válido'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
             try:
-                if filename.endswith('.xlsx'):
-                    df = pd.read_excel(file_obj)
-                    data = df.to_dict('records')
-                elif filename.endswith('.csv'):
-                    df = pd.read_csv(file_obj)
-                    data = df.to_dict('records')
-                elif filename.endswith('.json'):
-                    data = json.load(file_obj)
-                
-                # Validar según el tipo
-                if import_type == 'inventory':
-                    required_columns = ['marca', 'modelo', 'color', 'precio_venta', 'numero_chasis']
-                elif import_type == 'locations':
-                    required_columns = ['almacen_nombre', 'zona_nombre', 'pasillo_nombre', 'ubicacion_nombre']
-                else:
-                    return Response(
-                        {'error': 'Tipo de importación no válido'}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Verificar columnas
-                if data:
-                    first_row = data[0]
-                    missing_columns = [col for col in required_columns if col not in first_row]
-                    
-                    if missing_columns:
-                        return Response({
-                            'valid': False,
-                            'error': f'Columnas faltantes: {", ".join(missing_columns)}',
-                            'required_columns': required_columns,
-                            'found_columns': list(first_row.keys()) if first_row else []
-                        })
-                    
-                    return Response({
-                        'valid': True,
-                        'total_rows': len(data),
-                        'columns': list(first_row.keys()),
-                        'sample_data': data[:5]  # Muestra primeros 5 registros
-                    })
-                else:
-                    return Response(
-                        {'valid': False, 'error': 'Archivo vacío'}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                    
+                pagina = max(1, int(request.query_params.get('page', request.data.get('page', 1))))
+                tamano_pagina = int(request.query_params.get('page_size', request.data.get('page_size', 50)))
+                tamano_pagina = min(max(1, tamano_pagina), self.MAX_PAGE_SIZE)
+            except (TypeError, ValueError):
+                return Response(
+                    {'error': 'page y page_size deben ser números enteros'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            importador = importador_cls()
+            try:
+                resumen = importador.validar(
+                    leer_en_bloques(file_obj, importador.tamano_bloque), pagina, tamano_pagina
+                )
+            except ValueError as e:
+                # Columnas faltantes o archivo ilegible
+                return Response({
+                    'valid': False,
+                    'error': str(e),
+                    'required_columns': importador.COLUMNAS_REQUERIDAS,
+                })
             except Exception as e:
                 return Response(
                     {'valid': False, 'error': f'Error al leer archivo: {str(e)}'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            
+            if resumen['total_rows'] == 0:
+                return Response(
+                    {'valid': False, 'error': 'Archivo vacío'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            return Response(resumen)
                 
         except Exception as e:
             return Response(
                 {'error': f'Error de validación: {str(e)}'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
@@ -0,0 +1,791 @@
+import io
+import json
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from datetime import timedelta
+from decimal import Decimal
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    MotoModelo, MotoInventario, Proveedor, TrabajoImportacion, VersionDatos,
+    Almacen, Zona, Pasillo, Ubicacion
+)
+from .services import StockModeloService
+
+
+# Encabezados alternativos aceptados (p. ej. los de la plantilla de exportación)
+ALIAS_COLUMNAS = {
+    'chasis': 'numero_chasis',
+    'año': 'ano',
+    'cilindrada': 'cilindraje',
+    'precio_costo': 'precio_compra',
+    'cantidad': 'cantidad_stock',
+}
+
+
+def normalizar_columnas(df):
+    """Encabezados en minúsculas, sin espacios y con los alias resueltos"""
+    columnas = [str(columna).strip().lower().replace(' ', '_') for columna in df.columns]
+    df.columns = [ALIAS_COLUMNAS.get(columna, columna) for columna in columnas]
+    return df
+
+
+def leer_en_bloques(file_obj, tamano_bloque):
+    """
+    Lee un archivo CSV, XLSX o JSON en DataFrames de a lo sumo tamano_bloque filas.
+
+    Todas las celdas llegan como texto (las vacías como ''), la conversión de
+    tipos la hace la validación de cada importador.
+    """
+    nombre = file_obj.name.lower()
+
+    if nombre.endswith('.csv'):
+        lector = pd.read_csv(file_obj, chunksize=tamano_bloque, dtype=str, keep_default_na=False)
+        for bloque in lector:
+            yield normalizar_columnas(bloque)
+
+    elif nombre.endswith('.xlsx'):
+        from openpyxl import load_workbook
+
+        libro = load_workbook(file_obj, read_only=True, data_only=True)
+        try:
+            filas = libro.active.iter_rows(values_only=True)
+            encabezados = next(filas, None)
+            if encabezados is None:
+                return
+            encabezados = ['' if valor is None else str(valor) for valor in encabezados]
+            bloque = []
+            for fila in filas:
+                if all(valor is None for valor in fila):
+                    continue
+                bloque.append(['' if valor is None else str(valor) for valor in fila])
+                if len(bloque) >= tamano_bloque:
+                    yield normalizar_columnas(pd.DataFrame(bloque, columns=encabezados))
+                    bloque = []
+            if bloque:
+                yield normalizar_columnas(pd.DataFrame(bloque, columns=encabezados))
+        finally:
+            libro.close()
+
+    elif nombre.endswith('.json'):
+        datos = json.load(file_obj)
+        if isinstance(datos, dict):
+            datos = [datos]
+        for inicio in range(0, len(datos), tamano_bloque):
+            bloque = pd.DataFrame(datos[inicio:inicio + tamano_bloque]).fillna('').astype(str)
+            yield normalizar_columnas(bloque)
+
+
+class ImportadorBase(ABC):
+    """
+    Estado y reporte comunes a los importadores por bloques.
+
+    Cada importador define validar_bloque (usado por validar y por su importar).
+    """
+
+    TAMANO_BLOQUE = 5000
+    COLUMNAS_REQUERIDAS = []
+    DESCRIPCION_CREADOS = 'registros creados'
+
+    def __init__(self, tamano_bloque=None):
+        self.tamano_bloque = tamano_bloque or self.TAMANO_BLOQUE
+        self.total_filas = 0
+        self.creados = 0
+        self.errores = []
+
+    def columnas_faltantes(self, df):
+        return [columna for columna in self.COLUMNAS_REQUERIDAS if columna not in df.columns]
+
+    def cargar_referencias(self):
+        """Carga en memoria lo que la validación necesita consultar de la base"""
+
+    @abstractmethod
+    def validar_bloque(self, df, fila_inicial):
+        """Returns: (DataFrame con las filas válidas, dict fila -> [errores])"""
+
+    def aplicar_reglas(self, datos, reglas):
+        """
+        Evalúa reglas vectorizadas [(máscara booleana, mensaje)] sobre un bloque
+
+        Returns:
+            tuple: (máscara de filas inválidas, dict fila -> [errores])
+        """
+        errores = {}
+        invalida = pd.Series(False, index=datos.index)
+        for mascara, mensaje in reglas:
+            mascara = mascara.fillna(False).astype(bool)
+            invalida |= mascara
+            for fila in datos.loc[mascara, 'fila'].tolist():
+                errores.setdefault(fila, []).append(mensaje)
+        return invalida, errores
+
+    def validar(self, bloques, pagina=1, tamano_pagina=50):
+        """
+        Valida el archivo completo sin escribir nada.
+
+        Returns:
+            dict: Resumen (filas, errores por tipo) y una página de errores por fila
+
+        Raises:
+            ValueError: Si al archivo le faltan columnas requeridas
+        """
+        self.cargar_referencias()
+        errores_por_tipo = {}
+        columnas = []
+        fila_inicial = 1
+        for df in bloques:
+            if fila_inicial == 1:
+                columnas = list(df.columns)
+                faltantes = self.columnas_faltantes(df)
+                if faltantes:
+                    raise ValueError(f"Columnas faltantes: {', '.join(faltantes)}")
+
+            _, errores = self.validar_bloque(df, fila_inicial)
+            self.registrar_errores(errores)
+            for mensajes in errores.values():
+                for mensaje in mensajes:
+                    errores_por_tipo[mensaje] = errores_por_tipo.get(mensaje, 0) + 1
+
+            fila_inicial += len(df)
+            self.total_filas += len(df)
+
+        total_paginas = max(1, -(-len(self.errores) // tamano_pagina))
+        inicio = (pagina - 1) * tamano_pagina
+        return {
+            'valid': self.total_filas > 0 and not self.errores,
+            'total_rows': self.total_filas,
+            'filas_validas': self.total_filas - len(self.errores),
+            'filas_con_error': len(self.errores),
+            'errores_por_tipo': errores_por_tipo,
+            'columns': columnas,
+            'required_columns': self.COLUMNAS_REQUERIDAS,
+            'page': pagina,
+            'page_size': tamano_pagina,
+            'total_pages': total_paginas,
+            'errores': self.errores[inicio:inicio + tamano_pagina],
+        }
+
+    def registrar_errores(self, errores):
+        for fila in sorted(errores):
+            self.errores.append({'fila': fila, 'errores': errores[fila]})
+
+    def resultado(self):
+        error_count = len(self.errores)
+        return {
+            'success': True,
+            'total_rows': self.total_filas,
+            'created_count': self.creados,
+            'error_count': error_count,
+            'errors': [f"Fila {error['fila']}: {', '.join(error['errores'])}" for error in self.errores],
+            'message': f'Importación completada. {self.creados} {self.DESCRIPCION_CREADOS}, {error_count} errores.'
+        }
+
+
+class ImportadorInventario(ImportadorBase):
+    """
+    Importación de inventario por bloques con inserciones masivas.
+
+    Modelos, proveedores y chasis existentes se cargan una sola vez en
+    diccionarios en memoria; cada bloque se valida de forma vectorizada y las
+    filas válidas se escriben con bulk_create. Las filas con errores se omiten
+    y quedan en el reporte (fila y motivos), el resto se importa.
+    """
+
+    TAMANO_LOTE = 1000
+    COLUMNAS_REQUERIDAS = ['marca', 'modelo', 'color', 'precio_venta', 'numero_chasis']
+    # Límites de los DecimalField/IntegerField de MotoModelo y MotoInventario
+    PRECIO_MAXIMO = 10 ** 10
+    TASA_MAXIMA = 10 ** 6
+    ANO_MINIMO = 1900
+
+    def __init__(self, tamano_bloque=None):
+        super().__init__(tamano_bloque)
+        self.modelos_creados = 0
+        self.proveedores_creados = 0
+
+    # -- Carga de referencias -------------------------------------------------
+
+    def cargar_referencias(self):
+        """Consulta una vez modelos, proveedores y chasis existentes"""
+        self.modelos_por_clave = {}
+        self.modelos_por_nombre = {}
+        for modelo_id, marca, modelo, ano in MotoModelo.objects.order_by('ano').values_list(
+            'id', 'marca', 'modelo', 'ano'
+        ):
+            self.modelos_por_clave[(marca.casefold(), modelo.casefold(), ano)] = modelo_id
+            # Sin año en el archivo se usa el modelo más reciente con esa marca y nombre
+            self.modelos_por_nombre[(marca.casefold(), modelo.casefold())] = modelo_id
+
+        self.proveedores = {
+            nombre.casefold(): proveedor_id
+            for proveedor_id, nombre in Proveedor.objects.values_list('id', 'nombre')
+        }
+        self.chasis_existentes = set(
+            MotoInventario.objects.exclude(chasis__isnull=True).values_list('chasis', flat=True)
+        )
+        self.chasis_archivo = set()
+
+    # -- Validación -----------------------------------------------------------
+
+    def validar_bloque(self, df, fila_inicial):
+        """
+        Valida un bloque completo sin recorrerlo fila por fila.
+
+        Args:
+            df (DataFrame): Bloque con columnas normalizadas
+            fila_inicial (int): Número (1-based) de la primera fila del bloque
+
+        Returns:
+            tuple: (DataFrame con las filas válidas y columnas tipadas, dict fila -> [errores])
+        """
+        df = df.reset_index(drop=True)
+        vacio = pd.Series('', index=df.index)
+
+        def texto(columna):
+            return df[columna].astype(str).str.strip() if columna in df.columns else vacio
+
+        def numero(columna):
+            if columna not in df.columns:
+                return pd.Series(float('nan'), index=df.index)
+            return pd.to_numeric(texto(columna).str.replace(',', '', regex=False), errors='coerce')
+
+        datos = pd.DataFrame({
+            'fila': range(fila_inicial, fila_inicial + len(df)),
+            'marca': texto('marca'),
+            'modelo': texto('modelo'),
+            'color': texto('color'),
+            'chasis': texto('numero_chasis'),
+            'proveedor': texto('proveedor'),
+            'precio_venta': numero('precio_venta'),
+            'precio_compra': numero('precio_compra'),
+            'ano': numero('ano'),
+            'cilindraje': numero('cilindraje'),
+            'cantidad_stock': numero('cantidad_stock'),
+            'descuento_porcentaje': numero('descuento_porcentaje'),
+            'tasa_dolar': numero('tasa_dolar'),
+            'fecha_compra': pd.to_datetime(texto('fecha_compra'), errors='coerce', format='mixed').dt.date
+            if 'fecha_compra' in df.columns else pd.Series(None, index=df.index, dtype=object),
+        })
+
+        chasis_en_bloque = datos['chasis'].where(datos['chasis'] != '')
+        reglas = [
+            (datos['marca'] == '', 'Marca requerida'),
+            (datos['modelo'] == '', 'Modelo requerido'),
+            (datos['color'] == '', 'Color requerido'),
+            (datos['chasis'] == '', 'Número de chasis requerido'),
+            (datos['precio_venta'].isna() | (datos['precio_venta'] <= 0), 'Precio de venta inválido'),
+            (datos['precio_venta'] >= self.PRECIO_MAXIMO, 'Precio de venta fuera de rango'),
+            (texto('precio_compra').ne('') & (datos['precio_compra'].isna() | (datos['precio_compra'] < 0)),
+             'Precio de compra inválido'),
+            (datos['precio_compra'] >= self.PRECIO_MAXIMO, 'Precio de compra fuera de rango'),
+            (texto('ano').ne('') & (datos['ano'].isna() | (datos['ano'] % 1 != 0)
+                                    | ~datos['ano'].between(self.ANO_MINIMO, timezone.now().year + 1)),
+             'Año inválido'),
+            (texto('cantidad_stock').ne('') & (datos['cantidad_stock'].isna() | (datos['cantidad_stock'] < 1)),
+             'La cantidad debe ser un número mayor a 0'),
+            (texto('descuento_porcentaje').ne('') & datos['descuento_porcentaje'].isna(),
+             'El descuento debe ser un número válido'),
+            (texto('tasa_dolar').ne('') & ~datos['tasa_dolar'].between(0, self.TASA_MAXIMA, inclusive='neither'),
+             'Tasa del dólar inválida'),
+            (datos['descuento_porcentaje'].notna() & ~datos['descuento_porcentaje'].between(0, 100),
+             'El descuento debe estar entre 0 y 100'),
+            (texto('fecha_compra').ne('') & datos['fecha_compra'].isna(), 'Fecha de compra inválida (use YYYY-MM-DD)'),
+            (datos['chasis'].str.len() > 100, 'Número de chasis demasiado largo'),
+            (chasis_en_bloque.isin(self.chasis_existentes), 'Chasis ya existe'),
+            (chasis_en_bloque.notna() & (chasis_en_bloque.duplicated(keep='first')
+                                         | chasis_en_bloque.isin(self.chasis_archivo)),
+             'Chasis duplicado en el archivo'),
+        ]
+        self.chasis_archivo.update(chasis_en_bloque.dropna().tolist())
+
+        invalida, errores = self.aplicar_reglas(datos, reglas)
+        validas = datos[~invalida].copy()
+        validas['cantidad_stock'] = validas['cantidad_stock'].fillna(1).astype('int64')
+        validas['descuento_porcentaje'] = validas['descuento_porcentaje'].fillna(0)
+        return validas, errores
+
+    # -- Escritura ------------------------------------------------------------
+
+    def resolver_proveedores(self, validas):
+        """Crea de una vez los proveedores del bloque que aún no existen"""
+        nuevos = {}
+        for nombre in validas.loc[validas['proveedor'] != '', 'proveedor'].unique().tolist():
+            if nombre.casefold() not in self.proveedores and nombre.casefold() not in nuevos:
+                nuevos[nombre.casefold()] = Proveedor(
+                    nombre=nombre, direccion='', ciudad='', notas=f'Importado el {timezone.now().date()}'
+                )
+        if nuevos:
+            for proveedor in Proveedor.objects.bulk_create(list(nuevos.values()), batch_size=self.TAMANO_LOTE):
+                self.proveedores[proveedor.nombre.casefold()] = proveedor.id
+            self.proveedores_creados += len(nuevos)
+
+    def resolver_modelos(self, validas):
+        """
+        Asigna el modelo de cada fila, creando con bulk_create los que faltan.
+
+        Returns:
+            Series: modelo_id por fila
+        """
+        ano_actual = timezone.now().year
+        claves = []
+        por_crear = {}
+        for marca, modelo, ano, precio_venta, precio_compra, cilindraje, proveedor in zip(
+            validas['marca'].tolist(), validas['modelo'].tolist(), validas['ano'].tolist(),
+            validas['precio_venta'].tolist(), validas['precio_compra'].tolist(),
+            validas['cilindraje'].tolist(), validas['proveedor'].tolist()
+        ):
+            if pd.isna(ano):
+                clave = self.modelos_por_nombre.get((marca.casefold(), modelo.casefold()))
+                ano = ano_actual
+            else:
+                ano = int(ano)
+                clave = None
+            clave = clave or (marca.casefold(), modelo.casefold(), ano)
+            claves.append(clave)
+
+            if isinstance(clave, int) or clave in self.modelos_por_clave or clave in por_crear:
+                continue
+            por_crear[clave] = MotoModelo(
+                marca=marca, modelo=modelo, ano=ano,
+                precio_venta=Decimal(str(precio_venta)),
+                precio_compra=Decimal(str(round(precio_venta * 0.8, 2) if pd.isna(precio_compra) else precio_compra)),
+                cilindraje=None if pd.isna(cilindraje) else int(cilindraje),
+                proveedor_id=self.proveedores.get(proveedor.casefold()) if proveedor else None,
+            )
+
+        if por_crear:
+            creados = MotoModelo.objects.bulk_create(list(por_crear.values()), batch_size=self.TAMANO_LOTE)
+            for clave, modelo in zip(por_crear.keys(), creados):
+                self.modelos_por_clave[clave] = modelo.id
+                self.modelos_por_nombre.setdefault(clave[:2], modelo.id)
+            self.modelos_creados += len(por_crear)
+
+        return pd.Series(
+            [clave if isinstance(clave, int) else self.modelos_por_clave[clave] for clave in claves],
+            index=validas.index
+        )
+
+    def escribir_bloque(self, validas):
+        """Returns: set con los ids de los modelos a los que se agregó inventario"""
+        if validas.empty:
+            return set()
+        self.resolver_proveedores(validas)
+        validas = validas.assign(modelo_id=self.resolver_modelos(validas))
+
+        inventario = [
+            MotoInventario(
+                modelo_id=modelo_id,
+                color=color,
+                chasis=chasis,
+                cantidad_stock=cantidad,
+                descuento_porcentaje=Decimal(str(descuento)),
+                precio_compra_individual=None if pd.isna(precio_compra) else Decimal(str(precio_compra)),
+                tasa_dolar=None if pd.isna(tasa_dolar) else Decimal(str(tasa_dolar)),
+                fecha_compra=None if pd.isna(fecha_compra) else fecha_compra,
+            )
+            for modelo_id, color, chasis, cantidad, descuento, precio_compra, tasa_dolar, fecha_compra in zip(
+                validas['modelo_id'].tolist(), validas['color'].tolist(), validas['chasis'].tolist(),
+                validas['cantidad_stock'].tolist(), validas['descuento_porcentaje'].tolist(),
+                validas['precio_compra'].tolist(), validas['tasa_dolar'].tolist(),
+                validas['fecha_compra'].tolist()
+            )
+        ]
+        MotoInventario.objects.bulk_create(inventario, batch_size=self.TAMANO_LOTE)
+
+        self.creados += len(inventario)
+        return set(validas['modelo_id'].tolist())
+
+    def importar(self, bloques, progreso=None, atomico=True):
+        """
+        Importa todos los bloques.
+
+        Args:
+            bloques (iterable[DataFrame]): Normalmente leer_en_bloques(...)
+            progreso (callable, opcional): Se llama con el importador tras cada bloque
+            atomico (bool): Si es True todo el archivo es una transacción; si es
+                False cada bloque se confirma por separado (trabajos en segundo
+                plano, para que el progreso sea visible mientras avanzan)
+
+        Raises:
+            ValueError: Si al archivo le faltan columnas requeridas
+        """
+        with transaction.atomic() if atomico else nullcontext():
+            self.cargar_referencias()
+            fila_inicial = 1
+            for df in bloques:
+                faltantes = self.columnas_faltantes(df)
+                if faltantes:
+                    raise ValueError(f"Columnas faltantes: {', '.join(faltantes)}")
+
+                with transaction.atomic():
+                    validas, errores = self.validar_bloque(df, fila_inicial)
+                    self.registrar_errores(errores)
+                    modelos = self.escribir_bloque(validas)
+                    # bulk_create no dispara señales: recalcular los resúmenes de los modelos tocados
+                    if modelos:
+                        StockModeloService().reconstruir_todos(modelo_ids=modelos)
+                        VersionDatos.registrar_cambio(Proveedor, MotoModelo, MotoInventario)
+
+                fila_inicial += len(df)
+                self.total_filas += len(df)
+                if progreso:
+                    progreso(self)
+
+        return self.resultado()
+
+    def resultado(self):
+        resultado = super().resultado()
+        resultado['modelos_creados'] = self.modelos_creados
+        resultado['proveedores_creados'] = self.proveedores_creados
+        return resultado
+
+
+class ImportadorUbicaciones(ImportadorBase):
+    """
+    Importación de ubicaciones físicas (almacén > zona > pasillo > ubicación).
+
+    El árbol existente se carga en diccionarios una sola vez. Por cada bloque
+    se crean con un bulk_create los almacenes, zonas y pasillos que falten (un
+    nivel a la vez, porque cada uno necesita los ids del anterior) y luego las
+    ubicaciones en lotes.
+    """
+
+    TAMANO_BLOQUE = 5000
+    TAMANO_LOTE = 1000
+    COLUMNAS_REQUERIDAS = ['almacen_nombre', 'zona_nombre', 'pasillo_nombre', 'ubicacion_nombre']
+    DESCRIPCION_CREADOS = 'ubicaciones creadas'
+    SEPARADOR = '\x1f'
+    COLUMNAS_NUMERICAS = [
+        'zona_capacidad', 'pasillo_orden', 'ubicacion_capacidad', 'largo_cm', 'ancho_cm', 'alto_cm'
+    ]
+
+    def cargar_referencias(self):
+        """Árbol almacén > zona > pasillo y ubicaciones existentes, una consulta por nivel"""
+        self.almacenes = {}
+        self.codigos_almacen = set()
+        for almacen_id, nombre, codigo in Almacen.objects.values_list('id', 'nombre', 'codigo'):
+            self.almacenes.setdefault(nombre.casefold(), almacen_id)
+            self.codigos_almacen.add(codigo.casefold())
+
+        self.zonas = {}
+        self.codigos_zona = set()
+        for zona_id, almacen_id, nombre, codigo in Zona.objects.values_list('id', 'almacen_id', 'nombre', 'codigo'):
+            self.zonas.setdefault((almacen_id, nombre.casefold()), zona_id)
+            self.codigos_zona.add((almacen_id, codigo.casefold()))
+
+        self.pasillos = {}
+        self.codigos_pasillo = set()
+        for pasillo_id, zona_id, nombre, codigo in Pasillo.objects.values_list('id', 'zona_id', 'nombre', 'codigo'):
+            self.pasillos.setdefault((zona_id, nombre.casefold()), pasillo_id)
+            self.codigos_pasillo.add((zona_id, codigo.casefold()))
+
+        self.ubicaciones_existentes = set(
+            self.SEPARADOR.join(valor.casefold() for valor in ubicacion)
+            for ubicacion in Ubicacion.objects.values_list(
+                'pasillo__zona__almacen__nombre', 'pasillo__zona__nombre', 'pasillo__nombre', 'codigo'
+            )
+        )
+        self.ubicaciones_archivo = set()
+
+    def validar_bloque(self, df, fila_inicial):
+        df = df.reset_index(drop=True)
+        vacio = pd.Series('', index=df.index)
+
+        def texto(columna, defecto=None):
+            valores = df[columna].astype(str).str.strip() if columna in df.columns else vacio
+            return valores if defecto is None else valores.where(valores != '', defecto)
+
+        datos = pd.DataFrame({
+            'fila': range(fila_inicial, fila_inicial + len(df)),
+            'almacen': texto('almacen_nombre'),
+            'almacen_direccion': texto('almacen_direccion'),
+            'almacen_descripcion': texto('almacen_descripcion'),
+            'zona': texto('zona_nombre'),
+            'zona_tipo': texto('zona_tipo', 'almacenamiento'),
+            'zona_descripcion': texto('zona_descripcion'),
+            'pasillo': texto('pasillo_nombre', 'A'),
+            'ubicacion': texto('ubicacion_nombre'),
+            'ubicacion_tipo': texto('ubicacion_tipo', 'estante'),
+            'nivel': texto('ubicacion_nivel'),
+            'posicion': texto('ubicacion_posicion'),
+            'notas': texto('ubicacion_notas', f'Importado el {timezone.now().date()}'),
+        })
+        datos['almacen_codigo'] = texto('almacen_codigo').where(texto('almacen_codigo') != '', datos['almacen'].str[:10])
+        datos['zona_codigo'] = texto('zona_codigo').where(texto('zona_codigo') != '', datos['zona'].str[:10])
+        datos['pasillo_codigo'] = texto('pasillo_codigo').where(texto('pasillo_codigo') != '', datos['pasillo'])
+        datos['codigo'] = texto('ubicacion_codigo').where(texto('ubicacion_codigo') != '', datos['ubicacion'])
+
+        clave = datos['almacen'].str.casefold()
+        for columna in ['zona', 'pasillo', 'codigo']:
+            clave = clave + self.SEPARADOR + datos[columna].str.casefold()
+
+        reglas = [
+            (datos['almacen'] == '', 'Nombre de almacén requerido'),
+            (datos['zona'] == '', 'Nombre de zona requerido'),
+            (datos['ubicacion'] == '', 'Nombre de ubicación requerido'),
+            (datos['almacen_codigo'].str.len() > 10, 'Código de almacén demasiado largo'),
+            (datos['ubicacion'].str.len() > 50, 'Nombre de ubicación demasiado largo'),
+            (datos['codigo'].str.len() > 20, 'Código de ubicación demasiado largo'),
+            (clave.isin(self.ubicaciones_existentes), 'Ubicación ya existe'),
+            (clave.duplicated(keep='first') | clave.isin(self.ubicaciones_archivo), 'Ubicación duplicada en el archivo'),
+        ]
+        for columna in self.COLUMNAS_NUMERICAS:
+            datos[columna] = pd.to_numeric(texto(columna), errors='coerce')
+            reglas.append((
+                texto(columna).ne('') & (datos[columna].isna() | (datos[columna] < 0)),
+                f'{columna} debe ser un número positivo'
+            ))
+        self.ubicaciones_archivo.update(clave.tolist())
+
+        invalida, errores = self.aplicar_reglas(datos, reglas)
+        return datos[~invalida].copy(), errores
+
+    # -- Escritura ------------------------------------------------------------
+
+    def crear_nivel(self, validas, existentes, codigos, columna_padre, columna_nombre, columna_codigo,
+                    construir, errores, descripcion):
+        """
+        Resuelve un nivel del árbol para todas las filas y crea los que faltan con un bulk_create.
+
+        Las filas cuyo nivel nuevo choca con un código ya usado se marcan con error.
+
+        Returns:
+            list: id del nivel por fila (None si la fila quedó con error)
+        """
+        claves = []
+        por_crear = {}
+        for fila in validas.itertuples(index=False):
+            padre = getattr(fila, columna_padre) if columna_padre else None
+            if columna_padre and padre is None:
+                claves.append(None)
+                continue
+            nombre = getattr(fila, columna_nombre).casefold()
+            clave = (padre, nombre) if columna_padre else nombre
+            if clave not in existentes and clave not in por_crear:
+                codigo = getattr(fila, columna_codigo)
+                clave_codigo = (padre, codigo.casefold()) if columna_padre else codigo.casefold()
+                if clave_codigo in codigos:
+                    errores.setdefault(fila.fila, []).append(f'Código de {descripcion} "{codigo}" ya está en uso')
+                    claves.append(None)
+                    continue
+                codigos.add(clave_codigo)
+                por_crear[clave] = construir(fila)
+            claves.append(clave)
+
+        if por_crear:
+            objetos = list(por_crear.values())
+            type(objetos[0]).objects.bulk_create(objetos, batch_size=self.TAMANO_LOTE)
+            for clave, objeto in zip(por_crear, objetos):
+                existentes[clave] = objeto.id
+        return pd.Series([existentes.get(clave) for clave in claves], index=validas.index, dtype=object)
+
+    def escribir_bloque(self, validas, errores):
+        if validas.empty:
+            return
+
+        validas['almacen_id'] = self.crear_nivel(
+            validas, self.almacenes, self.codigos_almacen, None, 'almacen', 'almacen_codigo',
+            lambda fila: Almacen(
+                nombre=fila.almacen, codigo=fila.almacen_codigo, direccion=fila.almacen_direccion,
+                descripcion=fila.almacen_descripcion, activo=True
+            ),
+            errores, 'almacén'
+        )
+        validas['zona_id'] = self.crear_nivel(
+            validas, self.zonas, self.codigos_zona, 'almacen_id', 'zona', 'zona_codigo',
+            lambda fila: Zona(
+                almacen_id=fila.almacen_id, nombre=fila.zona, codigo=fila.zona_codigo, tipo=fila.zona_tipo,
+                capacidad_maxima=100 if pd.isna(fila.zona_capacidad) else int(fila.zona_capacidad),
+                descripcion=fila.zona_descripcion, activo=True
+            ),
+            errores, 'zona'
+        )
+        validas['pasillo_id'] = self.crear_nivel(
+            validas, self.pasillos, self.codigos_pasillo, 'zona_id', 'pasillo', 'pasillo_codigo',
+            lambda fila: Pasillo(
+                zona_id=fila.zona_id, nombre=fila.pasillo, codigo=fila.pasillo_codigo,
+                numero_orden=1 if pd.isna(fila.pasillo_orden) else int(fila.pasillo_orden), activo=True
+            ),
+            errores, 'pasillo'
+        )
+
+        def decimal(valor):
+            return None if pd.isna(valor) else Decimal(str(valor))
+
+        ubicaciones = [
+            Ubicacion(
+                pasillo_id=int(fila.pasillo_id), nombre=fila.ubicacion, codigo=fila.codigo, tipo=fila.ubicacion_tipo,
+                nivel=fila.nivel, posicion=fila.posicion,
+                capacidad_maxima=1 if pd.isna(fila.ubicacion_capacidad) else int(fila.ubicacion_capacidad),
+                largo_cm=decimal(fila.largo_cm), ancho_cm=decimal(fila.ancho_cm), alto_cm=decimal(fila.alto_cm),
+                notas=fila.notas,
+            )
+            for fila in validas.itertuples(index=False)
+            if not pd.isna(fila.pasillo_id)
+        ]
+        Ubicacion.objects.bulk_create(ubicaciones, batch_size=self.TAMANO_LOTE)
+        self.creados += len(ubicaciones)
+        # bulk_create no dispara señales: invalidar a mano las exportaciones en caché
+        VersionDatos.registrar_cambio(Almacen, Zona, Pasillo, Ubicacion)
+
+    def importar(self, bloques, progreso=None, atomico=True):
+        """Misma interfaz que ImportadorInventario.importar"""
+        with transaction.atomic() if atomico else nullcontext():
+            self.cargar_referencias()
+            fila_inicial = 1
+            for df in bloques:
+                faltantes = self.columnas_faltantes(df)
+                if faltantes:
+                    raise ValueError(f"Columnas faltantes: {', '.join(faltantes)}")
+
+                with transaction.atomic():
+                    validas, errores = self.validar_bloque(df, fila_inicial)
+                    self.escribir_bloque(validas, errores)
+                    self.registrar_errores(errores)
+
+                fila_inicial += len(df)
+                self.total_filas += len(df)
+                if progreso:
+                    progreso(self)
+
+        return self.resultado()
+
+
+IMPORTADORES = {
+    'inventario': ImportadorInventario,
+    'ubicaciones': ImportadorUbicaciones,
+}
+
+
+class TrabajoImportacionService:
+    """
+    Cola de importaciones respaldada por la base de datos (sin broker externo).
+
+    Las vistas encolan el archivo subido (su contenido queda en la base de
+    datos) y, con IMPORTACIONES_EN_SEGUNDO_PLANO, responden de inmediato: el
+    comando procesar_importaciones toma los trabajos pendientes y los procesa
+    bloque a bloque, guardando el progreso después de cada bloque. Sin worker
+    configurado la vista procesa el trabajo en la misma petición.
+    """
+
+    MAX_ERRORES_RESPUESTA = 100
+
+    def encolar(self, tipo, file_obj, usuario=None):
+        file_obj.seek(0)
+        return TrabajoImportacion.objects.create(
+            tipo=tipo,
+            contenido=file_obj.read(),
+            nombre_archivo=file_obj.name,
+            creado_por=usuario if usuario is not None and usuario.is_authenticated else None,
+        )
+
+    def marcar_vencidos(self):
+        """
+        Da por fallidos los trabajos que siguen en 'procesando' después de
+        IMPORTACIONES_MINUTOS_MAXIMOS (el worker que los tomó se cayó).
+
+        No se reintentan: los bloques ya procesados quedaron guardados y volver
+        a importar el archivo completo los duplicaría.
+
+        Returns:
+            int: Cantidad de trabajos marcados
+        """
+        ahora = timezone.now()
+        limite = ahora - timedelta(minutes=settings.IMPORTACIONES_MINUTOS_MAXIMOS)
+        return TrabajoImportacion.objects.filter(estado='procesando', fecha_inicio__lt=limite).update(
+            estado='fallido',
+            fecha_fin=ahora,
+            mensaje_error='El procesamiento se interrumpió; revise las filas importadas y vuelva a subir el resto',
+        )
+
+    def tomar(self, trabajo_id):
+        """Pasa el trabajo a 'procesando' si sigue pendiente; None si otro worker ya lo tomó"""
+        tomado = TrabajoImportacion.objects.filter(id=trabajo_id, estado='pendiente').update(
+            estado='procesando', fecha_inicio=timezone.now()
+        )
+        return TrabajoImportacion.objects.get(id=trabajo_id) if tomado else None
+
+    def tomar_siguiente(self):
+        """
+        Reclama el trabajo pendiente más antiguo.
+
+        El cambio de estado es un UPDATE condicional, así que si corren varios
+        workers cada trabajo lo toma uno solo.
+        """
+        self.marcar_vencidos()
+        while True:
+            trabajo_id = TrabajoImportacion.objects.filter(estado='pendiente').order_by(
+                'fecha_creacion', 'id'
+            ).values_list('id', flat=True).first()
+            if trabajo_id is None:
+                return None
+            trabajo = self.tomar(trabajo_id)
+            if trabajo is not None:
+                return trabajo
+
+    def procesar(self, trabajo):
+        importador = IMPORTADORES[trabajo.tipo]()
+
+        def progreso(importador):
+            TrabajoImportacion.objects.filter(id=trabajo.id).update(
+                filas_procesadas=importador.total_filas,
+                filas_creadas=importador.creados,
+                filas_fallidas=len(importador.errores),
+            )
+
+        try:
+            archivo = io.BytesIO(bytes(trabajo.contenido))
+            archivo.name = trabajo.nombre_archivo
+            resultado = importador.importar(
+                leer_en_bloques(archivo, importador.tamano_bloque), progreso=progreso, atomico=False
+            )
+            trabajo.estado = 'completado'
+        except Exception as e:
+            resultado = importador.resultado()
+            resultado.update({'success': False, 'message': f'Error durante la importación: {str(e)}'})
+            trabajo.estado = 'fallido'
+            trabajo.mensaje_error = str(e)
+
+        resultado.pop('errors', None)
+        trabajo.resultado = resultado
+        trabajo.errores = importador.errores
+        trabajo.filas_procesadas = importador.total_filas
+        trabajo.filas_creadas = importador.creados
+        trabajo.filas_fallidas = len(importador.errores)
+        trabajo.fecha_fin = timezone.now()
+        # El archivo solo se conserva si hay que revisar por qué falló
+        if trabajo.estado == 'completado':
+            trabajo.contenido = b''
+        trabajo.save()
+        return trabajo
+
+    def estado(self, trabajo):
+        """Representación del trabajo para el endpoint de estado"""
+        datos = {
+            'job_id': trabajo.id,
+            'tipo': trabajo.tipo,
+            'estado': trabajo.estado,
+            'nombre_archivo': trabajo.nombre_archivo,
+            'filas_procesadas': trabajo.filas_procesadas,
+            'filas_creadas': trabajo.filas_creadas,
+            'filas_fallidas': trabajo.filas_fallidas,
+            'filas_por_segundo': trabajo.filas_por_segundo,
+            'fecha_creacion': trabajo.fecha_creacion,
+            'fecha_inicio': trabajo.fecha_inicio,
+            'fecha_fin': trabajo.fecha_fin,
+            'mensaje_error': trabajo.mensaje_error,
+            'resultado': None,
+        }
+        if trabajo.estado in ('completado', 'fallido'):
+            datos['resultado'] = dict(
+                trabajo.resultado,
+                errors=[
+                    f"Fila {error['fila']}: {', '.join(error['errores'])}"
+                    for error in trabajo.errores[:self.MAX_ERRORES_RESPUESTA]
+                ]
+            )
+        return datos
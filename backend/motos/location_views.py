@@ -9,6 +9,7 @@ from django.utils import timezone
 import qrcode
 import io
 import base64
+from concesionario_app.campos_parciales import CamposParcialesMixin
 from .models import (
     Almacen, Zona, Pasillo, Ubicacion, 
     MovimientoInventario, MotoInventarioLocation
@@ -20,7 +21,7 @@ from .serializers import (
 )
 
 
-class AlmacenViewSet(viewsets.ModelViewSet):
+class AlmacenViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     """ViewSet para gestionar almacenes"""
     queryset = Almacen.objects.all()
     serializer_class = AlmacenSerializer
@@ -70,7 +71,7 @@ class AlmacenViewSet(viewsets.ModelViewSet):
         })
 
 
-class ZonaViewSet(viewsets.ModelViewSet):
+class ZonaViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     """ViewSet para gestionar zonas"""
     queryset = Zona.objects.all()
     serializer_class = ZonaSerializer
@@ -89,7 +90,7 @@ class ZonaViewSet(viewsets.ModelViewSet):
         return queryset.select_related('almacen')
 
 
-class PasilloViewSet(viewsets.ModelViewSet):
+class PasilloViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     """ViewSet para gestionar pasillos"""
     queryset = Pasillo.objects.all()
     serializer_class = PasilloSerializer
@@ -105,7 +106,7 @@ class PasilloViewSet(viewsets.ModelViewSet):
         return queryset.select_related('zona__almacen')
 
 
-class UbicacionViewSet(viewsets.ModelViewSet):
+class UbicacionViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     """ViewSet para gestionar ubicaciones específicas"""
     queryset = Ubicacion.objects.all()
     serializer_class = UbicacionSerializer
@@ -203,7 +204,7 @@ class UbicacionViewSet(viewsets.ModelViewSet):
         })
 
 
-class MovimientoInventarioViewSet(viewsets.ModelViewSet):
+class MovimientoInventarioViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     """ViewSet para gestionar movimientos de inventario"""
     queryset = MovimientoInventario.objects.all()
     serializer_class = MovimientoInventarioSerializer
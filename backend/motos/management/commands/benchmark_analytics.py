@@ -0,0 +1,114 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from motos.models import Moto, MotoModelo, MotoModeloStock
+from motos.services import AnalyticsInventarioService
+from usuarios.models import Cliente, Rol, Usuario
+from ventas.models import Venta, VentaDetalle
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el motor de análisis ABC/rotación sobre datos sintéticos. '
+        'Los datos se crean dentro de una transacción que se revierte al final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modelos', type=int, default=5000, help='Cantidad de modelos a generar')
+        parser.add_argument('--lineas', type=int, default=200000, help='Cantidad de líneas de venta a generar')
+        parser.add_argument('--repeticiones', type=int, default=3, help='Veces que se ejecuta el motor')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options['semilla'])
+
+        with transaction.atomic():
+            inicio = time.perf_counter()
+            self.generar_datos(options['modelos'], options['lineas'])
+            self.stdout.write(f'Datos generados en {time.perf_counter() - inicio:.2f}s')
+
+            tiempos = []
+            for _ in range(options['repeticiones']):
+                with CaptureQueriesContext(connection) as consultas:
+                    inicio = time.perf_counter()
+                    resultado = AnalyticsInventarioService().calcular()
+                    tiempos.append(time.perf_counter() - inicio)
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{options['modelos']} modelos / {options['lineas']} líneas: "
+                    f'mejor {min(tiempos):.3f}s, promedio {sum(tiempos) / len(tiempos):.3f}s, '
+                    f'{len(consultas)} consultas'
+                )
+            )
+            self.stdout.write(
+                f"Modelos clasificados: {resultado['metricas_generales']['total_modelos_activos']}, "
+                f"con rotación: {len(resultado['rotacion_inventario'])}"
+            )
+
+            transaction.set_rollback(True)
+
+    def generar_datos(self, cantidad_modelos, cantidad_lineas):
+        sufijo = timezone.now().strftime('%Y%m%d%H%M%S')
+        rol, _ = Rol.objects.get_or_create(nombre_rol='admin')
+        usuario = Usuario.objects.create(username=f'benchmark_{sufijo}', rol=rol)
+        cliente = Cliente.objects.create(nombre='Benchmark', apellido='Analytics', cedula=f'BENCH{sufijo}')
+
+        modelos = MotoModelo.objects.bulk_create(
+            [
+                MotoModelo(
+                    marca=f'Marca{i % 40}', modelo=f'Bench{sufijo}-{i}', ano=2024,
+                    precio_compra=Decimal('1000'), precio_venta=Decimal(random.randint(1500, 9000)),
+                )
+                for i in range(cantidad_modelos)
+            ],
+            batch_size=1000
+        )
+        MotoModeloStock.objects.bulk_create(
+            [MotoModeloStock(modelo=modelo, total_unidades=random.randint(0, 30)) for modelo in modelos],
+            batch_size=1000
+        )
+        motos = Moto.objects.bulk_create(
+            [
+                Moto(
+                    marca=modelo.marca, modelo=modelo.modelo, ano=modelo.ano, modelo_moto=modelo,
+                    chasis=f'BENCH-{sufijo}-{modelo.id}', precio_compra=modelo.precio_compra,
+                    precio_venta=modelo.precio_venta, cantidad_stock=0,
+                )
+                for modelo in modelos
+            ],
+            batch_size=1000
+        )
+
+        lineas_por_venta = 10
+        ventas = Venta.objects.bulk_create(
+            [
+                Venta(cliente=cliente, usuario=usuario, tipo_venta='contado', monto_total=Decimal('0'))
+                for _ in range(max(1, cantidad_lineas // lineas_por_venta))
+            ],
+            batch_size=1000
+        )
+        # Repartir las ventas en los últimos dos años para ejercitar la ventana de 365 días
+        hoy = timezone.now()
+        for venta in ventas:
+            venta.fecha_venta = hoy - timedelta(days=random.randint(0, 730))
+        Venta.objects.bulk_update(ventas, ['fecha_venta'], batch_size=1000)
+
+        detalles = []
+        for i in range(cantidad_lineas):
+            moto = random.choice(motos)
+            cantidad = random.randint(1, 3)
+            detalles.append(
+                VentaDetalle(
+                    venta=ventas[i // lineas_por_venta % len(ventas)], moto=moto, modelo_moto_id=moto.modelo_moto_id,
+                    cantidad=cantidad, precio_unitario=moto.precio_venta, subtotal=moto.precio_venta * cantidad,
+                )
+            )
+        VentaDetalle.objects.bulk_create(detalles, batch_size=2000)
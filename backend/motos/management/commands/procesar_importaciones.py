@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from motos.importacion import TrabajoImportacionService
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker de importaciones: toma los trabajos pendientes de la base de datos '
+        'y los procesa uno por uno. No requiere un broker externo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Procesar los trabajos pendientes y terminar en lugar de quedarse esperando',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2.0,
+            help='Segundos de espera entre consultas cuando no hay trabajos pendientes',
+        )
+
+    def handle(self, *args, **options):
+        servicio = TrabajoImportacionService()
+        self.stdout.write('Worker de importaciones iniciado')
+
+        while True:
+            close_old_connections()
+            trabajo = servicio.tomar_siguiente()
+
+            if trabajo is None:
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            self.stdout.write(f'Procesando {trabajo} ({trabajo.nombre_archivo})')
+            trabajo = servicio.procesar(trabajo)
+            estilo = self.style.SUCCESS if trabajo.estado == 'completado' else self.style.ERROR
+            self.stdout.write(estilo(
+                f'{trabajo}: {trabajo.filas_creadas} creadas, {trabajo.filas_fallidas} con errores, '
+                f'{trabajo.filas_por_segundo} filas/s'
+            ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from motos.services import StockModeloService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye y verifica el resumen de stock desnormalizado de cada modelo de moto'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--solo-verificar',
+            action='store_true',
+            help='Solo reportar diferencias, sin corregir los resúmenes',
+        )
+        parser.add_argument(
+            '--verbose',
+            action='store_true',
+            help='Mostrar cada modelo con diferencias',
+        )
+
+    def handle(self, *args, **options):
+        solo_verificar = options.get('solo_verificar', False)
+        verbose = options.get('verbose', False)
+
+        diferencias = StockModeloService().reconstruir_todos(solo_verificar=solo_verificar)
+
+        if verbose:
+            for diferencia in diferencias:
+                self.stdout.write(
+                    f"Modelo {diferencia['modelo_id']}: "
+                    f"actual={diferencia['actual']} esperado={diferencia['esperado']}"
+                )
+
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('Todos los resúmenes de stock están correctos'))
+        elif solo_verificar:
+            self.stdout.write(
+                self.style.WARNING(f'{len(diferencias)} modelos con resumen de stock desactualizado')
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'{len(diferencias)} resúmenes de stock corregidos')
+            )
@@ -0,0 +1,76 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.utils import timezone
+
+from motos.models import Moto
+from motos.services import ReservaStockService, StockInsuficienteError
+
+
+class Command(BaseCommand):
+    help = (
+        'Lanza ventas concurrentes contra una moto de prueba y verifica que el '
+        'stock nunca quede sobrevendido. La moto de prueba se elimina al final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=200, help='Stock inicial de la moto de prueba')
+        parser.add_argument('--hilos', type=int, default=8, help='Cantidad de hilos vendiendo en paralelo')
+        parser.add_argument('--intentos', type=int, default=50, help='Reservas que intenta cada hilo')
+
+    def handle(self, *args, **options):
+        stock_inicial = options['stock']
+        hilos = options['hilos']
+        intentos = options['intentos']
+
+        sufijo = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        moto = Moto.objects.create(
+            marca='Stress', modelo='Reservas', ano=2024, chasis=f'STRESS-{sufijo}',
+            precio_compra=1, precio_venta=1, cantidad_stock=stock_inicial
+        )
+        contadores = {'reservadas': 0, 'conflictos': 0, 'bloqueos': 0}
+        candado = threading.Lock()
+
+        def vender():
+            servicio = ReservaStockService()
+            resultado = {'reservadas': 0, 'conflictos': 0, 'bloqueos': 0}
+            try:
+                for _ in range(intentos):
+                    try:
+                        servicio.reservar_moto(Moto(pk=moto.pk, marca=moto.marca, modelo=moto.modelo), 1)
+                        resultado['reservadas'] += 1
+                    except StockInsuficienteError:
+                        resultado['conflictos'] += 1
+                    except OperationalError:
+                        # SQLite serializa las escrituras y puede agotar el tiempo de espera
+                        resultado['bloqueos'] += 1
+            finally:
+                connections.close_all()
+            with candado:
+                for clave, valor in resultado.items():
+                    contadores[clave] += valor
+
+        try:
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+                for futuro in [ejecutor.submit(vender) for _ in range(hilos)]:
+                    futuro.result()
+            duracion = time.perf_counter() - inicio
+
+            stock_final = Moto.objects.values_list('cantidad_stock', flat=True).get(pk=moto.pk)
+        finally:
+            Moto.objects.filter(pk=moto.pk).delete()
+
+        total = hilos * intentos
+        self.stdout.write(
+            f'{connection.vendor}: {total} intentos en {duracion:.2f}s '
+            f'({total / duracion:.0f} reservas/s), {contadores["reservadas"]} reservadas, '
+            f'{contadores["conflictos"]} conflictos, {contadores["bloqueos"]} bloqueos, stock final {stock_final}'
+        )
+
+        if stock_final < 0 or contadores['reservadas'] + stock_final != stock_inicial:
+            raise CommandError('Sobreventa detectada: el stock no cuadra con las reservas')
+        self.stdout.write(self.style.SUCCESS('Sin sobreventa'))
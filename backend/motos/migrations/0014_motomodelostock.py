@@ -0,0 +1,54 @@
+# Generated by Django 5.1.4 on 2026-10-17 00:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum, Max
+
+
+def poblar_resumen_stock(apps, schema_editor):
+    MotoModelo = apps.get_model('motos', 'MotoModelo')
+    MotoInventario = apps.get_model('motos', 'MotoInventario')
+    MotoModeloStock = apps.get_model('motos', 'MotoModeloStock')
+
+    resumenes = {
+        modelo_id: MotoModeloStock(modelo_id=modelo_id, total_unidades=0, unidades_por_color={})
+        for modelo_id in MotoModelo.objects.values_list('id', flat=True)
+    }
+    filas = MotoInventario.objects.values('modelo_id', 'color').annotate(
+        unidades=Sum('cantidad_stock'),
+        ultimo_ingreso=Max('fecha_ingreso')
+    ).order_by('modelo_id', 'color')
+    for fila in filas:
+        resumen = resumenes[fila['modelo_id']]
+        resumen.unidades_por_color[fila['color']] = fila['unidades'] or 0
+        resumen.total_unidades += fila['unidades'] or 0
+        if fila['ultimo_ingreso'] and (resumen.fecha_ultimo_ingreso is None or fila['ultimo_ingreso'] > resumen.fecha_ultimo_ingreso):
+            resumen.fecha_ultimo_ingreso = fila['ultimo_ingreso']
+
+    MotoModeloStock.objects.bulk_create(resumenes.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('motos', '0013_alter_motomodelo_options_alter_ordencompra_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MotoModeloStock',
+            fields=[
+                ('modelo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_resumen', serialize=False, to='motos.motomodelo')),
+                ('total_unidades', models.IntegerField(default=0)),
+                ('unidades_por_color', models.JSONField(blank=True, default=dict, help_text='Unidades en stock agrupadas por color')),
+                ('fecha_ultimo_ingreso', models.DateTimeField(blank=True, null=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen de Stock por Modelo',
+                'verbose_name_plural': 'Resúmenes de Stock por Modelo',
+                'indexes': [models.Index(fields=['total_unidades'], name='motos_motom_total_u_2fdd02_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_resumen_stock, migrations.RunPython.noop),
+    ]
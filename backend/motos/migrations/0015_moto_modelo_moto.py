@@ -0,0 +1,54 @@
+# Generated by Django 5.1.4 on 2026-10-17 00:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+TAMANO_LOTE = 1000
+
+
+def enlazar_motos_con_modelo(apps, schema_editor):
+    """Rellena Moto.modelo_moto por marca/modelo/año, en lotes por id"""
+    Moto = apps.get_model('motos', 'Moto')
+    MotoModelo = apps.get_model('motos', 'MotoModelo')
+
+    modelos = {
+        (marca, modelo, ano): modelo_id
+        for modelo_id, marca, modelo, ano in MotoModelo.objects.values_list('id', 'marca', 'modelo', 'ano')
+    }
+    if not modelos:
+        return
+
+    ultimo_id = 0
+    while True:
+        lote = list(
+            Moto.objects.filter(id__gt=ultimo_id, modelo_moto__isnull=True)
+            .order_by('id')
+            .only('id', 'marca', 'modelo', 'ano')[:TAMANO_LOTE]
+        )
+        if not lote:
+            break
+        ultimo_id = lote[-1].id
+
+        por_actualizar = []
+        for moto in lote:
+            modelo_id = modelos.get((moto.marca, moto.modelo, moto.ano))
+            if modelo_id:
+                moto.modelo_moto_id = modelo_id
+                por_actualizar.append(moto)
+        Moto.objects.bulk_update(por_actualizar, ['modelo_moto'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('motos', '0014_motomodelostock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moto',
+            name='modelo_moto',
+            field=models.ForeignKey(blank=True, help_text='Modelo del catálogo al que pertenece esta unidad', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='unidades', to='motos.motomodelo'),
+        ),
+        migrations.RunPython(enlazar_motos_con_modelo, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.4 on 2026-10-17 00:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('motos', '0015_moto_modelo_moto'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoImportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('inventario', 'Inventario'), ('ubicaciones', 'Ubicaciones')], max_length=20)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='pendiente', max_length=20)),
+                ('archivo', models.FileField(blank=True, upload_to='importaciones/')),
+                ('nombre_archivo', models.CharField(max_length=255)),
+                ('filas_procesadas', models.IntegerField(default=0)),
+                ('filas_creadas', models.IntegerField(default=0)),
+                ('filas_fallidas', models.IntegerField(default=0)),
+                ('errores', models.JSONField(blank=True, default=list, help_text="Errores por fila: [{'fila', 'errores'}]")),
+                ('resultado', models.JSONField(blank=True, default=dict)),
+                ('mensaje_error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos_importacion', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Importación',
+                'verbose_name_plural': 'Trabajos de Importación',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='motos_traba_estado_f020c5_idx')],
+            },
+        ),
+    ]
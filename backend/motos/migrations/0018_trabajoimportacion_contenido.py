@@ -0,0 +1,22 @@
+# Generated by Django 5.1.4 on 2026-10-17 01:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('motos', '0017_versiondatos'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='trabajoimportacion',
+            name='archivo',
+        ),
+        migrations.AddField(
+            model_name='trabajoimportacion',
+            name='contenido',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+    ]
@@ -1,8 +1,41 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
 from decimal import Decimal
 from django.core.validators import RegexValidator
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils import timezone
 import uuid
 
+
+class ProveedorQuerySet(models.QuerySet):
+    def con_totales(self):
+        """
+        Anota los totales del proveedor con subconsultas correlacionadas:
+        monto_compras, cantidad_motocicletas, saldo_pendiente y credito_libre.
+
+        Los métodos total_compras(), total_motocicletas(), saldo_actual() y
+        credito_disponible() devuelven la anotación cuando el queryset la trae,
+        así un listado no hace consultas adicionales por proveedor.
+        """
+        cero = models.Value(Decimal('0'), output_field=models.DecimalField(max_digits=14, decimal_places=2))
+        modelos = MotoModelo.objects.filter(proveedor=OuterRef('pk')).order_by().values('proveedor')
+        facturas = FacturaProveedor.objects.filter(
+            proveedor=OuterRef('pk'), estado='pendiente'
+        ).order_by().values('proveedor')
+
+        return self.annotate(
+            monto_compras=Coalesce(Subquery(modelos.annotate(total=Sum('precio_compra')).values('total')), cero),
+            cantidad_motocicletas=Coalesce(Subquery(modelos.annotate(total=Count('pk')).values('total')), 0),
+            saldo_pendiente=Coalesce(Subquery(facturas.annotate(total=Sum('total')).values('total')), cero),
+            credito_libre=models.Case(
+                models.When(limite_credito__isnull=True, then=cero),
+                default=Greatest(F('limite_credito') - F('saldo_pendiente'), cero),
+                output_field=models.DecimalField(max_digits=14, decimal_places=2),
+            ),
+        )
+
+
 class Proveedor(models.Model):
     """Modelo para gestionar proveedores de motocicletas"""
     TIPO_PROVEEDOR_CHOICES = [
@@ -94,6 +127,8 @@ class Proveedor(models.Model):
         related_name='proveedores_creados'
     )
     
+    objects = ProveedorQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Proveedor'
         verbose_name_plural = 'Proveedores'
@@ -140,28 +175,57 @@ class Proveedor(models.Model):
     def esta_activo(self):
         return self.estado == 'activo'
     
+    # Los cuatro métodos siguientes usan las anotaciones de Proveedor.objects.con_totales() si existen
+    
     def total_compras(self):
         """Calcula el total de compras realizadas a este proveedor"""
+        if hasattr(self, 'monto_compras'):
+            return self.monto_compras
         return self.motocicletas.aggregate(
             total=models.Sum('precio_compra')
         )['total'] or 0
     
     def total_motocicletas(self):
         """Cuenta el total de motocicletas suministradas por este proveedor"""
+        if hasattr(self, 'cantidad_motocicletas'):
+            return self.cantidad_motocicletas
         return self.motocicletas.count()
     
     def saldo_actual(self):
         """Calcula el saldo actual (deuda pendiente) del proveedor"""
-        facturas = self.facturas_proveedor.filter(estado='pendiente')
-        return sum(factura.total for factura in facturas)
+        if hasattr(self, 'saldo_pendiente'):
+            return self.saldo_pendiente
+        return self.facturas_proveedor.filter(estado='pendiente').aggregate(
+            total=models.Sum('total')
+        )['total'] or 0
     
     def credito_disponible(self):
         """Calcula el crédito disponible del proveedor"""
+        if hasattr(self, 'credito_libre'):
+            return self.credito_libre
         if not self.limite_credito:
             return 0
         return max(0, self.limite_credito - self.saldo_actual())
 
 
+class FacturaProveedorQuerySet(models.QuerySet):
+    def con_saldo(self):
+        """
+        Anota total_pagado (suma de los pagos aplicados a la factura) y saldo con
+        una subconsulta por factura; monto_pendiente usa la anotación si existe.
+        """
+        cero = models.Value(Decimal('0'), output_field=models.DecimalField(max_digits=14, decimal_places=2))
+        pagos = PagoProveedor.objects.filter(factura=OuterRef('pk')).order_by().values('factura')
+        return self.annotate(
+            total_pagado=Coalesce(Subquery(pagos.annotate(total=Sum('monto')).values('total')), cero),
+            saldo=models.Case(
+                models.When(estado='pagada', then=cero),
+                default=F('total') - F('total_pagado'),
+                output_field=models.DecimalField(max_digits=14, decimal_places=2),
+            ),
+        )
+
+
 class FacturaProveedor(models.Model):
     """Modelo para gestionar facturas de proveedores"""
     ESTADO_CHOICES = [
@@ -210,6 +274,8 @@ class FacturaProveedor(models.Model):
         related_name='facturas_proveedor_creadas'
     )
     
+    objects = FacturaProveedorQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Factura de Proveedor'
         verbose_name_plural = 'Facturas de Proveedores'
@@ -237,6 +303,8 @@ class FacturaProveedor(models.Model):
     @property
     def monto_pendiente(self):
         """Calcula el monto pendiente de pago"""
+        if hasattr(self, 'saldo'):  # anotado por FacturaProveedor.objects.con_saldo()
+            return self.saldo
         if self.estado == 'pagada':
             return 0
         pagos_realizados = self.pagos_factura.aggregate(
@@ -508,8 +576,22 @@ class MotoModelo(models.Model):
     
     @property
     def total_stock(self):
-        return sum(item.cantidad_stock for item in self.inventario.all())
-    
+        """Lee el resumen desnormalizado; solo suma el inventario si aún no existe"""
+        try:
+            return self.stock_resumen.total_unidades
+        except ObjectDoesNotExist:
+            return sum(item.cantidad_stock for item in self.inventario.all())
+
+    @property
+    def colores_disponibles(self):
+        try:
+            return dict(self.stock_resumen.unidades_por_color)
+        except ObjectDoesNotExist:
+            resumen = {}
+            for item in self.inventario.all():
+                resumen[item.color] = resumen.get(item.color, 0) + item.cantidad_stock
+            return resumen
+
     @property
     def disponible(self):
         return self.total_stock > 0 and self.activa
@@ -554,6 +636,23 @@ class MotoInventario(models.Model):
         chasis_str = f" - {self.chasis}" if self.chasis else ""
         return f"{self.modelo} {self.color} (Stock: {self.cantidad_stock}){chasis_str}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia.recordar_modelo_guardado()
+        return instancia
+    
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.recordar_modelo_guardado()
+    
+    def recordar_modelo_guardado(self):
+        """
+        Guarda el modelo_id tal como está en la base para que las señales
+        recalculen también el resumen del modelo anterior si la fila se mueve.
+        """
+        self._modelo_id_guardado = self.__dict__.get('modelo_id')
+    
     @property
     def precio_con_descuento(self):
         """Precio de venta del modelo con el descuento aplicado para este color"""
@@ -562,6 +661,30 @@ class MotoInventario(models.Model):
             return self.modelo.precio_venta - descuento
         return self.modelo.precio_venta
 
+
+class MotoModeloStock(models.Model):
+    """Resumen desnormalizado del stock de cada modelo (mantenido por motos.signals)"""
+    modelo = models.OneToOneField(
+        MotoModelo,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stock_resumen'
+    )
+    total_unidades = models.IntegerField(default=0)
+    unidades_por_color = models.JSONField(default=dict, blank=True, help_text="Unidades en stock agrupadas por color")
+    fecha_ultimo_ingreso = models.DateTimeField(blank=True, null=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Resumen de Stock por Modelo'
+        verbose_name_plural = 'Resúmenes de Stock por Modelo'
+        indexes = [
+            models.Index(fields=['total_unidades']),
+        ]
+
+    def __str__(self):
+        return f"{self.modelo_id} - {self.total_unidades} unidades"
+
 # Mantenemos el modelo Moto original para compatibilidad hacia atrás
 class Moto(models.Model):
     CONDICION_CHOICES = [
@@ -606,6 +729,14 @@ class Moto(models.Model):
         null=True,
         help_text='Proveedor que suministra esta motocicleta'
     )
+    modelo_moto = models.ForeignKey(
+        MotoModelo,
+        on_delete=models.SET_NULL,
+        related_name='unidades',
+        blank=True,
+        null=True,
+        help_text='Modelo del catálogo al que pertenece esta unidad'
+    )
     fecha_ingreso = models.DateTimeField(auto_now_add=True)
     activa = models.BooleanField(default=True)
     
@@ -614,6 +745,14 @@ class Moto(models.Model):
         verbose_name_plural = 'Motos'
         ordering = ['-fecha_ingreso']
     
+    def save(self, *args, **kwargs):
+        # Enlazar con el catálogo si la unidad llega sin modelo (motos legacy)
+        if self.modelo_moto_id is None:
+            self.modelo_moto_id = MotoModelo.objects.filter(
+                marca=self.marca, modelo=self.modelo, ano=self.ano
+            ).values_list('id', flat=True).first()
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         color_str = f" {self.color}" if self.color else ""
         return f"{self.marca} {self.modelo} {self.ano}{color_str} - {self.chasis}"
@@ -864,3 +1003,109 @@ class MotoInventarioLocation(models.Model):
         
     def __str__(self):
         return f"{self.inventario} en {self.ubicacion.codigo_completo}"
+
+
+class TrabajoImportacion(models.Model):
+    """Importación encolada que procesa en segundo plano el comando procesar_importaciones"""
+    TIPO_CHOICES = [
+        ('inventario', 'Inventario'),
+        ('ubicaciones', 'Ubicaciones'),
+    ]
+    
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    ]
+    
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    # El archivo se guarda en la base de datos para que el worker lo lea aunque
+    # corra en otra máquina que el proceso web que lo recibió
+    contenido = models.BinaryField(blank=True, default=b'', editable=False)
+    nombre_archivo = models.CharField(max_length=255)
+    
+    # Progreso
+    filas_procesadas = models.IntegerField(default=0)
+    filas_creadas = models.IntegerField(default=0)
+    filas_fallidas = models.IntegerField(default=0)
+    errores = models.JSONField(default=list, blank=True, help_text="Errores por fila: [{'fila', 'errores'}]")
+    resultado = models.JSONField(default=dict, blank=True)
+    mensaje_error = models.TextField(blank=True)
+    
+    # Metadatos
+    creado_por = models.ForeignKey(
+        'usuarios.Usuario',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='trabajos_importacion'
+    )
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(blank=True, null=True)
+    fecha_fin = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        verbose_name = 'Trabajo de Importación'
+        verbose_name_plural = 'Trabajos de Importación'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion']),
+        ]
+    
+    def __str__(self):
+        return f"Importación {self.get_tipo_display()} #{self.id} ({self.get_estado_display()})"
+    
+    @property
+    def filas_por_segundo(self):
+        """Velocidad de procesamiento desde que el worker tomó el trabajo"""
+        if not self.fecha_inicio or not self.filas_procesadas:
+            return 0
+        duracion = ((self.fecha_fin or timezone.now()) - self.fecha_inicio).total_seconds()
+        return round(self.filas_procesadas / duracion, 1) if duracion > 0 else 0
+
+
+class VersionDatos(models.Model):
+    """
+    Contador de cambios por tabla.
+
+    Las exportaciones en caché usan estos contadores como versión de los datos:
+    mientras ninguna de sus tablas cambie, el archivo generado sigue vigente.
+    """
+    tabla = models.CharField(max_length=100, unique=True, help_text="Etiqueta del modelo, p. ej. ventas.Venta")
+    version = models.PositiveBigIntegerField(default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Versión de Datos'
+        verbose_name_plural = 'Versiones de Datos'
+    
+    def __str__(self):
+        return f"{self.tabla} v{self.version}"
+    
+    @classmethod
+    def incrementar(cls, *tablas):
+        for tabla in tablas:
+            actualizadas = cls.objects.filter(tabla=tabla).update(
+                version=models.F('version') + 1, fecha_actualizacion=timezone.now()
+            )
+            if not actualizadas:
+                cls.objects.get_or_create(tabla=tabla, defaults={'version': 1})
+    
+    @classmethod
+    def registrar_cambio(cls, *modelos):
+        """
+        Marca las tablas de los modelos como modificadas al confirmarse la transacción.
+
+        Las señales lo llaman en cada save/delete; los caminos masivos
+        (bulk_create, bulk_update, update) deben llamarlo a mano.
+        """
+        tablas = [modelo._meta.label for modelo in modelos]
+        transaction.on_commit(lambda: cls.incrementar(*tablas))
+    
+    @classmethod
+    def versiones(cls, tablas):
+        """dict etiqueta -> versión (0 para tablas que nunca cambiaron)"""
+        actuales = dict(cls.objects.filter(tabla__in=tablas).values_list('tabla', 'version'))
+        return {tabla: actuales.get(tabla, 0) for tabla in tablas}
@@ -2,14 +2,15 @@ from rest_framework import generics, filters, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.db.models import Sum
+from concesionario_app.campos_parciales import CamposParcialesMixin
 from .models import Proveedor, MotoModelo, Moto
 from .serializers import (
     ProveedorSerializer, ProveedorCreateSerializer, ProveedorListSerializer,
     MotoModeloSerializer, MotoSerializer
 )
 
-class ProveedorListCreateView(generics.ListCreateAPIView):
-    queryset = Proveedor.objects.all()
+class ProveedorListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
+    queryset = Proveedor.objects.con_totales()
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['nombre', 'nombre_comercial', 'ruc', 'cedula', 'persona_contacto', 'ciudad']
     ordering_fields = ['nombre', 'fecha_creacion', 'tipo_proveedor', 'estado']
@@ -21,7 +22,7 @@ class ProveedorListCreateView(generics.ListCreateAPIView):
         return ProveedorListSerializer
     
     def get_queryset(self):
-        queryset = Proveedor.objects.all()
+        queryset = Proveedor.objects.con_totales()
         
         # Filtros disponibles
         estado = self.request.query_params.get('estado', None)
@@ -44,7 +45,7 @@ class ProveedorListCreateView(generics.ListCreateAPIView):
         return queryset
 
 class ProveedorDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Proveedor.objects.all()
+    queryset = Proveedor.objects.con_totales()
     serializer_class = ProveedorSerializer
     
     def get_serializer_class(self):
@@ -60,10 +61,10 @@ class ProveedorEstadisticasView(APIView):
             from django.db.models import Sum, Count, Avg
             from ventas.models import VentaDetalle
             
-            proveedor = Proveedor.objects.get(id=proveedor_id)
+            proveedor = Proveedor.objects.con_totales().get(id=proveedor_id)
             
             # Obtener modelos de motocicletas del proveedor
-            modelos_proveedor = MotoModelo.objects.filter(proveedor=proveedor)
+            modelos_proveedor = MotoModelo.objects.filter(proveedor=proveedor).select_related('stock_resumen')
             motos_legacy_proveedor = Moto.objects.filter(proveedor=proveedor)
             
             # Estadísticas de inventario actual
@@ -157,7 +158,7 @@ class ProveedorMotocicletasView(APIView):
             proveedor = Proveedor.objects.get(id=proveedor_id)
             
             # Obtener modelos del proveedor
-            modelos = MotoModelo.objects.filter(proveedor=proveedor)
+            modelos = MotoModelo.objects.filter(proveedor=proveedor).select_related('stock_resumen')
             modelos_serialized = MotoModeloSerializer(modelos, many=True)
             
             # Obtener motos legacy del proveedor
@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import (
     Moto, MotoModelo, MotoInventario, Proveedor,
@@ -5,6 +6,7 @@ from .models import (
     Almacen, Zona, Pasillo, Ubicacion, 
     MovimientoInventario, MotoInventarioLocation
 )
+from .services import InventarioModeloService
 
 class MotoSerializer(serializers.ModelSerializer):
     ganancia = serializers.ReadOnlyField()
@@ -114,17 +116,57 @@ class MotoModeloSerializer(serializers.ModelSerializer):
             representation['imagen'] = full_url
             print(f"[IMG] [MotoModelo] URL final: {full_url}")
         
-        # Agregar resumen de colores disponibles
-        inventario_resumen = {}
-        for item in instance.inventario.all():
-            if item.color in inventario_resumen:
-                inventario_resumen[item.color] += item.cantidad_stock
-            else:
-                inventario_resumen[item.color] = item.cantidad_stock
-        
-        representation['colores_disponibles'] = inventario_resumen
+        # Agregar resumen de colores disponibles (desde el resumen de stock)
+        representation['colores_disponibles'] = instance.colores_disponibles
         return representation
 
+class MotoModeloListSerializer(serializers.ModelSerializer):
+    """
+    Serializer liviano para el catálogo de modelos.
+
+    Espera el queryset de MotoModeloListCreateView: proveedor y resumen de stock
+    con select_related, inventario con un solo Prefetch y la anotación stock_total.
+    """
+    inventario = MotoInventarioSerializer(many=True, read_only=True)
+    ganancia = serializers.ReadOnlyField()
+    total_stock = serializers.IntegerField(source='stock_total', read_only=True)
+    disponible = serializers.SerializerMethodField()
+    proveedor_nombre = serializers.CharField(source='proveedor.nombre_completo', read_only=True)
+    colores_disponibles = serializers.ReadOnlyField()
+    nombre_completo = serializers.SerializerMethodField()
+    imagen = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MotoModelo
+        fields = ['id', 'marca', 'modelo', 'ano', 'condicion', 'descripcion', 'imagen',
+                 'precio_compra', 'precio_venta', 'moneda_compra', 'moneda_venta', 'proveedor', 'proveedor_nombre', 'ganancia', 'activa',
+                 'fecha_creacion', 'total_stock', 'disponible', 'inventario', 'cilindraje', 'tipo_motor',
+                 'potencia', 'torque', 'combustible', 'transmision', 'peso', 'capacidad_tanque',
+                 'nombre_completo', 'colores_disponibles']
+        # Columnas y relaciones que leen los campos calculados (?fields= poda el queryset)
+        dependencias_campos = {
+            'imagen': ['imagen'],
+            'ganancia': ['precio_venta', 'precio_compra'],
+            'disponible': ['stock_total', 'activa'],
+            'nombre_completo': ['marca', 'modelo', 'ano'],
+            'colores_disponibles': ['stock_resumen', 'inventario'],
+        }
+
+    def get_disponible(self, obj):
+        return obj.stock_total > 0 and obj.activa
+
+    def get_nombre_completo(self, obj):
+        return f"{obj.marca} {obj.modelo} {obj.ano}"
+
+    def get_imagen(self, obj):
+        if not obj.imagen:
+            return None
+        from django.conf import settings
+
+        if settings.DEBUG:
+            return f"http://localhost:8000{settings.MEDIA_URL}{obj.imagen}"
+        return f"{settings.MEDIA_URL}{obj.imagen}"
+
 class MotoModeloCreateSerializer(serializers.ModelSerializer):
     inventario_data = serializers.CharField(
         write_only=True, 
@@ -226,21 +268,12 @@ class MotoModeloCreateSerializer(serializers.ModelSerializer):
             inventario_data = []
         
         try:
-            modelo = MotoModelo.objects.create(**validated_data)
-            logger.debug(f"Created model: {modelo}")
-            
-            for item_data in inventario_data:
-                if isinstance(item_data, dict):
-                    # Limpiar campos que no pertenecen al modelo MotoInventario
-                    clean_item_data = {}
-                    valid_fields = ['color', 'chasis', 'cantidad_stock', 'descuento_porcentaje', 
-                                  'precio_compra_individual', 'tasa_dolar', 'fecha_compra']
-                    for field in valid_fields:
-                        if field in item_data:
-                            clean_item_data[field] = item_data[field]
-                    
-                    inventario = MotoInventario.objects.create(modelo=modelo, **clean_item_data)
-                    logger.debug(f"Created inventory: {inventario}")
+            with transaction.atomic():
+                modelo = MotoModelo.objects.create(**validated_data)
+                logger.debug(f"Created model: {modelo}")
+                
+                resultado = InventarioModeloService().sincronizar(modelo, inventario_data)
+                logger.debug(f"Created inventory: {resultado}")
             
             return modelo
         except Exception as e:
@@ -261,44 +294,30 @@ class MotoModeloCreateSerializer(serializers.ModelSerializer):
         logger.debug(f"Inventario data string: {inventario_data_str}")
         
         # Actualizar campos básicos del modelo
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        logger.debug(f"Updated basic fields for model: {instance}")
-        
-        # Manejar inventario_data si está presente
-        if inventario_data_str:
-            try:
-                if isinstance(inventario_data_str, str):
-                    inventario_data = json.loads(inventario_data_str)
-                else:
-                    inventario_data = inventario_data_str if inventario_data_str else []
-                logger.debug(f"Parsed inventario data: {inventario_data}")
-                
-                # Eliminar inventario existente
-                instance.inventario.all().delete()
-                logger.debug("Deleted existing inventory")
-                
-                # Crear nuevo inventario
-                for item_data in inventario_data:
-                    if isinstance(item_data, dict):
-                        # Limpiar campos que no pertenecen al modelo MotoInventario
-                        clean_item_data = {}
-                        valid_fields = ['color', 'chasis', 'cantidad_stock', 'descuento_porcentaje', 
-                                      'precio_compra_individual', 'tasa_dolar', 'fecha_compra']
-                        for field in valid_fields:
-                            if field in item_data:
-                                clean_item_data[field] = item_data[field]
-                        
-                        print(f"🧹 CLEANED ITEM DATA: {clean_item_data}")
-                        inventario = MotoInventario.objects.create(modelo=instance, **clean_item_data)
-                        logger.debug(f"Created new inventory: {inventario}")
-                        
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON decode error during update: {e}")
-            except Exception as e:
-                logger.error(f"Error updating inventory: {e}")
-                raise
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+            logger.debug(f"Updated basic fields for model: {instance}")
+            
+            # Manejar inventario_data si está presente
+            if inventario_data_str:
+                try:
+                    if isinstance(inventario_data_str, str):
+                        inventario_data = json.loads(inventario_data_str)
+                    else:
+                        inventario_data = inventario_data_str if inventario_data_str else []
+                    logger.debug(f"Parsed inventario data: {inventario_data}")
+                    
+                    # Aplicar solo la diferencia contra el inventario existente
+                    resultado = InventarioModeloService().sincronizar(instance, inventario_data)
+                    logger.debug(f"Synced inventory: {resultado}")
+                            
+                except json.JSONDecodeError as e:
+                    logger.error(f"JSON decode error during update: {e}")
+                except Exception as e:
+                    logger.error(f"Error updating inventory: {e}")
+                    raise
         
         return instance
 
@@ -308,8 +327,11 @@ class ProveedorSerializer(serializers.ModelSerializer):
     telefono_principal = serializers.ReadOnlyField()
     email_principal = serializers.ReadOnlyField()
     esta_activo = serializers.ReadOnlyField()
-    total_compras = serializers.SerializerMethodField()
-    total_motocicletas = serializers.SerializerMethodField()
+    # Anotados por Proveedor.objects.con_totales() en la vista
+    total_compras = serializers.ReadOnlyField()
+    total_motocicletas = serializers.ReadOnlyField()
+    saldo_actual = serializers.ReadOnlyField()
+    credito_disponible = serializers.ReadOnlyField()
     
     class Meta:
         model = Proveedor
@@ -321,15 +343,10 @@ class ProveedorSerializer(serializers.ModelSerializer):
             'moneda_preferida', 'terminos_pago', 'limite_credito', 'descuento_general',
             'estado', 'fecha_inicio_relacion', 'notas', 'fecha_creacion', 'fecha_actualizacion',
             'creado_por', 'nombre_completo', 'contacto_principal', 'telefono_principal',
-            'email_principal', 'esta_activo', 'total_compras', 'total_motocicletas'
+            'email_principal', 'esta_activo', 'total_compras', 'total_motocicletas',
+            'saldo_actual', 'credito_disponible'
         ]
         read_only_fields = ['fecha_creacion', 'fecha_actualizacion', 'creado_por']
-    
-    def get_total_compras(self, obj):
-        return obj.total_compras()
-    
-    def get_total_motocicletas(self, obj):
-        return obj.total_motocicletas()
 
 class ProveedorCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -371,7 +388,7 @@ class ProveedorListSerializer(serializers.ModelSerializer):
     esta_activo = serializers.ReadOnlyField()
     contacto_principal = serializers.ReadOnlyField()
     telefono_principal = serializers.ReadOnlyField()
-    total_motocicletas = serializers.SerializerMethodField()
+    total_motocicletas = serializers.ReadOnlyField()  # anotado por Proveedor.objects.con_totales()
     
     class Meta:
         model = Proveedor
@@ -380,9 +397,6 @@ class ProveedorListSerializer(serializers.ModelSerializer):
             'contacto_principal', 'telefono_principal', 'email', 'estado',
             'esta_activo', 'total_motocicletas', 'fecha_creacion'
         ]
-    
-    def get_total_motocicletas(self, obj):
-        return obj.total_motocicletas()
 
 
 # ===== SERIALIZERS DE CONTABILIDAD =====
@@ -0,0 +1,838 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import Count, Sum, Max, F, Q, DecimalField, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    DetalleOrdenCompra, FacturaProveedor, Moto, MotoModelo, MotoInventario, MotoModeloStock, OrdenCompra,
+    VersionDatos
+)
+
+
+class StockInsuficienteError(ValueError):
+    """No hay stock suficiente para reservar la cantidad pedida (conflicto, HTTP 409)"""
+
+    def __init__(self, descripcion, disponible, solicitado):
+        self.disponible = disponible
+        self.solicitado = solicitado
+        super().__init__(
+            f"Stock insuficiente para {descripcion}. Stock disponible: {disponible}, solicitado: {solicitado}"
+        )
+
+
+class ReservaStockService:
+    """
+    Reserva y libera stock de forma segura ante ventas concurrentes.
+
+    El descuento es un UPDATE condicional (cantidad_stock >= cantidad) con F(),
+    así la verificación y la escritura ocurren en la misma sentencia y dos
+    ventas simultáneas nunca dejan el stock en negativo ni pierden un descuento.
+    Todo camino de venta debe pasar por aquí en lugar de leer y escribir
+    cantidad_stock en Python.
+    """
+
+    def reservar_moto(self, moto, cantidad):
+        """
+        Descuenta stock de una moto individual
+
+        Returns:
+            int: Stock restante (también se refleja en moto.cantidad_stock)
+
+        Raises:
+            StockInsuficienteError: Si el stock actual no alcanza
+        """
+        self._validar_cantidad(cantidad)
+        actualizadas = Moto.objects.filter(pk=moto.pk, cantidad_stock__gte=cantidad).update(
+            cantidad_stock=F('cantidad_stock') - cantidad
+        )
+        disponible = Moto.objects.filter(pk=moto.pk).values_list('cantidad_stock', flat=True).first() or 0
+        if not actualizadas:
+            moto.cantidad_stock = disponible
+            raise StockInsuficienteError(f'{moto.marca} {moto.modelo}', disponible, cantidad)
+        # update() no dispara señales: invalidar las exportaciones a mano
+        VersionDatos.registrar_cambio(Moto)
+        moto.cantidad_stock = disponible
+        return disponible
+
+    def liberar_moto(self, moto, cantidad):
+        """Devuelve stock a una moto individual (cancelaciones y devoluciones)"""
+        self._validar_cantidad(cantidad)
+        Moto.objects.filter(pk=moto.pk).update(cantidad_stock=F('cantidad_stock') + cantidad)
+        VersionDatos.registrar_cambio(Moto)
+        moto.cantidad_stock = Moto.objects.filter(pk=moto.pk).values_list('cantidad_stock', flat=True).first()
+        return moto.cantidad_stock
+
+    def reservar_inventario(self, modelo, cantidad=1, color=None):
+        """
+        Descuenta stock del inventario de un modelo, repartiendo la cantidad entre
+        las filas con stock (del color pedido, si se indica) en orden de ingreso.
+
+        Cada descuento es un UPDATE condicional; si otra venta se adelanta en una
+        fila se relee su stock. Si entre todas las filas no alcanza, se revierten
+        los descuentos ya hechos.
+
+        Returns:
+            MotoInventario: La primera fila que se descontó (de ella toma la venta
+            el color y los precios)
+
+        Raises:
+            StockInsuficienteError: Si la suma del stock de las filas no alcanza
+        """
+        self._validar_cantidad(cantidad)
+        candidatos = MotoInventario.objects.filter(modelo=modelo)
+        if color:
+            candidatos = candidatos.filter(color__iexact=color)
+
+        descontadas = []
+        restante = cantidad
+        with transaction.atomic():
+            filas = candidatos.filter(cantidad_stock__gt=0).order_by('fecha_ingreso', 'id').values_list(
+                'id', 'cantidad_stock'
+            )
+            for inventario_id, stock in filas:
+                while restante and stock > 0:
+                    parte = min(restante, stock)
+                    actualizadas = MotoInventario.objects.filter(pk=inventario_id, cantidad_stock__gte=parte).update(
+                        cantidad_stock=F('cantidad_stock') - parte
+                    )
+                    if actualizadas:
+                        restante -= parte
+                        stock -= parte
+                        if inventario_id not in descontadas:
+                            descontadas.append(inventario_id)
+                    else:
+                        stock = MotoInventario.objects.filter(pk=inventario_id).values_list(
+                            'cantidad_stock', flat=True
+                        ).first() or 0
+                if not restante:
+                    break
+
+            if restante:
+                # Lo descontado hasta aquí más lo que quede: el stock que había antes de intentar
+                disponible = cantidad - restante + (candidatos.aggregate(total=Sum('cantidad_stock'))['total'] or 0)
+                descripcion = f'{modelo.marca} {modelo.modelo}' + (f' {color}' if color else '')
+                raise StockInsuficienteError(descripcion, disponible, cantidad)
+
+            # update() no dispara señales: mantener el resumen de stock y la versión a mano
+            StockModeloService().recalcular(modelo.pk)
+            VersionDatos.registrar_cambio(MotoInventario)
+        return MotoInventario.objects.get(pk=descontadas[0])
+
+    def _validar_cantidad(self, cantidad):
+        if cantidad <= 0:
+            raise ValueError(f'La cantidad debe ser mayor que cero, recibido: {cantidad}')
+
+
+class StockModeloService:
+    """Servicio para mantener el resumen de stock desnormalizado de MotoModelo"""
+
+    # Activo mientras un proceso masivo difiere el recálculo (ver diferir)
+    _diferido = ContextVar('resumen_stock_diferido', default=False)
+
+    @classmethod
+    @contextmanager
+    def diferir(cls):
+        """
+        Dentro del bloque las señales de MotoInventario no recalculan el resumen;
+        quien lo usa debe llamar a recalcular al terminar.
+        """
+        token = cls._diferido.set(True)
+        try:
+            yield
+        finally:
+            cls._diferido.reset(token)
+
+    @classmethod
+    def diferido(cls):
+        return cls._diferido.get()
+
+    def calcular_resumen(self, modelo_id):
+        """
+        Calcula el resumen de stock de un modelo a partir de su inventario
+
+        Returns:
+            dict: total_unidades, unidades_por_color y fecha_ultimo_ingreso
+        """
+        filas = MotoInventario.objects.filter(modelo_id=modelo_id).values('color').annotate(
+            unidades=Sum('cantidad_stock'),
+            ultimo_ingreso=Max('fecha_ingreso')
+        ).order_by('color')
+
+        return self._resumen_desde_filas(filas)
+
+    def recalcular(self, modelo_id, crear=True):
+        """
+        Recalcula y guarda el resumen de un modelo dentro de la transacción actual.
+
+        La fila del resumen se bloquea antes de leer el inventario para que dos
+        transacciones concurrentes sobre el mismo modelo no se pisen el resultado.
+        """
+        with transaction.atomic():
+            if crear:
+                resumen, _ = MotoModeloStock.objects.select_for_update().get_or_create(modelo_id=modelo_id)
+            else:
+                resumen = MotoModeloStock.objects.select_for_update().filter(modelo_id=modelo_id).first()
+                if resumen is None:
+                    return None
+
+            for campo, valor in self.calcular_resumen(modelo_id).items():
+                setattr(resumen, campo, valor)
+            resumen.save()
+            return resumen
+
+    def reconstruir_todos(self, solo_verificar=False, modelo_ids=None):
+        """
+        Reconstruye los resúmenes de todos los modelos con una sola consulta agrupada
+
+        Args:
+            solo_verificar (bool): Si es True no escribe nada, solo reporta diferencias
+            modelo_ids (iterable, opcional): Limitar la reconstrucción a estos modelos
+
+        Returns:
+            list: Diferencias encontradas [{'modelo_id', 'esperado', 'actual'}]
+        """
+        inventario = MotoInventario.objects.all()
+        resumenes = MotoModeloStock.objects.all()
+        modelos = MotoModelo.objects.all()
+        if modelo_ids is not None:
+            modelo_ids = list(modelo_ids)
+            inventario = inventario.filter(modelo_id__in=modelo_ids)
+            resumenes = resumenes.filter(modelo_id__in=modelo_ids)
+            modelos = modelos.filter(id__in=modelo_ids)
+
+        filas_por_modelo = {}
+        filas = inventario.values('modelo_id', 'color').annotate(
+            unidades=Sum('cantidad_stock'),
+            ultimo_ingreso=Max('fecha_ingreso')
+        ).order_by('modelo_id', 'color')
+        for fila in filas:
+            filas_por_modelo.setdefault(fila['modelo_id'], []).append(fila)
+
+        existentes = resumenes.in_bulk()
+        diferencias = []
+        por_crear = []
+        por_actualizar = []
+
+        for modelo_id in modelos.values_list('id', flat=True):
+            esperado = self._resumen_desde_filas(filas_por_modelo.get(modelo_id, []))
+            actual = existentes.get(modelo_id)
+
+            if actual is None:
+                diferencias.append({'modelo_id': modelo_id, 'esperado': esperado, 'actual': None})
+                por_crear.append(MotoModeloStock(modelo_id=modelo_id, **esperado))
+                continue
+
+            valores_actuales = {campo: getattr(actual, campo) for campo in esperado}
+            if valores_actuales != esperado:
+                diferencias.append({'modelo_id': modelo_id, 'esperado': esperado, 'actual': valores_actuales})
+                for campo, valor in esperado.items():
+                    setattr(actual, campo, valor)
+                por_actualizar.append(actual)
+
+        if not solo_verificar:
+            with transaction.atomic():
+                MotoModeloStock.objects.bulk_create(por_crear, batch_size=500)
+                MotoModeloStock.objects.bulk_update(
+                    por_actualizar,
+                    ['total_unidades', 'unidades_por_color', 'fecha_ultimo_ingreso'],
+                    batch_size=500
+                )
+
+        return diferencias
+
+    def _resumen_desde_filas(self, filas):
+        unidades_por_color = {}
+        fecha_ultimo_ingreso = None
+        for fila in filas:
+            unidades_por_color[fila['color']] = fila['unidades'] or 0
+            if fila['ultimo_ingreso'] and (fecha_ultimo_ingreso is None or fila['ultimo_ingreso'] > fecha_ultimo_ingreso):
+                fecha_ultimo_ingreso = fila['ultimo_ingreso']
+
+        return {
+            'total_unidades': sum(unidades_por_color.values()),
+            'unidades_por_color': unidades_por_color,
+            'fecha_ultimo_ingreso': fecha_ultimo_ingreso,
+        }
+
+
+class InventarioModeloService:
+    """
+    Sincroniza el inventario de un modelo con la lista enviada por el formulario.
+
+    En lugar de borrar y recrear todas las filas, compara contra lo existente
+    (por id o por número de chasis) y aplica solo la diferencia: un bulk_update
+    para las filas modificadas, un bulk_create para las nuevas y un delete para
+    las que ya no vienen. Así se conservan fecha_ingreso, ubicaciones e
+    historial de movimientos, y el costo en consultas no depende del tamaño.
+    """
+
+    CAMPOS_EDITABLES = [
+        'color', 'chasis', 'cantidad_stock', 'descuento_porcentaje',
+        'precio_compra_individual', 'tasa_dolar', 'fecha_compra'
+    ]
+
+    def sincronizar(self, modelo, items):
+        """
+        Args:
+            modelo (MotoModelo): Modelo dueño del inventario
+            items (list[dict]): Filas deseadas; 'id' o 'chasis' identifican las existentes
+
+        Returns:
+            dict: Cantidad de filas creadas, actualizadas y eliminadas
+        """
+        with transaction.atomic():
+            existentes = {inv.id: inv for inv in MotoInventario.objects.select_for_update().filter(modelo=modelo)}
+            por_chasis = {inv.chasis: inv for inv in existentes.values() if inv.chasis}
+
+            conservados = set()
+            por_crear = []
+            por_actualizar = []
+            campos_actualizados = set()
+
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                valores = self._limpiar(item)
+                actual = self._buscar_existente(item, valores, existentes, por_chasis, conservados)
+
+                if actual is None:
+                    por_crear.append(MotoInventario(modelo=modelo, **valores))
+                    continue
+
+                conservados.add(actual.id)
+                cambios = [campo for campo, valor in valores.items() if getattr(actual, campo) != valor]
+                if cambios:
+                    for campo in cambios:
+                        setattr(actual, campo, valores[campo])
+                    campos_actualizados.update(cambios)
+                    por_actualizar.append(actual)
+
+            por_eliminar = [inv_id for inv_id in existentes if inv_id not in conservados]
+
+            # Primero borrar, para que un chasis reasignado a una fila nueva no choque con el unique
+            if por_eliminar:
+                with StockModeloService.diferir():
+                    MotoInventario.objects.filter(id__in=por_eliminar).delete()
+            if por_actualizar:
+                MotoInventario.objects.bulk_update(por_actualizar, sorted(campos_actualizados), batch_size=500)
+            if por_crear:
+                MotoInventario.objects.bulk_create(por_crear, batch_size=500)
+
+            # bulk_create/bulk_update no disparan señales: recalcular el resumen una sola vez
+            StockModeloService().recalcular(modelo.id)
+            VersionDatos.registrar_cambio(MotoInventario)
+
+        return {
+            'creados': len(por_crear),
+            'actualizados': len(por_actualizar),
+            'eliminados': len(por_eliminar),
+        }
+
+    def _limpiar(self, item):
+        """Se queda con los campos editables y los convierte al tipo del modelo"""
+        valores = {}
+        for campo in self.CAMPOS_EDITABLES:
+            if campo not in item:
+                continue
+            valor = item[campo]
+            if valor == '' and campo != 'color':
+                valor = None
+            valores[campo] = MotoInventario._meta.get_field(campo).to_python(valor)
+        if valores.get('descuento_porcentaje', 0) is None:
+            valores['descuento_porcentaje'] = 0
+        return valores
+
+    def _buscar_existente(self, item, valores, existentes, por_chasis, conservados):
+        try:
+            inv_id = int(item.get('id'))
+        except (TypeError, ValueError):
+            inv_id = None
+        actual = existentes.get(inv_id)
+        if actual is None and valores.get('chasis'):
+            actual = por_chasis.get(valores['chasis'])
+        # Un mismo registro no puede quedar emparejado con dos filas del formulario
+        if actual is not None and actual.id in conservados:
+            return None
+        return actual
+
+
+class AnalyticsInventarioService:
+    """
+    Motor set-based para el análisis ABC y la rotación de inventario.
+
+    Carga el valor de stock y las ventas de los últimos 365 días de todos los
+    modelos activos con dos consultas agrupadas y calcula las métricas en una
+    sola pasada vectorizada con pandas.
+    """
+
+    DIAS_VENTANA = 365
+
+    def __init__(self, fecha_referencia=None):
+        """
+        Args:
+            fecha_referencia (date | datetime, opcional): Fin de la ventana de ventas.
+                Por defecto el momento actual.
+        """
+        if fecha_referencia is None:
+            fecha_fin = timezone.now()
+        elif isinstance(fecha_referencia, datetime):
+            fecha_fin = fecha_referencia
+        else:
+            fecha_fin = timezone.make_aware(datetime.combine(fecha_referencia, time.max))
+        if timezone.is_naive(fecha_fin):
+            fecha_fin = timezone.make_aware(fecha_fin)
+
+        self.fecha_fin = fecha_fin
+        self.fecha_inicio = fecha_fin - timedelta(days=self.DIAS_VENTANA)
+
+    def cargar_modelos(self):
+        """Consulta 1: modelos activos con su stock (desde el resumen desnormalizado)"""
+        filas = MotoModelo.objects.filter(activa=True).values_list(
+            'id', 'marca', 'modelo', 'precio_venta', 'stock_resumen__total_unidades'
+        )
+        df = pd.DataFrame.from_records(
+            list(filas), columns=['modelo_id', 'marca', 'modelo', 'precio_venta', 'stock']
+        )
+        df['modelo_id'] = df['modelo_id'].astype('int64')
+        df['stock'] = df['stock'].fillna(0).astype('int64')
+        df['precio_venta'] = df['precio_venta'].astype('float64')
+        return df
+
+    def cargar_ventas(self):
+        """Consulta 2: unidades e ingresos por modelo dentro de la ventana"""
+        from ventas.models import VentaDetalle
+
+        filas = VentaDetalle.objects.filter(
+            modelo_moto__activa=True,
+            venta__fecha_venta__gte=self.fecha_inicio,
+            venta__fecha_venta__lte=self.fecha_fin
+        ).values('modelo_moto_id').annotate(
+            total_vendido=Sum('cantidad'),
+            ingresos=Sum(
+                F('precio_unitario') * F('cantidad'),
+                output_field=DecimalField(max_digits=20, decimal_places=2)
+            )
+        ).order_by().values_list('modelo_moto_id', 'total_vendido', 'ingresos')
+        df = pd.DataFrame.from_records(
+            list(filas), columns=['modelo_id', 'ventas_ano', 'ingresos_ano']
+        )
+        df['modelo_id'] = df['modelo_id'].astype('int64')
+        df['ventas_ano'] = df['ventas_ano'].astype('int64')
+        df['ingresos_ano'] = df['ingresos_ano'].astype('float64')
+        return df
+
+    def calcular(self):
+        """
+        Returns:
+            dict: Misma estructura que devolvía AnalyticsAvanzadosView
+        """
+        df = self.cargar_modelos().merge(self.cargar_ventas(), on='modelo_id', how='left')
+        df['ventas_ano'] = df['ventas_ano'].fillna(0).astype('int64')
+        df['ingresos_ano'] = df['ingresos_ano'].fillna(0.0)
+        df['nombre'] = df['marca'] + ' ' + df['modelo']
+        df['valor_inventario'] = df['precio_venta'] * df['stock']
+
+        abc = self._clasificar_abc(df)
+        rotacion = self._calcular_rotacion(df)
+
+        valor_total_inventario = float(df['valor_inventario'].sum())
+        total_modelos_activos = len(abc)
+        stock_total_unidades = int(abc['stock'].sum())
+
+        categorias = {}
+        for categoria in ['A', 'B', 'C']:
+            grupo = abc[abc['categoria'] == categoria]
+            categorias[f'categoria_{categoria.lower()}'] = {
+                'modelos': [
+                    {
+                        'modelo_id': modelo_id,
+                        'nombre': nombre,
+                        'stock': stock,
+                        'valor_inventario': valor,
+                        'porcentaje_valor': porcentaje,
+                    }
+                    for modelo_id, nombre, stock, valor, porcentaje in zip(
+                        grupo['modelo_id'].tolist(), grupo['nombre'].tolist(), grupo['stock'].tolist(),
+                        grupo['valor_inventario'].tolist(), grupo['porcentaje_valor'].tolist()
+                    )
+                ],
+                'cantidad_modelos': len(grupo),
+                'porcentaje_modelos': len(grupo) / total_modelos_activos * 100 if total_modelos_activos > 0 else 0,
+            }
+
+        metricas_rotacion = [
+            {
+                'modelo_id': modelo_id,
+                'nombre': nombre,
+                'stock_actual': stock,
+                'ventas_ano': ventas,
+                'rotacion_anual': rot,
+                'dias_promedio_venta': dias,
+                'eficiencia': eficiencia,
+                'ingresos_ano': ingresos,
+            }
+            for modelo_id, nombre, stock, ventas, rot, dias, eficiencia, ingresos in zip(
+                rotacion['modelo_id'].tolist(), rotacion['nombre'].tolist(), rotacion['stock'].tolist(),
+                rotacion['ventas_ano'].tolist(), rotacion['rotacion_anual'].tolist(),
+                rotacion['dias_promedio_venta'].tolist(), rotacion['eficiencia'].tolist(),
+                rotacion['ingresos_ano'].tolist()
+            )
+        ]
+
+        return {
+            'abc_analysis': categorias,
+            'rotacion_inventario': metricas_rotacion,
+            'metricas_generales': {
+                'valor_total_inventario': valor_total_inventario,
+                'total_modelos_activos': total_modelos_activos,
+                'stock_total_unidades': stock_total_unidades,
+                'rotacion_promedio': float(rotacion['rotacion_anual'].mean()) if len(rotacion) else 0,
+                'valor_promedio_por_unidad': valor_total_inventario / stock_total_unidades if stock_total_unidades > 0 else 0,
+            },
+            'fecha_referencia': self.fecha_fin.date().isoformat(),
+        }
+
+    def _clasificar_abc(self, df):
+        """A: 80% del valor acumulado, B: siguiente 15%, C: último 5%"""
+        valor_total = df['valor_inventario'].sum()
+        abc = df[df['stock'] > 0].sort_values('valor_inventario', ascending=False, kind='mergesort')
+
+        if valor_total > 0:
+            abc = abc.assign(porcentaje_valor=abc['valor_inventario'] / valor_total * 100)
+        else:
+            abc = abc.assign(porcentaje_valor=0.0)
+        porcentaje_acumulado = abc['porcentaje_valor'].cumsum()
+
+        abc['categoria'] = np.select(
+            [porcentaje_acumulado <= 80, porcentaje_acumulado <= 95], ['A', 'B'], default='C'
+        )
+        return abc
+
+    def _calcular_rotacion(self, df):
+        stock_promedio = (df['stock'] + df['ventas_ano']) / 2
+        rotacion_anual = np.where(
+            stock_promedio > 0, df['ventas_ano'] / stock_promedio.where(stock_promedio > 0, 1), 0.0
+        )
+        dias_promedio_venta = np.where(
+            rotacion_anual > 0, self.DIAS_VENTANA / np.where(rotacion_anual > 0, rotacion_anual, 1), 0.0
+        )
+
+        rotacion = df.assign(
+            rotacion_anual=np.round(rotacion_anual, 2),
+            dias_promedio_venta=np.round(dias_promedio_venta, 1),
+            eficiencia=np.select([rotacion_anual >= 6, rotacion_anual >= 2], ['alta', 'media'], default='baja'),
+        )
+        rotacion = rotacion[(rotacion['stock'] > 0) | (rotacion['ventas_ano'] > 0)]
+        return rotacion.sort_values('rotacion_anual', ascending=False, kind='mergesort')
+
+
+class AntiguedadSaldosService:
+    """
+    Antigüedad de las cuentas por pagar a proveedores.
+
+    El saldo de cada factura abierta (total menos los pagos aplicados a ella)
+    cae en un tramo según los días vencidos a la fecha de corte. El resumen de
+    todos los proveedores es una sola consulta agrupada sobre las facturas; los
+    pagos entran como subconsulta por factura para que el JOIN no multiplique
+    los totales. Los pagos generales sin factura no se reparten entre tramos.
+    """
+
+    ESTADOS_ABIERTOS = ['pendiente', 'vencida']
+    # (clave, días vencidos mínimos, días vencidos máximos)
+    TRAMOS = [
+        ('corriente', None, 0),
+        ('dias_1_30', 1, 30),
+        ('dias_31_60', 31, 60),
+        ('dias_61_90', 61, 90),
+        ('dias_90_mas', 91, None),
+    ]
+
+    def __init__(self, fecha_corte=None):
+        """
+        Args:
+            fecha_corte (date, opcional): Fecha contra la que se cuentan los días vencidos.
+                Por defecto hoy.
+        """
+        self.fecha_corte = fecha_corte or timezone.localdate()
+
+    def facturas_abiertas(self):
+        return FacturaProveedor.objects.con_saldo().filter(estado__in=self.ESTADOS_ABIERTOS, saldo__gt=0)
+
+    def tramo(self, dias_vencido):
+        for clave, minimo, maximo in self.TRAMOS:
+            if (minimo is None or dias_vencido >= minimo) and (maximo is None or dias_vencido <= maximo):
+                return clave
+
+    def _condicion_tramo(self, minimo, maximo):
+        """Traduce el rango de días vencidos a un rango de fecha_vencimiento"""
+        condicion = Q()
+        if minimo is not None:
+            condicion &= Q(fecha_vencimiento__lte=self.fecha_corte - timedelta(days=minimo))
+        if maximo is not None:
+            condicion &= Q(fecha_vencimiento__gte=self.fecha_corte - timedelta(days=maximo))
+        return condicion
+
+    def resumen(self):
+        """
+        Returns:
+            list[dict]: Una fila por proveedor con facturas abiertas: proveedor_id,
+                nombre_proveedor, facturas, el saldo de cada tramo y total
+        """
+        cero = Value(Decimal('0'), output_field=DecimalField(max_digits=14, decimal_places=2))
+        saldos_por_tramo = {
+            clave: Coalesce(Sum('saldo', filter=self._condicion_tramo(minimo, maximo)), cero)
+            for clave, minimo, maximo in self.TRAMOS
+        }
+        filas = self.facturas_abiertas().values('proveedor_id').annotate(
+            nombre_proveedor=F('proveedor__nombre'),
+            facturas=Count('id'),
+            **saldos_por_tramo,
+            total=Sum('saldo'),
+        ).order_by('proveedor__nombre', 'proveedor_id')
+        return list(filas)
+
+    def totales(self, filas):
+        """Suma de los tramos de todas las filas del resumen"""
+        claves = [clave for clave, _, _ in self.TRAMOS] + ['total']
+        return {clave: sum((fila[clave] for fila in filas), Decimal('0')) for clave in claves}
+
+    def detalle(self, proveedor_id):
+        """
+        Returns:
+            list[dict]: Facturas abiertas del proveedor, de la más vencida a la más
+                reciente, con su saldo, días vencidos y tramo
+        """
+        facturas = self.facturas_abiertas().filter(proveedor_id=proveedor_id).order_by(
+            'fecha_vencimiento', 'id'
+        ).values(
+            'id', 'numero_factura', 'fecha_emision', 'fecha_vencimiento', 'moneda',
+            'total', 'total_pagado', 'saldo'
+        )
+        resultado = []
+        for factura in facturas:
+            dias_vencido = (self.fecha_corte - factura['fecha_vencimiento']).days
+            resultado.append({**factura, 'dias_vencido': max(dias_vencido, 0), 'tramo': self.tramo(dias_vencido)})
+        return resultado
+
+
+class PlanificadorRestockService:
+    """
+    Planificador de re-stock vectorizado.
+
+    Carga con consultas agrupadas el stock, la demanda diaria, lo pendiente de
+    recibir y el tiempo de entrega de cada proveedor, y calcula para todos los
+    modelos activos a la vez (numpy sobre un DataFrame):
+
+        stock_seguridad = Z * σ_diaria * √tiempo_entrega
+        punto_reorden   = demanda_diaria * tiempo_entrega + stock_seguridad
+        eoq             = √(2 * demanda_anual * costo_pedido / (tasa_mantenimiento * precio_compra))
+
+    Un modelo se sugiere cuando su posición (stock + pendiente de recibir) no
+    supera el punto de reorden, o el stock mínimo fijado si es mayor.
+    """
+
+    DIAS_VENTANA = 90
+    TIEMPO_ENTREGA_DEFECTO = 15  # días, el mismo plazo que asume la orden automática
+    NIVEL_SERVICIO_Z = 1.65  # ~95 % de ciclos de reposición sin quiebre de stock
+    COSTO_PEDIDO = 50.0  # costo fijo de emitir una orden, en moneda de compra
+    TASA_MANTENIMIENTO_ANUAL = 0.25  # costo anual de mantener una unidad, sobre su precio de compra
+    ESTADOS_ORDEN_ABIERTA = ['borrador', 'enviada', 'confirmada', 'recibida_parcial']
+
+    def __init__(self, fecha_referencia=None):
+        """
+        Args:
+            fecha_referencia (date, opcional): Último día de la ventana de demanda. Por defecto hoy.
+        """
+        self.fecha_fin = fecha_referencia or timezone.localdate()
+        self.fecha_inicio = self.fecha_fin - timedelta(days=self.DIAS_VENTANA - 1)
+
+    def cargar_modelos(self, proveedor_id=None):
+        """Consulta 1: modelos activos con stock, precio y proveedor"""
+        modelos = MotoModelo.objects.filter(activa=True)
+        if proveedor_id:
+            modelos = modelos.filter(proveedor_id=proveedor_id)
+        filas = modelos.values_list(
+            'id', 'marca', 'modelo', 'ano', 'precio_compra', 'proveedor_id',
+            'proveedor__nombre', 'proveedor__nombre_comercial', 'stock_resumen__total_unidades'
+        ).order_by('marca', 'modelo', 'ano', 'id')
+        df = pd.DataFrame.from_records(
+            list(filas),
+            columns=[
+                'modelo_id', 'marca', 'modelo', 'ano', 'precio_compra', 'proveedor_id',
+                'proveedor_nombre', 'proveedor_nombre_comercial', 'stock_actual'
+            ]
+        )
+        df['modelo_id'] = df['modelo_id'].astype('int64')
+        df['stock_actual'] = df['stock_actual'].fillna(0).astype('int64')
+        df['proveedor_id'] = df['proveedor_id'].astype('Int64')
+        return df
+
+    def cargar_demanda(self):
+        """Consulta 2: suma y suma de cuadrados de las unidades diarias de la ventana"""
+        from ventas.models import VentaDiariaModelo
+
+        filas = VentaDiariaModelo.objects.filter(
+            fecha__gte=self.fecha_inicio, fecha__lte=self.fecha_fin
+        ).values('modelo_moto_id').annotate(
+            total_unidades=Sum('unidades'),
+            total_cuadrados=Sum(F('unidades') * F('unidades'))
+        ).order_by().values_list('modelo_moto_id', 'total_unidades', 'total_cuadrados')
+        df = pd.DataFrame.from_records(list(filas), columns=['modelo_id', 'unidades', 'cuadrados'])
+        return df.astype({'modelo_id': 'int64', 'unidades': 'float64', 'cuadrados': 'float64'})
+
+    def cargar_pendiente(self):
+        """Consulta 3: unidades de órdenes abiertas que aún no se recibieron"""
+        filas = DetalleOrdenCompra.objects.filter(
+            orden__estado__in=self.ESTADOS_ORDEN_ABIERTA
+        ).values('modelo_moto_id').annotate(
+            pendiente=Sum(F('cantidad_solicitada') - F('cantidad_recibida'))
+        ).order_by().values_list('modelo_moto_id', 'pendiente')
+        df = pd.DataFrame.from_records(list(filas), columns=['modelo_id', 'pendiente_recibir'])
+        return df.astype({'modelo_id': 'int64', 'pendiente_recibir': 'int64'})
+
+    def cargar_tiempos_entrega(self):
+        """Consulta 4: plazo medio (entrega esperada - fecha de orden) de cada proveedor"""
+        filas = OrdenCompra.objects.exclude(estado='cancelada').values_list(
+            'proveedor_id', 'fecha_orden', 'fecha_entrega_esperada'
+        ).order_by()
+        df = pd.DataFrame.from_records(list(filas), columns=['proveedor_id', 'fecha_orden', 'fecha_entrega'])
+        if df.empty:
+            return pd.DataFrame({'proveedor_id': pd.Series(dtype='Int64'), 'tiempo_entrega': pd.Series(dtype='float64')})
+        df['tiempo_entrega'] = (pd.to_datetime(df['fecha_entrega']) - pd.to_datetime(df['fecha_orden'])).dt.days
+        df = df[df['tiempo_entrega'] > 0]
+        df = df.groupby('proveedor_id', as_index=False)['tiempo_entrega'].mean()
+        return df.astype({'proveedor_id': 'Int64', 'tiempo_entrega': 'float64'})
+
+    def calcular(self, proveedor_id=None, stock_minimo=0):
+        """
+        Returns:
+            DataFrame: Un renglón por modelo activo con las métricas de reposición,
+                cantidad_sugerida y la marca requiere_pedido
+        """
+        df = self.cargar_modelos(proveedor_id)
+        df = df.merge(self.cargar_demanda(), on='modelo_id', how='left')
+        df = df.merge(self.cargar_pendiente(), on='modelo_id', how='left')
+        df = df.merge(self.cargar_tiempos_entrega(), on='proveedor_id', how='left')
+
+        unidades = df['unidades'].fillna(0.0).to_numpy()
+        cuadrados = df['cuadrados'].fillna(0.0).to_numpy()
+        precio = df['precio_compra'].astype('float64').to_numpy()
+        tiempo_entrega = df['tiempo_entrega'].fillna(self.TIEMPO_ENTREGA_DEFECTO).to_numpy()
+        pendiente = df['pendiente_recibir'].fillna(0).astype('int64').to_numpy()
+        posicion = df['stock_actual'].to_numpy() + pendiente
+
+        # Días sin ventas cuentan como demanda cero: media y varianza sobre toda la ventana
+        demanda_diaria = unidades / self.DIAS_VENTANA
+        desviacion = np.sqrt(np.maximum(cuadrados / self.DIAS_VENTANA - demanda_diaria ** 2, 0.0))
+        stock_seguridad = self.NIVEL_SERVICIO_Z * desviacion * np.sqrt(tiempo_entrega)
+        punto_reorden = demanda_diaria * tiempo_entrega + stock_seguridad
+
+        costo_mantenimiento = self.TASA_MANTENIMIENTO_ANUAL * precio
+        with np.errstate(divide='ignore', invalid='ignore'):
+            eoq = np.where(
+                costo_mantenimiento > 0,
+                np.sqrt(2 * demanda_diaria * 365 * self.COSTO_PEDIDO / costo_mantenimiento),
+                0.0
+            )
+
+        # Se pide lo mayor entre el lote económico y lo que falta para superar el umbral
+        umbral = np.maximum(np.ceil(punto_reorden), stock_minimo)
+        requiere_pedido = posicion <= umbral
+        cantidad = np.maximum(np.ceil(eoq), umbral - posicion + 1)
+
+        df['pendiente_recibir'] = pendiente
+        df['tiempo_entrega'] = tiempo_entrega
+        df['demanda_diaria'] = demanda_diaria.round(3)
+        df['stock_seguridad'] = np.ceil(stock_seguridad).astype('int64')
+        df['punto_reorden'] = np.ceil(punto_reorden).astype('int64')
+        df['eoq'] = np.ceil(eoq).astype('int64')
+        df['requiere_pedido'] = requiere_pedido
+        df['cantidad_sugerida'] = np.where(requiere_pedido, cantidad, 0).astype('int64')
+        return df
+
+    def sugerencias(self, proveedor_id=None, stock_minimo=0):
+        """
+        Returns:
+            list[dict]: Modelos que requieren pedido, con las claves que espera el
+                gestor de re-stock más las métricas del cálculo
+        """
+        df = self.calcular(proveedor_id, stock_minimo)
+        df = df[df['requiere_pedido']]
+        resultado = []
+        for fila in df.to_dict('records'):
+            proveedor = None
+            if not pd.isna(fila['proveedor_id']):
+                nombre, comercial = fila['proveedor_nombre'], fila['proveedor_nombre_comercial']
+                proveedor = f"{comercial} ({nombre})" if comercial and comercial != nombre else nombre
+            resultado.append({
+                'modelo_id': fila['modelo_id'],
+                'modelo_nombre': f"{fila['marca']} {fila['modelo']} {fila['ano']}",
+                'proveedor': proveedor or 'Sin proveedor',
+                'proveedor_id': None if proveedor is None else int(fila['proveedor_id']),
+                'stock_actual': fila['stock_actual'],
+                'stock_minimo': stock_minimo,
+                'pendiente_recibir': fila['pendiente_recibir'],
+                'demanda_diaria': fila['demanda_diaria'],
+                'tiempo_entrega_dias': fila['tiempo_entrega'],
+                'stock_seguridad': fila['stock_seguridad'],
+                'punto_reorden': fila['punto_reorden'],
+                'eoq': fila['eoq'],
+                'cantidad_sugerida': fila['cantidad_sugerida'],
+                'precio_compra': fila['precio_compra'],
+                'total_estimado': fila['precio_compra'] * fila['cantidad_sugerida'],
+            })
+        return resultado
+
+    @transaction.atomic
+    def crear_orden(self, proveedor, lineas, usuario, fecha_entrega=None):
+        """
+        Crea una orden de compra en borrador con sus detalles en un solo bulk_create.
+
+        Args:
+            proveedor: Proveedor de la orden
+            lineas: Lista de dicts con modelo (MotoModelo), cantidad y color;
+                las líneas repetidas del mismo modelo y color se suman
+            usuario: Usuario que crea la orden
+            fecha_entrega (date, opcional): Por defecto hoy + TIEMPO_ENTREGA_DEFECTO
+        """
+        import uuid
+
+        cantidades = {}
+        for linea in lineas:
+            clave = (linea['modelo'], linea.get('color') or 'Varios')
+            cantidades[clave] = cantidades.get(clave, 0) + linea['cantidad']
+
+        hoy = timezone.localdate()
+        orden = OrdenCompra.objects.create(
+            proveedor=proveedor,
+            numero_orden=f"OC-{hoy.strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}",
+            fecha_orden=hoy,
+            fecha_entrega_esperada=fecha_entrega or hoy + timedelta(days=self.TIEMPO_ENTREGA_DEFECTO),
+            estado='borrador',
+            prioridad='normal',
+            creado_por=usuario,
+            notas='Orden generada automáticamente por sugerencias de re-stock'
+        )
+        detalles = DetalleOrdenCompra.objects.bulk_create([
+            DetalleOrdenCompra(
+                orden=orden,
+                modelo_moto=modelo,
+                color=color,
+                cantidad_solicitada=cantidad,
+                precio_unitario=modelo.precio_compra or 0,
+                subtotal=(modelo.precio_compra or 0) * cantidad
+            )
+            for (modelo, color), cantidad in cantidades.items()
+        ])
+
+        orden.subtotal = sum(detalle.subtotal for detalle in detalles)
+        orden.total = orden.subtotal  # Sin impuestos por ahora
+        orden.save(update_fields=['subtotal', 'total', 'fecha_actualizacion'])
+        return orden
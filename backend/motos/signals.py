@@ -0,0 +1,63 @@
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .exportacion import TABLAS_EXPORTACION
+from .models import MotoModelo, MotoInventario, VersionDatos
+from .services import StockModeloService
+
+
+@receiver(post_save, sender=MotoModelo)
+def crear_resumen_stock_modelo(sender, instance, created, **kwargs):
+    """Todo modelo nuevo arranca con su resumen de stock en cero"""
+    if created:
+        StockModeloService().recalcular(instance.id)
+
+
+@receiver(post_save, sender=MotoInventario)
+def actualizar_resumen_stock_guardado(sender, instance, **kwargs):
+    """Mantiene el resumen del modelo al crear o modificar inventario"""
+    modelo_anterior = getattr(instance, '_modelo_id_guardado', None)
+    instance.recordar_modelo_guardado()
+    if StockModeloService.diferido():
+        return
+    servicio = StockModeloService()
+    # Si la fila pasó a otro modelo, el resumen del anterior también cambia
+    if modelo_anterior is not None and modelo_anterior != instance.modelo_id:
+        servicio.recalcular(modelo_anterior, crear=False)
+    servicio.recalcular(instance.modelo_id)
+
+
+@receiver(post_delete, sender=MotoInventario)
+def actualizar_resumen_stock_eliminado(sender, instance, origin=None, **kwargs):
+    """Mantiene el resumen del modelo al eliminar inventario"""
+    # Si se está borrando el modelo completo, el resumen cae en cascada
+    if isinstance(origin, MotoModelo) or getattr(origin, 'model', None) is MotoModelo:
+        return
+    # Borrados masivos que ya recalculan el resumen por su cuenta (InventarioModeloService)
+    if StockModeloService.diferido():
+        return
+    StockModeloService().recalcular(instance.modelo_id, crear=False)
+
+
+# Campos que ninguna exportación lee: guardarlos solos no invalida la caché
+# (last_login se guarda en cada inicio de sesión)
+CAMPOS_NO_EXPORTADOS = {'last_login'}
+
+
+def registrar_cambio_exportable(sender, update_fields=None, **kwargs):
+    """Invalida las exportaciones en caché que dependen de la tabla modificada"""
+    if update_fields and set(update_fields) <= CAMPOS_NO_EXPORTADOS:
+        return
+    VersionDatos.registrar_cambio(sender)
+
+
+def conectar_versiones_exportacion():
+    tablas = sorted({tabla for tablas in TABLAS_EXPORTACION.values() for tabla in tablas})
+    for tabla in tablas:
+        modelo = apps.get_model(tabla)
+        post_save.connect(registrar_cambio_exportable, sender=modelo, dispatch_uid=f'version_datos_guardado_{tabla}')
+        post_delete.connect(registrar_cambio_exportable, sender=modelo, dispatch_uid=f'version_datos_borrado_{tabla}')
+
+
+conectar_versiones_exportacion()
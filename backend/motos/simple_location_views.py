@@ -8,6 +8,7 @@ from django.utils import timezone
 import qrcode
 import io
 import base64
+from concesionario_app.campos_parciales import CamposParcialesMixin
 from .models import Almacen, Zona, Pasillo, Ubicacion
 
 # Serializers simples
@@ -16,7 +17,7 @@ class SimpleUbicacionSerializer(serializers.ModelSerializer):
         model = Ubicacion
         fields = '__all__'
 
-class SimpleAlmacenViewSet(viewsets.ModelViewSet):
+class SimpleAlmacenViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     """ViewSet simplificado para almacenes"""
     queryset = Almacen.objects.all()
     permission_classes = [AllowAny]
@@ -36,7 +37,7 @@ class SimpleAlmacenViewSet(viewsets.ModelViewSet):
             })
         return Response(data)
 
-class SimpleZonaViewSet(viewsets.ModelViewSet):
+class SimpleZonaViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     """ViewSet simplificado para zonas"""
     queryset = Zona.objects.all()
     permission_classes = [AllowAny]
@@ -65,7 +66,7 @@ class SimpleZonaViewSet(viewsets.ModelViewSet):
             })
         return Response(data)
 
-class SimplePasilloViewSet(viewsets.ModelViewSet):
+class SimplePasilloViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     """ViewSet simplificado para pasillos"""
     queryset = Pasillo.objects.all()
     permission_classes = [AllowAny]
@@ -97,7 +98,7 @@ class SimplePasilloViewSet(viewsets.ModelViewSet):
             })
         return Response(data)
 
-class SimpleUbicacionViewSet(viewsets.ModelViewSet):
+class SimpleUbicacionViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     """ViewSet simplificado para ubicaciones"""
     queryset = Ubicacion.objects.all()
     serializer_class = SimpleUbicacionSerializer
@@ -1,3 +1,1142 @@
-from django.test import TestCase
+import io
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import skipIf
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from usuarios.models import Rol, Usuario
+from .exportacion import pa
+from .importacion import ImportadorInventario, ImportadorUbicaciones, leer_en_bloques
+from .models import (
+    Moto, MotoModelo, MotoInventario, Proveedor, FacturaProveedor, PagoProveedor, OrdenCompra, DetalleOrdenCompra,
+    TrabajoImportacion, Almacen, Zona, Pasillo, Ubicacion
+)
+from .services import (
+    AntiguedadSaldosService, InventarioModeloService, PlanificadorRestockService, StockModeloService
+)
+
+
+class CatalogoModelosQueryCountTest(TestCase):
+    """El listado /api/motos/modelos/ debe costar un número fijo de consultas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre_rol='admin')
+        cls.usuario = Usuario.objects.create_user(username='catalogo', password='x', rol=rol)
+        cls.proveedor = Proveedor.objects.create(
+            nombre='Proveedor Test', rnc='101000001', direccion='Calle 1', ciudad='Santiago'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def crear_modelos(self, cantidad):
+        for i in range(MotoModelo.objects.count(), MotoModelo.objects.count() + cantidad):
+            modelo = MotoModelo.objects.create(
+                marca='Honda', modelo=f'CB{i}', ano=2024,
+                precio_compra=1000, precio_venta=1500, proveedor=self.proveedor
+            )
+            MotoInventario.objects.create(modelo=modelo, color='Rojo', cantidad_stock=2)
+            MotoInventario.objects.create(modelo=modelo, color='Azul', cantidad_stock=1)
+
+    def contar_consultas(self, url='/api/motos/modelos/'):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return consultas, response
+
+    def test_consultas_constantes_por_pagina(self):
+        self.crear_modelos(3)
+        # 3 modelos y luego una página completa de 20
+        consultas_pocos, _ = self.contar_consultas()
+
+        self.crear_modelos(17)
+        consultas_muchos, response = self.contar_consultas()
+
+        self.assertEqual(len(consultas_pocos), len(consultas_muchos))
+        self.assertLessEqual(len(consultas_muchos), 3)
+
+        primero = response.data['results'][0]
+        self.assertEqual(primero['total_stock'], 3)
+        self.assertEqual(primero['colores_disponibles'], {'Azul': 1, 'Rojo': 2})
+        self.assertEqual(len(primero['inventario']), 2)
+        self.assertEqual(primero['proveedor_nombre'], 'Proveedor Test')
+
+
+    def test_campos_parciales_podan_la_consulta(self):
+        self.crear_modelos(2)
+
+        consultas, response = self.contar_consultas('/api/motos/modelos/?fields=id,nombre_completo,total_stock')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'nombre_completo', 'total_stock'})
+        self.assertEqual(response.data['results'][0]['total_stock'], 3)
+        # Conteo y página, sin inventario, proveedor ni columnas que no se usan
+        self.assertEqual(len(consultas), 2)
+        self.assertNotIn('descripcion', consultas[1]['sql'])
+        self.assertNotIn('motos_proveedor', consultas[1]['sql'])
+
+        consultas, response = self.contar_consultas('/api/motos/modelos/?omit=inventario,colores_disponibles')
+        self.assertNotIn('inventario', response.data['results'][0])
+        self.assertEqual(len(consultas), 2)
+
+        response = self.client.get('/api/motos/modelos/?fields=id,no_existe')
+        self.assertEqual(response.status_code, 400)
+
+
+class ProveedorTotalesTest(TestCase):
+    """Los totales de proveedores salen de subconsultas anotadas, no de consultas por fila"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre_rol='admin')
+        cls.usuario = Usuario.objects.create_user(username='compras', password='x', rol=rol)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def crear_proveedor(self, i, limite_credito=None):
+        proveedor = Proveedor.objects.create(
+            nombre=f'Proveedor {i:02d}', rnc=f'1010{i:05d}', direccion='Calle 1', ciudad='Santiago',
+            limite_credito=limite_credito
+        )
+        for j in range(2):
+            MotoModelo.objects.create(
+                marca='Honda', modelo=f'CB{i}-{j}', ano=2024,
+                precio_compra=1000 + j, precio_venta=1500, proveedor=proveedor
+            )
+        for numero, (total, estado) in enumerate([(300, 'pendiente'), (200, 'pendiente'), (999, 'pagada')]):
+            FacturaProveedor.objects.create(
+                proveedor=proveedor, numero_factura=f'F-{i}-{numero}', fecha_emision='2024-01-01',
+                fecha_vencimiento='2024-02-01', total=total, estado=estado
+            )
+        return proveedor
+
+    def test_totales_anotados(self):
+        proveedor = self.crear_proveedor(0, limite_credito=800)
+        self.crear_proveedor(1)
+
+        anotado = Proveedor.objects.con_totales().get(pk=proveedor.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(anotado.total_compras(), Decimal('2001'))
+            self.assertEqual(anotado.total_motocicletas(), 2)
+            self.assertEqual(anotado.saldo_actual(), Decimal('500'))
+            self.assertEqual(anotado.credito_disponible(), Decimal('300'))
+
+        # Sin anotaciones los métodos siguen calculando lo mismo
+        sin_anotar = Proveedor.objects.get(pk=proveedor.pk)
+        self.assertEqual(sin_anotar.saldo_actual(), anotado.saldo_actual())
+        self.assertEqual(sin_anotar.credito_disponible(), anotado.credito_disponible())
+        self.assertEqual(Proveedor.objects.con_totales().get(nombre='Proveedor 01').credito_disponible(), 0)
+
+        detalle = self.client.get(f'/api/motos/proveedores/{proveedor.pk}/').data
+        self.assertEqual(detalle['total_motocicletas'], 2)
+        self.assertEqual(Decimal(detalle['credito_disponible']), Decimal('300'))
+
+    def test_listado_con_consultas_constantes(self):
+        self.crear_proveedor(0)
+        with CaptureQueriesContext(connection) as pocos:
+            self.client.get('/api/motos/proveedores/')
+        for i in range(1, 10):
+            self.crear_proveedor(i)
+        with CaptureQueriesContext(connection) as muchos:
+            response = self.client.get('/api/motos/proveedores/')
+
+        self.assertEqual(len(pocos), len(muchos))
+        self.assertEqual([fila['total_motocicletas'] for fila in response.data['results']], [2] * 10)
+
+
+class AntiguedadSaldosTest(TestCase):
+    """Los saldos por tramo de todos los proveedores salen de una consulta agrupada"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre_rol='admin')
+        cls.usuario = Usuario.objects.create_user(username='contabilidad', password='x', rol=rol)
+        cls.corte = datetime(2024, 6, 30).date()
+        cls.proveedor_a = Proveedor.objects.create(nombre='Alfa', rnc='1', direccion='Calle 1', ciudad='Santiago')
+        cls.proveedor_b = Proveedor.objects.create(nombre='Beta', rnc='2', direccion='Calle 2', ciudad='Santiago')
+
+        def factura(proveedor, numero, dias_vencido, total, estado='pendiente'):
+            return FacturaProveedor.objects.create(
+                proveedor=proveedor, numero_factura=numero, fecha_emision='2024-01-01',
+                fecha_vencimiento=cls.corte - timedelta(days=dias_vencido), total=total, estado=estado
+            )
+
+        factura(cls.proveedor_a, 'A-1', -5, 100)    # corriente
+        factura(cls.proveedor_a, 'A-2', 0, 50)      # vence hoy: corriente
+        parcial = factura(cls.proveedor_a, 'A-3', 30, 400)
+        factura(cls.proveedor_a, 'A-4', 45, 200, estado='vencida')
+        factura(cls.proveedor_a, 'A-5', 120, 999, estado='pagada')
+        factura(cls.proveedor_a, 'A-6', 120, 999, estado='anulada')
+        factura(cls.proveedor_b, 'B-1', 61, 70)
+        factura(cls.proveedor_b, 'B-2', 91, 30)
+        for numero, monto in enumerate([100, 50]):
+            PagoProveedor.objects.create(
+                proveedor=cls.proveedor_a, factura=parcial, numero_pago=f'P-{numero}',
+                fecha_pago='2024-06-01', monto=monto
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def test_resumen_por_tramos(self):
+        servicio = AntiguedadSaldosService(self.corte)
+        with self.assertNumQueries(1):
+            alfa, beta = servicio.resumen()
+
+        self.assertEqual(alfa['nombre_proveedor'], 'Alfa')
+        self.assertEqual(alfa['facturas'], 4)
+        self.assertEqual(
+            [alfa[clave] for clave in ['corriente', 'dias_1_30', 'dias_31_60', 'dias_61_90', 'dias_90_mas', 'total']],
+            [Decimal('150'), Decimal('250'), Decimal('200'), 0, 0, Decimal('600')]
+        )
+        self.assertEqual((beta['dias_61_90'], beta['dias_90_mas'], beta['total']), (Decimal('70'), Decimal('30'), 100))
+        self.assertEqual(servicio.totales([alfa, beta])['total'], Decimal('700'))
+
+        response = self.client.get('/api/motos/proveedores/antiguedad-saldos/', {'fecha_corte': '2024-06-30'})
+        self.assertEqual(Decimal(response.data['totales']['dias_1_30']), Decimal('250'))
+
+        response = self.client.get(
+            '/api/motos/proveedores/antiguedad-saldos/', {'fecha_corte': '2024-06-30', 'export_format': 'csv'}
+        )
+        lineas = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lineas[0], 'ID_Proveedor,Proveedor,Facturas,Corriente,Dias_1_30,Dias_31_60,Dias_61_90,Dias_90_Mas,Total')
+        self.assertEqual(len(lineas), 3)
+
+        self.assertEqual(self.client.get('/api/motos/proveedores/antiguedad-saldos/', {'fecha_corte': 'junio'}).status_code, 400)
+
+    def test_detalle_proveedor(self):
+        response = self.client.get(
+            f'/api/motos/proveedores/{self.proveedor_a.id}/antiguedad-saldos/', {'fecha_corte': '2024-06-30'}
+        )
+        facturas = response.data['facturas']
+        self.assertEqual([factura['numero_factura'] for factura in facturas], ['A-4', 'A-3', 'A-2', 'A-1'])
+        self.assertEqual((facturas[1]['saldo'], facturas[1]['dias_vencido'], facturas[1]['tramo']), (250, 30, 'dias_1_30'))
+        self.assertEqual(response.data['total'], Decimal('600'))
+
+        # El listado de facturas usa el saldo anotado en lugar de una consulta por factura
+        factura = FacturaProveedor.objects.con_saldo().get(numero_factura='A-3')
+        with self.assertNumQueries(0):
+            self.assertEqual(factura.monto_pendiente, Decimal('250'))
+        self.assertEqual(FacturaProveedor.objects.get(numero_factura='A-3').monto_pendiente, Decimal('250'))
+
+
+class PlanificadorRestockTest(TestCase):
+    """Punto de reorden, stock de seguridad y EOQ de todos los modelos con consultas agrupadas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from ventas.models import VentaDiariaModelo
+
+        rol = Rol.objects.create(nombre_rol='admin')
+        cls.usuario = Usuario.objects.create_user(username='compras', password='x', rol=rol)
+        cls.proveedor = Proveedor.objects.create(nombre='Alfa', rnc='1', direccion='Calle 1', ciudad='Santiago')
+        cls.hoy = timezone.localdate()
+
+        def modelo(nombre, stock):
+            resultado = MotoModelo.objects.create(
+                marca='Honda', modelo=nombre, ano=2024, precio_compra=1000, precio_venta=1500,
+                proveedor=cls.proveedor
+            )
+            MotoInventario.objects.create(modelo=resultado, color='Rojo', cantidad_stock=stock)
+            return resultado
+
+        cls.rotacion = modelo('Rotacion', 5)
+        cls.quieto = modelo('Quieto', 100)
+        cls.escaso = modelo('Escaso', 2)
+
+        # 2 unidades diarias durante toda la ventana: demanda constante, sin desviación
+        VentaDiariaModelo.objects.bulk_create([
+            VentaDiariaModelo(modelo_moto=cls.rotacion, fecha=cls.hoy - timedelta(days=dia), unidades=2, ingresos=3000)
+            for dia in range(PlanificadorRestockService.DIAS_VENTANA)
+        ])
+        # Orden abierta: 10 días de plazo y 3 unidades en camino
+        orden = OrdenCompra.objects.create(
+            proveedor=cls.proveedor, numero_orden='OC-1', fecha_orden=cls.hoy - timedelta(days=20),
+            fecha_entrega_esperada=cls.hoy - timedelta(days=10), estado='enviada'
+        )
+        DetalleOrdenCompra.objects.create(
+            orden=orden, modelo_moto=cls.rotacion, color='Rojo', cantidad_solicitada=3,
+            precio_unitario=1000, subtotal=3000
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def test_calculo_vectorizado(self):
+        with self.assertNumQueries(4):
+            sugerencias = PlanificadorRestockService(self.hoy).sugerencias(stock_minimo=5)
+
+        por_modelo = {sugerencia['modelo_id']: sugerencia for sugerencia in sugerencias}
+        self.assertNotIn(self.quieto.id, por_modelo)
+
+        rotacion = por_modelo[self.rotacion.id]
+        self.assertEqual(rotacion['demanda_diaria'], 2)
+        self.assertEqual(rotacion['tiempo_entrega_dias'], 10)
+        self.assertEqual(rotacion['stock_seguridad'], 0)
+        self.assertEqual(rotacion['punto_reorden'], 20)
+        self.assertEqual(rotacion['pendiente_recibir'], 3)
+        # √(2 · 730 · 50 / 250) ≈ 17.1 supera lo que falta para pasar el punto de reorden (20 - 8 + 1)
+        self.assertEqual(rotacion['eoq'], 18)
+        self.assertEqual(rotacion['cantidad_sugerida'], 18)
+
+        # Sin ventas solo cuenta el stock mínimo
+        self.assertEqual(por_modelo[self.escaso.id]['cantidad_sugerida'], 4)
+
+    def test_crear_orden_con_sugerencias_del_planificador(self):
+        response = self.client.post(
+            '/api/motos/restock/crear-orden/', {'proveedor_id': self.proveedor.id}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        orden = OrdenCompra.objects.get(id=response.data['id'])
+        self.assertEqual(
+            sorted(orden.detalles.values_list('modelo_moto__modelo', 'cantidad_solicitada')), [('Rotacion', 18)]
+        )
+        self.assertEqual(orden.total, 18000)
+
+    def test_crear_orden_suma_lineas_repetidas(self):
+        sugerencias = [
+            {'modelo_id': self.escaso.id, 'cantidad_sugerida': 2, 'color': 'Azul'},
+            {'modelo_id': self.escaso.id, 'cantidad_sugerida': 3, 'color': 'Azul'},
+            {'modelo_id': self.quieto.id, 'cantidad': 1},
+        ]
+        response = self.client.post(
+            '/api/motos/restock/crear-orden/', {'proveedor_id': self.proveedor.id, 'sugerencias': sugerencias},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['detalles']), 2)
+        self.assertEqual(OrdenCompra.objects.get(id=response.data['id']).total, 6000)
+
+        response = self.client.post(
+            '/api/motos/restock/crear-orden/',
+            {'proveedor_id': self.proveedor.id, 'sugerencias': [{'modelo_id': 999999, 'cantidad': 1}]}, format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(OrdenCompra.objects.count(), 2)
+
+
+class EstadisticasModeloTest(TestCase):
+    """Las estadísticas de un modelo no deben crecer en consultas con las unidades vendidas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from usuarios.models import Cliente
+        from ventas.models import Venta
+
+        rol = Rol.objects.create(nombre_rol='admin')
+        cls.usuario = Usuario.objects.create_user(username='estadisticas', password='x', rol=rol)
+        cls.cliente = Cliente.objects.create(nombre='Ana', apellido='Pérez', cedula='001')
+        cls.modelo = MotoModelo.objects.create(
+            marca='Yamaha', modelo='FZ', ano=2024, precio_compra=1000, precio_venta=1500
+        )
+        MotoInventario.objects.create(modelo=cls.modelo, color='Negro', cantidad_stock=4, chasis='CH-1')
+        cls.venta_antigua = Venta.objects.create(
+            cliente=cls.cliente, usuario=cls.usuario, tipo_venta='contado', monto_total=0
+        )
+        Venta.objects.filter(pk=cls.venta_antigua.pk).update(
+            fecha_venta=timezone.make_aware(datetime(2024, 1, 15, 10, 0))
+        )
+        cls.venta_reciente = Venta.objects.create(
+            cliente=cls.cliente, usuario=cls.usuario, tipo_venta='contado', monto_total=0
+        )
+        Venta.objects.filter(pk=cls.venta_reciente.pk).update(
+            fecha_venta=timezone.make_aware(datetime(2024, 6, 15, 10, 0))
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def vender(self, venta, color, cantidad):
+        from .models import Moto
+        from ventas.models import VentaDetalle
+
+        moto = Moto.objects.create(
+            marca='Yamaha', modelo='FZ', ano=2024, color=color, chasis=f'M-{Moto.objects.count()}',
+            precio_compra=1000, precio_venta=1500, cantidad_stock=cantidad, modelo_moto=self.modelo
+        )
+        VentaDetalle.objects.create(venta=venta, moto=moto, cantidad=cantidad, precio_unitario=1500)
+
+    def consultar(self, **params):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(f'/api/motos/modelos/{self.modelo.id}/estadisticas/', params)
+        self.assertEqual(response.status_code, 200)
+        return len(consultas), response.data
+
+    def test_ventas_agrupadas_por_color(self):
+        self.vender(self.venta_antigua, 'Rojo', 1)
+        consultas_pocas, _ = self.consultar()
+
+        for _ in range(5):
+            self.vender(self.venta_reciente, 'Rojo', 2)
+        self.vender(self.venta_reciente, 'Azul', 1)
+        consultas_muchas, data = self.consultar()
+
+        self.assertEqual(consultas_pocas, consultas_muchas)
+        ventas = data['ventas_historicas']
+        # Los colores del inventario sin ventas aparecen con 0
+        self.assertEqual(ventas['por_color'], {'Negro': 0, 'Rojo': 11, 'Azul': 1})
+        self.assertEqual(ventas['ingresos_por_color']['Negro'], 0)
+        self.assertEqual(ventas['total_vendidas'], 12)
+        self.assertEqual(ventas['total_ingresos'], 18000.0)
+        self.assertEqual(data['inventario_actual']['stock_total'], 4)
+        self.assertEqual(data['inventario_actual']['por_color']['Negro']['chasis_list'][0]['chasis'], 'CH-1')
+
+    def test_rango_de_fechas(self):
+        self.vender(self.venta_antigua, 'Rojo', 1)
+        self.vender(self.venta_reciente, 'Azul', 3)
+
+        _, data = self.consultar(fecha_desde='2024-06-01', fecha_hasta='2024-06-15')
+        self.assertEqual(data['ventas_historicas']['por_color'], {'Negro': 0, 'Azul': 3})
+
+        _, data = self.consultar(fecha_hasta='2024-01-15')
+        self.assertEqual(data['ventas_historicas']['por_color'], {'Negro': 0, 'Rojo': 1})
+
+    def test_precio_con_descuento_por_color(self):
+        MotoInventario.objects.create(modelo=self.modelo, color='Blanco', cantidad_stock=1, descuento_porcentaje=10)
+        consultas_pocas, _ = self.consultar()
+        MotoInventario.objects.create(modelo=self.modelo, color='Gris', cantidad_stock=1, descuento_porcentaje=20)
+        consultas_muchas, data = self.consultar()
+
+        self.assertEqual(consultas_pocas, consultas_muchas)
+        por_color = data['inventario_actual']['por_color']
+        self.assertEqual(por_color['Blanco']['precio_con_descuento'], 1350.0)
+        self.assertEqual(por_color['Negro']['precio_con_descuento'], 1500.0)
+        self.assertEqual(data['ventas_historicas']['ingresos_por_color'], {'Negro': 0, 'Blanco': 0, 'Gris': 0})
+
+    def test_rango_de_fechas_invalido(self):
+        url = f'/api/motos/modelos/{self.modelo.id}/estadisticas/'
+        self.assertEqual(self.client.get(url, {'fecha_desde': '15/01/2024'}).status_code, 400)
+        self.assertEqual(
+            self.client.get(url, {'fecha_desde': '2024-06-01', 'fecha_hasta': '2024-01-01'}).status_code, 400
+        )
+
+
+class ResumenStockTest(TestCase):
+    """MotoModeloStock sigue al inventario y recalcular_stock_modelos corrige las diferencias"""
+
+    def setUp(self):
+        self.modelo = MotoModelo.objects.create(
+            marca='Yamaha', modelo='FZ', ano=2024, precio_compra=1000, precio_venta=1500
+        )
+
+    def resumen(self, modelo=None):
+        from .models import MotoModeloStock
+
+        resumen = MotoModeloStock.objects.get(modelo=modelo or self.modelo)
+        return resumen.total_unidades, resumen.unidades_por_color
+
+    def test_sigue_al_inventario(self):
+        self.assertEqual(self.resumen(), (0, {}))
+
+        rojo = MotoInventario.objects.create(modelo=self.modelo, color='Rojo', cantidad_stock=2)
+        azul = MotoInventario.objects.create(modelo=self.modelo, color='Azul', cantidad_stock=3)
+        self.assertEqual(self.resumen(), (5, {'Rojo': 2, 'Azul': 3}))
+
+        rojo.cantidad_stock = 4
+        rojo.save()
+        azul.delete()
+        self.assertEqual(self.resumen(), (4, {'Rojo': 4}))
+
+    def test_mover_inventario_a_otro_modelo(self):
+        otro = MotoModelo.objects.create(marca='Yamaha', modelo='R15', ano=2024, precio_compra=1, precio_venta=2)
+        rojo = MotoInventario.objects.create(modelo=self.modelo, color='Rojo', cantidad_stock=2)
+
+        rojo.modelo = otro
+        rojo.save()
+        self.assertEqual(self.resumen(), (0, {}))
+        self.assertEqual(self.resumen(otro), (2, {'Rojo': 2}))
+
+        # También desde una fila leída de la base
+        leido = MotoInventario.objects.get(pk=rojo.pk)
+        leido.modelo_id = self.modelo.id
+        leido.save()
+        self.assertEqual(self.resumen(), (2, {'Rojo': 2}))
+        self.assertEqual(self.resumen(otro), (0, {}))
+
+    def test_reconstruir_y_verificar(self):
+        from django.core.management import call_command
+        from .models import MotoModeloStock
+        from .services import StockModeloService
+
+        otro = MotoModelo.objects.create(marca='Yamaha', modelo='R15', ano=2024, precio_compra=1, precio_venta=2)
+        MotoInventario.objects.create(modelo=self.modelo, color='Negro', cantidad_stock=3)
+        MotoInventario.objects.create(modelo=otro, color='Azul', cantidad_stock=1)
+        # Cambios que no pasan por las señales
+        MotoInventario.objects.filter(modelo=self.modelo).update(cantidad_stock=7)
+        MotoModeloStock.objects.filter(modelo=otro).delete()
+
+        salida = io.StringIO()
+        call_command('recalcular_stock_modelos', solo_verificar=True, stdout=salida)
+        self.assertIn('2 modelos con resumen de stock desactualizado', salida.getvalue())
+        self.assertEqual(self.resumen(), (3, {'Negro': 3}))
+        self.assertFalse(MotoModeloStock.objects.filter(modelo=otro).exists())
+
+        # Tres lecturas agrupadas, un INSERT y un UPDATE en lote (más el savepoint)
+        with self.assertNumQueries(7):
+            diferencias = StockModeloService().reconstruir_todos()
+        self.assertEqual({diferencia['modelo_id'] for diferencia in diferencias}, {self.modelo.id, otro.id})
+        self.assertEqual(self.resumen(), (7, {'Negro': 7}))
+        self.assertEqual(self.resumen(otro), (1, {'Azul': 1}))
+        self.assertEqual(StockModeloService().reconstruir_todos(solo_verificar=True), [])
+
+
+class EnlaceModeloMotoTest(TestCase):
+    """Moto.modelo_moto se completa por marca/modelo/año, al guardar y en la migración de relleno"""
+
+    def crear_moto(self, chasis, modelo='CB190', ano=2024):
+        return Moto.objects.create(
+            marca='Honda', modelo=modelo, ano=ano, chasis=chasis, precio_compra=1000, precio_venta=1500
+        )
+
+    def test_save_enlaza_con_el_catalogo(self):
+        catalogo = MotoModelo.objects.create(marca='Honda', modelo='CB190', ano=2024, precio_compra=1, precio_venta=2)
+        otro = MotoModelo.objects.create(marca='Honda', modelo='XR', ano=2024, precio_compra=1, precio_venta=2)
+
+        self.assertEqual(self.crear_moto('CH-1').modelo_moto, catalogo)
+        self.assertIsNone(self.crear_moto('CH-2', ano=2020).modelo_moto)
+
+        # Un enlace explícito no se reemplaza por el texto
+        moto = Moto(marca='Honda', modelo='CB190', ano=2024, chasis='CH-3', precio_compra=1, precio_venta=2,
+                    modelo_moto=otro)
+        moto.save()
+        self.assertEqual(moto.modelo_moto, otro)
+
+    def test_migracion_rellena_por_lotes(self):
+        import importlib
+        from unittest import mock
+
+        from django.apps import apps
+
+        migracion = importlib.import_module('motos.migrations.0015_moto_modelo_moto')
+        legacy = [self.crear_moto(f'CH-{i}') for i in range(5)]
+        sin_catalogo = self.crear_moto('CH-X', modelo='Desconocido')
+        catalogo = MotoModelo.objects.create(marca='Honda', modelo='CB190', ano=2024, precio_compra=1, precio_venta=2)
+        self.assertFalse(Moto.objects.filter(modelo_moto__isnull=False).exists())
+
+        with mock.patch.object(migracion, 'TAMANO_LOTE', 2):
+            migracion.enlazar_motos_con_modelo(apps, None)
+
+        self.assertEqual(
+            set(Moto.objects.filter(modelo_moto=catalogo).values_list('id', flat=True)), {moto.id for moto in legacy}
+        )
+        sin_catalogo.refresh_from_db()
+        self.assertIsNone(sin_catalogo.modelo_moto_id)
+
+
+class AnalyticsInventarioTest(TestCase):
+    """El motor vectorizado clasifica igual que el bucle por modelo que reemplazó"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from ventas.models import Venta, VentaDetalle
+        from usuarios.models import Cliente
+
+        rol = Rol.objects.create(nombre_rol='admin')
+        usuario = Usuario.objects.create_user(username='analytics', password='x', rol=rol)
+        cliente = Cliente.objects.create(nombre='Ana', apellido='Mora', cedula='A-1')
+
+        # (precio, stock, [(unidades vendidas, días atrás)])
+        datos = [
+            (9000, 10, [(30, 20)]), (5000, 6, [(4, 100)]), (3100, 3, [(1, 200), (5, 400)]),
+            (1200, 2, []), (800, 1, [(9, 10)]), (650, 0, [(3, 30)]), (400, 1, []), (150, 2, [(1, 300)]),
+        ]
+        for i, (precio, stock, ventas) in enumerate(datos):
+            modelo = MotoModelo.objects.create(
+                marca='Marca', modelo=f'M{i}', ano=2024, precio_compra=precio / 2, precio_venta=precio
+            )
+            if stock:
+                MotoInventario.objects.create(modelo=modelo, color='Rojo', cantidad_stock=stock)
+            for j, (unidades, dias) in enumerate(ventas):
+                moto = Moto.objects.create(
+                    marca='Marca', modelo=f'M{i}', ano=2024, chasis=f'AN-{i}-{j}', precio_compra=1,
+                    precio_venta=precio, cantidad_stock=unidades, modelo_moto=modelo
+                )
+                venta = Venta.objects.create(cliente=cliente, usuario=usuario, tipo_venta='contado', monto_total=0)
+                VentaDetalle.objects.create(venta=venta, moto=moto, cantidad=unidades, precio_unitario=precio)
+                Venta.objects.filter(pk=venta.pk).update(fecha_venta=timezone.now() - timedelta(days=dias))
+        MotoModelo.objects.create(
+            marca='Marca', modelo='Inactivo', ano=2024, precio_compra=1, precio_venta=99999, activa=False
+        )
+
+    def analisis_con_bucle(self):
+        """Clasificación ABC y rotación calculadas como lo hacía AnalyticsAvanzadosView, modelo por modelo"""
+        from django.db.models import F, Sum
+        from ventas.models import VentaDetalle
+
+        modelos = list(MotoModelo.objects.filter(activa=True).prefetch_related('inventario'))
+        con_valor = []
+        valor_total = 0
+        for modelo in modelos:
+            stock = sum(item.cantidad_stock for item in modelo.inventario.all())
+            valor = float(modelo.precio_venta) * stock
+            valor_total += valor
+            if stock > 0:
+                con_valor.append((modelo.id, valor))
+        con_valor.sort(key=lambda item: item[1], reverse=True)
+
+        abc = {'A': [], 'B': [], 'C': []}
+        acumulado = 0
+        for modelo_id, valor in con_valor:
+            porcentaje = (acumulado + valor) / valor_total * 100
+            abc['A' if porcentaje <= 80 else 'B' if porcentaje <= 95 else 'C'].append(modelo_id)
+            acumulado += valor
+
+        rotacion = {}
+        for modelo in modelos:
+            vendido = VentaDetalle.objects.filter(
+                modelo_moto=modelo, venta__fecha_venta__gte=timezone.now() - timedelta(days=365)
+            ).aggregate(total=Sum('cantidad'), ingresos=Sum(F('precio_unitario') * F('cantidad')))
+            ventas = vendido['total'] or 0
+            stock = sum(item.cantidad_stock for item in modelo.inventario.all())
+            promedio = (stock + ventas) / 2
+            rotacion_anual = ventas / promedio if promedio > 0 else 0
+            eficiencia = 'alta' if rotacion_anual >= 6 else 'media' if rotacion_anual >= 2 else 'baja'
+            if stock > 0 or ventas > 0:
+                rotacion[modelo.id] = (ventas, round(rotacion_anual, 2), eficiencia, float(vendido['ingresos'] or 0))
+        return abc, rotacion, valor_total
+
+    def test_coincide_con_el_bucle(self):
+        from .services import AnalyticsInventarioService
+
+        abc, rotacion, valor_total = self.analisis_con_bucle()
+        with self.assertNumQueries(2):
+            resultado = AnalyticsInventarioService().calcular()
+
+        for categoria, modelo_ids in abc.items():
+            modelos = resultado['abc_analysis'][f'categoria_{categoria.lower()}']['modelos']
+            self.assertEqual([modelo['modelo_id'] for modelo in modelos], modelo_ids, categoria)
+        self.assertTrue(all(abc.values()))
+        self.assertEqual(
+            {
+                fila['modelo_id']: (fila['ventas_ano'], fila['rotacion_anual'], fila['eficiencia'], fila['ingresos_ano'])
+                for fila in resultado['rotacion_inventario']
+            },
+            rotacion
+        )
+        self.assertEqual({fila[2] for fila in rotacion.values()}, {'media', 'baja'})
+        self.assertAlmostEqual(resultado['metricas_generales']['valor_total_inventario'], valor_total)
+
+
+class SincronizarInventarioTest(TestCase):
+    """Editar un modelo aplica solo la diferencia del inventario"""
+
+    def setUp(self):
+        self.modelo = MotoModelo.objects.create(
+            marca='Suzuki', modelo='GN', ano=2024, precio_compra=1000, precio_venta=1500
+        )
+        self.rojo = MotoInventario.objects.create(modelo=self.modelo, color='Rojo', cantidad_stock=2, chasis='R-1')
+        self.azul = MotoInventario.objects.create(modelo=self.modelo, color='Azul', cantidad_stock=1)
+        self.verde = MotoInventario.objects.create(modelo=self.modelo, color='Verde', cantidad_stock=1)
+
+    def sincronizar(self, items):
+        with CaptureQueriesContext(connection) as consultas:
+            resultado = InventarioModeloService().sincronizar(self.modelo, items)
+        return resultado, len(consultas)
+
+    def test_conserva_filas_y_aplica_diferencia(self):
+        fecha_rojo = self.rojo.fecha_ingreso
+        resultado, _ = self.sincronizar([
+            {'chasis': 'R-1', 'color': 'Rojo', 'cantidad_stock': 5},
+            {'id': self.azul.id, 'color': 'Azul', 'cantidad_stock': 1, 'descuento_porcentaje': ''},
+            {'color': 'Negro', 'cantidad_stock': 3, 'descuento_porcentaje': '10'},
+        ])
+
+        self.assertEqual(resultado, {'creados': 1, 'actualizados': 1, 'eliminados': 1})
+        self.rojo.refresh_from_db()
+        self.assertEqual(self.rojo.cantidad_stock, 5)
+        self.assertEqual(self.rojo.fecha_ingreso, fecha_rojo)
+        self.assertFalse(MotoInventario.objects.filter(id=self.verde.id).exists())
+        self.assertEqual(MotoInventario.objects.get(color='Negro').descuento_porcentaje, 10)
+        self.assertEqual(self.modelo.stock_resumen.total_unidades, 9)
+
+    def test_borrado_no_recalcula_por_fila(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resultado = InventarioModeloService().sincronizar(self.modelo, [])
+        self.assertEqual(resultado['eliminados'], 3)
+        # Un solo recálculo (un SELECT agrupado del inventario), no uno por fila borrada
+        agrupados = [consulta for consulta in consultas if 'SUM("motos_motoinventario"."cantidad_stock")' in consulta['sql']]
+        self.assertEqual(len(agrupados), 1)
+        self.modelo.stock_resumen.refresh_from_db()
+        self.assertEqual(self.modelo.stock_resumen.total_unidades, 0)
+        self.assertFalse(StockModeloService.diferido())
+
+    def test_consultas_constantes(self):
+        _, consultas_pocas = self.sincronizar([
+            {'color': f'Color{i}', 'cantidad_stock': 1} for i in range(2)
+        ])
+        _, consultas_muchas = self.sincronizar([
+            {'color': f'Color{i}', 'cantidad_stock': 2} for i in range(2)
+        ] + [
+            {'color': f'Nuevo{i}', 'cantidad_stock': 1} for i in range(30)
+        ])
+        self.assertEqual(consultas_pocas, consultas_muchas)
+
+
+class AlertasInteligentesTest(TestCase):
+    """Las alertas leen el resumen de stock y el de ventas diarias: dos consultas en total"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre_rol='admin')
+        cls.usuario = Usuario.objects.create_user(username='alertas', password='x', rol=rol)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def crear_modelo(self, nombre, stock, ventas_recientes):
+        from ventas.models import VentaDiariaModelo
+
+        modelo = MotoModelo.objects.create(marca='Honda', modelo=nombre, ano=2024, precio_compra=1000, precio_venta=1500)
+        if stock:
+            MotoInventario.objects.create(modelo=modelo, color='Rojo', cantidad_stock=stock)
+        if ventas_recientes:
+            VentaDiariaModelo.objects.create(
+                modelo_moto=modelo, fecha=timezone.localdate() - timedelta(days=3),
+                unidades=ventas_recientes, ingresos=1500 * ventas_recientes
+            )
+        return modelo
+
+    def alertas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get('/api/motos/alertas/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['alertas'], len(consultas)
+
+    def test_consultas_constantes(self):
+        demandado = self.crear_modelo('CB190', stock=1, ventas_recientes=6)
+        alertas, pocas = self.alertas()
+        self.assertEqual(pocas, 2)
+        self.assertEqual(
+            {alerta['tipo'] for alerta in alertas if alerta['modelo_id'] == demandado.id},
+            {'stock_bajo', 'alta_demanda'}
+        )
+
+        for i in range(10):
+            self.crear_modelo(f'XR{i}', stock=i, ventas_recientes=i % 3)
+        _, muchas = self.alertas()
+        self.assertEqual(muchas, pocas)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImportarInventarioTest(TestCase):
+    """La importación por bloques crea modelos e inventario en lote y reporta errores por fila"""
+
+    CSV = (
+        'Marca,Modelo,Año,Color,Chasis,Precio_Venta,Proveedor\n'
+        'Honda,CB190R,2024,Rojo,CH-1,9500,Moto Import\n'
+        'Honda,CB190R,2024,Azul,CH-2,9500,Moto Import\n'
+        'Yamaha,FZ,2024,Negro,CH-1,8000,\n'
+        'Yamaha,FZ,2024,Negro,CH-3,gratis,\n'
+        'Yamaha,FZ,2024,Blanco,CH-4,8000,\n'
+    )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def subir(self, preview):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        archivo = SimpleUploadedFile('inventario.csv', self.CSV.encode(), content_type='text/csv')
+        return self.client.post(
+            '/api/motos/import/inventory/', {'file': archivo, 'preview': 'true' if preview else 'false'}
+        )
+
+    def test_vista_previa(self):
+        response = self.subir(preview=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_rows'], 5)
+        self.assertFalse(response.data['can_import'])
+        self.assertEqual(
+            response.data['errors'],
+            ['Fila 3: Chasis duplicado en el archivo', 'Fila 4: Precio de venta inválido']
+        )
+        self.assertFalse(MotoInventario.objects.exists())
+
+    @override_settings(IMPORTACIONES_EN_SEGUNDO_PLANO=True)
+    def test_importacion_en_segundo_plano(self):
+        from django.core.management import call_command
+
+        response = self.subir(preview=False)
+        self.assertEqual(response.status_code, 202)
+        status_url = response.data['status_url']
+        self.assertEqual(self.client.get(status_url).data['estado'], 'pendiente')
+        self.assertTrue(TrabajoImportacion.objects.get().contenido)
+        self.assertFalse(MotoInventario.objects.exists())
+
+        call_command('procesar_importaciones', una_vez=True, stdout=io.StringIO())
+
+        estado = self.client.get(status_url).data
+        self.assertEqual(estado['estado'], 'completado')
+        self.assertEqual(estado['filas_procesadas'], 5)
+        self.assertEqual(estado['filas_creadas'], 3)
+        self.assertEqual(estado['filas_fallidas'], 2)
+        self.assertEqual(estado['resultado']['modelos_creados'], 2)
+        self.assertEqual(estado['resultado']['proveedores_creados'], 1)
+
+        errores = self.client.get(estado['errores_url'])
+        self.assertEqual(
+            errores.content.decode().splitlines(),
+            ['fila,errores', '3,Chasis duplicado en el archivo', '4,Precio de venta inválido']
+        )
+
+        honda = MotoModelo.objects.get(marca='Honda', modelo='CB190R', ano=2024)
+        self.assertEqual(honda.proveedor.nombre, 'Moto Import')
+        self.assertEqual(honda.stock_resumen.total_unidades, 2)
+        self.assertEqual(
+            set(MotoInventario.objects.values_list('chasis', flat=True)), {'CH-1', 'CH-2', 'CH-4'}
+        )
+
+    @override_settings(IMPORTACIONES_EN_SEGUNDO_PLANO=False)
+    def test_sin_worker_se_procesa_en_la_peticion(self):
+        response = self.subir(preview=False)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['estado'], 'completado')
+        self.assertEqual(response.data['filas_creadas'], 3)
+        self.assertEqual(response.data['resultado']['modelos_creados'], 2)
+        self.assertIsNotNone(response.data['errores_url'])
+        self.assertEqual(MotoInventario.objects.count(), 3)
+        # El contenido se descarta una vez importado
+        self.assertEqual(bytes(TrabajoImportacion.objects.get().contenido), b'')
+
+    @override_settings(IMPORTACIONES_MINUTOS_MAXIMOS=30)
+    def test_trabajo_colgado_se_marca_fallido(self):
+        from .importacion import TrabajoImportacionService
+
+        colgado = TrabajoImportacion.objects.create(
+            tipo='inventario', estado='procesando', nombre_archivo='viejo.csv',
+            fecha_inicio=timezone.now() - timedelta(minutes=31)
+        )
+        en_curso = TrabajoImportacion.objects.create(
+            tipo='inventario', estado='procesando', nombre_archivo='nuevo.csv',
+            fecha_inicio=timezone.now() - timedelta(minutes=5)
+        )
+
+        self.assertIsNone(TrabajoImportacionService().tomar_siguiente())
+
+        colgado.refresh_from_db()
+        en_curso.refresh_from_db()
+        self.assertEqual(colgado.estado, 'fallido')
+        self.assertIsNotNone(colgado.fecha_fin)
+        self.assertTrue(colgado.mensaje_error)
+        self.assertEqual(en_curso.estado, 'procesando')
+
+    def test_vista_previa_valida_el_archivo_completo(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        filas = ''.join(f'Honda,CB190R,2024,Rojo,CH-{i},9500,\n' for i in range(12)) + 'Honda,CB190R,2024,Rojo,CH-X,gratis,\n'
+        archivo = SimpleUploadedFile('inventario.csv', (self.CSV.splitlines(True)[0] + filas).encode())
+        response = self.client.post('/api/motos/import/inventory/', {'file': archivo, 'preview': 'true'})
+
+        self.assertEqual(response.data['total_rows'], 13)
+        self.assertEqual(response.data['preview_rows'], 10)
+        self.assertEqual({item['status'] for item in response.data['items']}, {'ok'})
+        self.assertEqual(response.data['errors'], ['Fila 13: Precio de venta inválido'])
+        self.assertFalse(response.data['can_import'])
+
+    def test_columnas_faltantes_no_encolan(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        archivo = SimpleUploadedFile('inventario.csv', b'marca,modelo\nHonda,CB\n', content_type='text/csv')
+        response = APIClient().post('/api/motos/import/inventory/', {'file': archivo})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(TrabajoImportacion.objects.exists())
+
+    def test_validacion_completa_paginada(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        MotoInventario.objects.create(
+            modelo=MotoModelo.objects.create(marca='Honda', modelo='XR', ano=2024, precio_compra=1, precio_venta=2),
+            color='Rojo', chasis='CH-4'
+        )
+        archivo = SimpleUploadedFile('inventario.csv', self.CSV.encode(), content_type='text/csv')
+        response = self.client.post(
+            '/api/motos/import/validate/?page=2&page_size=2', {'file': archivo, 'type': 'inventory'}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['valid'])
+        self.assertEqual(response.data['total_rows'], 5)
+        self.assertEqual(response.data['filas_con_error'], 3)
+        self.assertEqual(response.data['errores_por_tipo'], {
+            'Chasis duplicado en el archivo': 1, 'Precio de venta inválido': 1, 'Chasis ya existe': 1
+        })
+        self.assertEqual(response.data['total_pages'], 2)
+        self.assertEqual(response.data['errores'], [{'fila': 5, 'errores': ['Chasis ya existe']}])
+
+    def test_reimportar_no_duplica_chasis(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        for _ in range(2):
+            archivo = SimpleUploadedFile('inventario.csv', self.CSV.encode())
+            resultado = ImportadorInventario().importar(leer_en_bloques(archivo, 2))
+        self.assertEqual(resultado['created_count'], 0)
+        self.assertEqual(MotoInventario.objects.count(), 3)
+
+
+class ImportarUbicacionesTest(TestCase):
+    """El árbol almacén > zona > pasillo se crea en lote, reutilizando los niveles existentes"""
+
+    def csv(self, filas):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        encabezado = 'almacen_nombre,zona_nombre,pasillo_nombre,ubicacion_nombre,ubicacion_capacidad\n'
+        return SimpleUploadedFile('ubicaciones.csv', (encabezado + ''.join(f'{fila}\n' for fila in filas)).encode())
+
+    def importar(self, archivo, tamano_bloque=1000):
+        return ImportadorUbicaciones().importar(leer_en_bloques(archivo, tamano_bloque))
+
+    def test_crea_jerarquia_y_reutiliza_existente(self):
+        almacen = Almacen.objects.create(nombre='Central', codigo='CEN')
+        Zona.objects.create(almacen=almacen, nombre='Nuevas', codigo='Nuevas', capacidad_maxima=10)
+
+        resultado = self.importar(self.csv([
+            'Central,Nuevas,A,E-1,2',
+            'central,nuevas,A,E-2,',
+            'Central,Usadas,B,E-1,',
+            'Norte,Nuevas,A,E-1,',
+            'Central,Nuevas,A,E-1,',
+            'Central,Nuevas,A,E-3,-1',
+        ]), tamano_bloque=2)
+
+        self.assertEqual(resultado['created_count'], 4)
+        self.assertEqual(resultado['errors'], [
+            'Fila 5: Ubicación duplicada en el archivo', 'Fila 6: ubicacion_capacidad debe ser un número positivo'
+        ])
+        self.assertEqual(Almacen.objects.count(), 2)
+        self.assertEqual(Zona.objects.filter(almacen=almacen).count(), 2)
+        self.assertEqual(Pasillo.objects.count(), 3)
+        self.assertEqual(
+            Ubicacion.objects.get(pasillo__zona__almacen=almacen, codigo='E-1', pasillo__nombre='A').capacidad_maxima, 2
+        )
+
+    def test_vista_previa_valida_el_archivo_completo(self):
+        filas = [f'Central,Nuevas,A,E-{i},' for i in range(12)] + ['Central,Nuevas,A,E-0,', 'Central,,A,E-99,']
+        response = APIClient().post('/api/motos/import/locations/', {'file': self.csv(filas), 'preview': 'true'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_rows'], 14)
+        self.assertEqual(response.data['preview_rows'], 10)
+        self.assertEqual({item['status'] for item in response.data['items']}, {'ok'})
+        # Los errores fuera de la muestra también impiden importar
+        self.assertEqual(len(response.data['errors']), 2)
+        self.assertTrue(response.data['errors'][0].startswith('Fila 13: '))
+        self.assertFalse(response.data['can_import'])
+        self.assertFalse(Ubicacion.objects.exists())
+
+    def test_vista_previa_columnas_faltantes(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        archivo = SimpleUploadedFile('ubicaciones.csv', b'almacen_nombre,zona_nombre\nCentral,Nuevas\n')
+        response = APIClient().post('/api/motos/import/locations/', {'file': archivo, 'preview': 'true'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Columnas faltantes', response.data['error'])
+
+    def test_codigo_generado_en_uso(self):
+        Almacen.objects.create(nombre='Otro', codigo='Sur')
+
+        resultado = self.importar(self.csv(['Sur,Z,A,E-1,']))
+        self.assertEqual(resultado['created_count'], 0)
+        self.assertEqual(resultado['errors'], ['Fila 1: Código de almacén "Sur" ya está en uso'])
+
+    def test_consultas_por_lote_no_por_fila(self):
+        filas = [f'Almacen{i % 3},Zona{i % 5},P{i % 7},U-{i},' for i in range(500)]
+        with CaptureQueriesContext(connection) as consultas:
+            resultado = self.importar(self.csv(filas), tamano_bloque=500)
+
+        self.assertEqual(resultado['created_count'], 500)
+        self.assertEqual(Pasillo.objects.count(), 105)
+        # Lectura del árbol + un INSERT por nivel; SQLite parte las ubicaciones por su límite de parámetros
+        self.assertLess(len(consultas), 25)
+
+
+class ExportacionTest(TestCase):
+    """Las exportaciones se generan recorriendo la consulta por lotes, con un número fijo de consultas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre_rol='admin')
+        cls.usuario = Usuario.objects.create_user(username='vendedor', password='x', rol=rol)
+
+    def setUp(self):
+        # Directorio propio por prueba: las versiones de datos se reinician con cada rollback
+        self.enterContext(override_settings(MEDIA_ROOT=tempfile.mkdtemp()))
+
+    def crear_ventas(self, cantidad, inicio=0):
+        from usuarios.models import Cliente
+        from ventas.models import Venta, VentaDetalle
+
+        # Las versiones de datos se incrementan al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(inicio, inicio + cantidad):
+                cliente = Cliente.objects.create(nombre=f'Cliente{i}', apellido='Pérez', cedula=f'C-{i}')
+                moto = Moto.objects.create(
+                    marca='Honda', modelo='CB190', ano=2024, chasis=f'CH-{i}',
+                    precio_compra=1000, precio_venta=1500, cantidad_stock=1
+                )
+                venta = Venta.objects.create(
+                    cliente=cliente, usuario=self.usuario, tipo_venta='contado', monto_total=1500
+                )
+                VentaDetalle.objects.create(venta=venta, moto=moto, cantidad=1, precio_unitario=1500)
+
+    def exportar(self, formato='csv'):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get('/api/motos/export/ventas/', {'export_format': formato})
+            self.assertTrue(response.streaming)
+            contenido = b''.join(response.streaming_content)
+        if formato == 'excel':
+            return contenido, len(consultas)
+        return contenido.decode().splitlines(), len(consultas)
+
+    def test_csv_por_fragmentos(self):
+        self.crear_ventas(3)
+        lineas, _ = self.exportar()
+
+        self.assertEqual(len(lineas), 4)
+        self.assertTrue(lineas[0].startswith('ID_Venta,Fecha_Venta,Cliente_Cedula'))
+        self.assertIn('C-0,Cliente0 Pérez', lineas[1])
+        self.assertIn(',CH-2,', lineas[3])
+
+    def test_consultas_constantes(self):
+        self.crear_ventas(2)
+        _, pocas = self.exportar()
+        self.crear_ventas(10, inicio=2)
+        _, muchas = self.exportar()
+        self.assertEqual(pocas, muchas)
+
+    def test_excel_solo_escritura(self):
+        from openpyxl import load_workbook
+
+        self.crear_ventas(3)
+        contenido, _ = self.exportar('excel')
+
+        hoja = load_workbook(io.BytesIO(contenido))['Ventas']
+        encabezado = [celda.value for celda in hoja[1]]
+        self.assertEqual(hoja.max_row, 4)
+        self.assertTrue(hoja['A1'].font.bold)
+        columna_monto = encabezado.index('Monto_Total') + 1
+        self.assertEqual(hoja.cell(row=2, column=columna_monto).value, 1500)
+        self.assertEqual(hoja.cell(row=2, column=columna_monto).number_format, '#,##0.00')
+        self.assertEqual(hoja.cell(row=4, column=encabezado.index('Numero_Chasis') + 1).value, 'CH-2')
+
+    def test_cache_con_etag(self):
+        self.crear_ventas(2)
+        url = '/api/motos/export/ventas/?export_format=csv'
+
+        primera = self.client.get(url)
+        contenido = b''.join(primera.streaming_content)
+        etag = primera['ETag']
+
+        with CaptureQueriesContext(connection) as consultas:
+            repetida = self.client.get(url)
+            self.assertEqual(b''.join(repetida.streaming_content), contenido)
+        self.assertEqual(repetida['ETag'], etag)
+        self.assertEqual(len(consultas), 1)  # solo la lectura de versiones
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.crear_ventas(1, inicio=2)
+        nueva = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(nueva.status_code, 200)
+        self.assertNotEqual(nueva['ETag'], etag)
+        self.assertEqual(len(b''.join(nueva.streaming_content).decode().splitlines()), 4)
+
+    def test_reserva_de_stock_cambia_etag(self):
+        from .services import ReservaStockService
+
+        self.crear_ventas(1)
+        url = '/api/motos/export/ventas/?export_format=csv'
+        etag = self.client.get(url)['ETag']
+        moto = Moto.objects.get()
+
+        # La venta ya descontó la única unidad
+        with self.captureOnCommitCallbacks(execute=True):
+            ReservaStockService().liberar_moto(moto, 1)
+        liberada = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(liberada.status_code, 200)
+        self.assertNotEqual(liberada['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ReservaStockService().reservar_moto(moto, 1)
+        self.assertNotEqual(self.client.get(url)['ETag'], liberada['ETag'])
+
+    def test_plantilla_de_inventario(self):
+        from openpyxl import load_workbook
+
+        response = self.client.get('/api/motos/export/templates/', {'type': 'inventory'})
+        libro = load_workbook(io.BytesIO(response.content))
+        self.assertEqual(libro.sheetnames, ['Plantilla_Inventario', 'Instrucciones'])
+        self.assertEqual(libro['Plantilla_Inventario']['A1'].value, 'Marca')
+        self.assertTrue(libro['Plantilla_Inventario']['A1'].font.bold)
+        self.assertEqual(libro['Instrucciones']['A3'].value, '1. Complete todos los campos requeridos')
+
+    def test_inicio_de_sesion_no_invalida_la_cache(self):
+        from django.contrib.auth.models import update_last_login
+
+        self.crear_ventas(1)
+        url = '/api/motos/export/ventas/?export_format=csv'
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, self.usuario)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Otros cambios del usuario (el nombre del vendedor se exporta) sí invalidan
+        self.usuario.first_name = 'Nuevo'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_exportacion_incremental(self):
+        from ventas.models import Venta
+
+        self.crear_ventas(3)
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        Venta.objects.update(fecha_actualizacion=hace_una_hora - timedelta(hours=1))
+        url = '/api/motos/export/ventas/'
+
+        completa = self.client.get(url, {'export_format': 'json'})
+        self.assertEqual(len(completa.json()), 3)
+        cursor = completa['X-Export-Cursor']
+
+        # Solo la venta cancelada cambió después del cursor
+        venta = Venta.objects.order_by('id').first()
+        venta.estado = 'cancelada'
+        venta.save()
+        delta = self.client.get(url, {'export_format': 'json', 'cursor': cursor}).json()
+        self.assertEqual([fila['ID_Venta'] for fila in delta], [venta.id])
+        self.assertEqual(delta[0]['Estado'], 'cancelada')
+
+        delta = self.client.get(url, {'export_format': 'csv', 'since': hace_una_hora.isoformat()})
+        self.assertEqual(len(b''.join(delta.streaming_content).decode().splitlines()), 2)
+        self.assertNotIn('ETag', delta)
+
+        self.assertEqual(self.client.get(url, {'cursor': 'xyz'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'since': 'ayer'}).status_code, 400)
+
+    @skipIf(pa is None, 'pyarrow no está instalado')
+    def test_parquet_tipado(self):
+        import pyarrow.parquet as pq
+
+        self.crear_ventas(3)
+        response = self.client.get('/api/motos/export/ventas/', {'export_format': 'parquet'})
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.parquet')
+        tabla = pq.read_table(io.BytesIO(b''.join(response.streaming_content)))
+
+        self.assertEqual(tabla.num_rows, 3)
+        self.assertEqual(str(tabla.schema.field('Monto_Total').type), 'decimal128(20, 2)')
+        self.assertEqual(str(tabla.schema.field('Estado').type), 'dictionary<values=string, indices=int32, ordered=0>')
+        self.assertEqual(tabla.column('Monto_Total')[0].as_py(), Decimal('1500.00'))
+        self.assertEqual(tabla.column('Numero_Chasis').to_pylist(), ['CH-0', 'CH-1', 'CH-2'])
+        self.assertIsNone(tabla.column('Motivo_Cancelacion')[0].as_py())
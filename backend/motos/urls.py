@@ -9,11 +9,13 @@ from .simple_location_views import (
     SimpleLocationStatsView
 )
 from .export_views import (
-    ExportInventoryView, ExportSalesView, ExportLocationsView, ExportTemplatesView,
-    ExportClientesView, ExportProveedoresView, ExportVentasView, ExportPagosView, ExportDocumentosView
+    ExportInventoryView, ExportLocationsView, ExportTemplatesView,
+    ExportClientesView, ExportProveedoresView, ExportVentasView, ExportPagosView, ExportCuotasView,
+    ExportDocumentosView
 )
 from .import_views import (
-    ImportInventoryView, ImportLocationsView, ImportValidationView
+    ImportInventoryView, ImportLocationsView, ImportValidationView,
+    ImportJobStatusView, ImportJobErrorsView
 )
 
 app_name = 'motos'
@@ -55,6 +57,8 @@ urlpatterns = [
     path('pagos/', accounting_views.PagoProveedorListCreateView.as_view(), name='pago-list-create'),
     path('pagos/<int:pk>/', accounting_views.PagoProveedorDetailView.as_view(), name='pago-detail'),
     path('proveedores/<int:proveedor_id>/estadisticas-financieras/', accounting_views.EstadisticasProveedorView.as_view(), name='proveedor-estadisticas-financieras'),
+    path('proveedores/antiguedad-saldos/', accounting_views.AntiguedadSaldosView.as_view(), name='antiguedad-saldos'),
+    path('proveedores/<int:proveedor_id>/antiguedad-saldos/', accounting_views.AntiguedadSaldosProveedorView.as_view(), name='antiguedad-saldos-proveedor'),
     
     # URLs para órdenes de compra y re-stock
     path('ordenes-compra/', accounting_views.OrdenCompraListCreateView.as_view(), name='orden-compra-list-create'),
@@ -73,17 +77,19 @@ urlpatterns = [
     
     # URLs para importación/exportación de datos
     path('export/inventory/', ExportInventoryView.as_view(), name='export-inventory'),
-    path('export/sales/', ExportSalesView.as_view(), name='export-sales'),
     path('export/locations/', ExportLocationsView.as_view(), name='export-locations'),
     path('export/templates/', ExportTemplatesView.as_view(), name='export-templates'),
     path('export/clientes/', ExportClientesView.as_view(), name='export-clientes'),
     path('export/proveedores/', ExportProveedoresView.as_view(), name='export-proveedores'),
     path('export/ventas/', ExportVentasView.as_view(), name='export-ventas'),
     path('export/pagos/', ExportPagosView.as_view(), name='export-pagos'),
+    path('export/cuotas/', ExportCuotasView.as_view(), name='export-cuotas'),
     path('export/documentos/', ExportDocumentosView.as_view(), name='export-documentos'),
     path('import/inventory/', ImportInventoryView.as_view(), name='import-inventory'),
     path('import/locations/', ImportLocationsView.as_view(), name='import-locations'),
     path('import/validate/', ImportValidationView.as_view(), name='import-validate'),
+    path('import/jobs/<int:job_id>/', ImportJobStatusView.as_view(), name='import-job-status'),
+    path('import/jobs/<int:job_id>/errores/', ImportJobErrorsView.as_view(), name='import-job-errors'),
     
     # Include router URLs para ubicaciones
     path('', include(router.urls)),
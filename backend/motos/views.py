@@ -3,14 +3,17 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import action
 from django.db import models
+from django.db.models import Prefetch, Value
+from django.db.models.functions import Coalesce
+from concesionario_app.campos_parciales import CamposParcialesMixin
 from .models import Moto, MotoModelo, MotoInventario, Proveedor
 from .serializers import (
     MotoSerializer, MotoDisponibleSerializer, 
-    MotoModeloSerializer, MotoModeloCreateSerializer, MotoInventarioSerializer,
+    MotoModeloSerializer, MotoModeloListSerializer, MotoModeloCreateSerializer, MotoInventarioSerializer,
     ProveedorSerializer, ProveedorCreateSerializer, ProveedorListSerializer
 )
 
-class MotoListCreateView(generics.ListCreateAPIView):
+class MotoListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     queryset = Moto.objects.all()
     serializer_class = MotoSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -37,7 +40,7 @@ class MotoDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Moto.objects.all()
     serializer_class = MotoSerializer
 
-class MotoDisponibleListView(generics.ListAPIView):
+class MotoDisponibleListView(CamposParcialesMixin, generics.ListAPIView):
     serializer_class = MotoDisponibleSerializer
     
     def get_queryset(self):
@@ -60,17 +63,17 @@ class StockCriticoView(APIView):
 
 # Nuevas vistas para el sistema de modelos con inventario por color
 
-class MotoModeloListCreateView(generics.ListCreateAPIView):
+class MotoModeloListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     queryset = MotoModelo.objects.all()
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['marca', 'modelo']
-    ordering_fields = ['fecha_creacion', 'marca', 'modelo', 'precio_venta']
+    ordering_fields = ['fecha_creacion', 'marca', 'modelo', 'precio_venta', 'stock_total']
     ordering = ['-fecha_creacion']
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return MotoModeloCreateSerializer
-        return MotoModeloSerializer
+        return MotoModeloListSerializer
     
     def create(self, request, *args, **kwargs):
         import logging
@@ -90,7 +93,12 @@ class MotoModeloListCreateView(generics.ListCreateAPIView):
             raise
     
     def get_queryset(self):
-        queryset = MotoModelo.objects.all()
+        # Número fijo de consultas por página: modelos (+proveedor y resumen), inventario
+        queryset = MotoModelo.objects.select_related('proveedor', 'stock_resumen').prefetch_related(
+            Prefetch('inventario', queryset=MotoInventario.objects.order_by('-fecha_ingreso'))
+        ).annotate(
+            stock_total=Coalesce('stock_resumen__total_unidades', Value(0))
+        )
         marca = self.request.query_params.get('marca', None)
         activa = self.request.query_params.get('activa', None)
         disponible = self.request.query_params.get('disponible', None)
@@ -100,15 +108,12 @@ class MotoModeloListCreateView(generics.ListCreateAPIView):
         if activa is not None:
             queryset = queryset.filter(activa=activa.lower() == 'true')
         if disponible is not None and disponible.lower() == 'true':
-            queryset = queryset.filter(
-                inventario__cantidad_stock__gt=0, 
-                activa=True
-            ).distinct()
+            queryset = queryset.filter(stock_total__gt=0, activa=True)
             
         return queryset
 
 class MotoModeloDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = MotoModelo.objects.all()
+    queryset = MotoModelo.objects.select_related('stock_resumen')
     
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -116,49 +121,55 @@ class MotoModeloDetailView(generics.RetrieveUpdateDestroyAPIView):
         return MotoModeloSerializer
 
 class MotoModeloEstadisticasView(APIView):
-    """Vista para obtener estadísticas detalladas de un modelo de moto"""
+    """
+    Vista para obtener estadísticas detalladas de un modelo de moto.
+
+    Acepta ?fecha_desde=YYYY-MM-DD y ?fecha_hasta=YYYY-MM-DD (inclusive) para
+    acotar las ventas históricas. Ventas e inventario por color salen de una
+    consulta cada uno.
+    """
     
     def get(self, request, modelo_id):
+        from datetime import date, datetime, time, timedelta
+        from django.db.models import Sum
+        from django.utils import timezone
+        from ventas.models import VentaDetalle
+        
         try:
-            from django.db.models import Sum, Count, Avg
-            from ventas.models import VentaDetalle
-            
-            modelo = MotoModelo.objects.get(id=modelo_id)
-            
-            # Obtener todas las motos individuales de este modelo
-            motos_individuales = Moto.objects.filter(
-                marca=modelo.marca,
-                modelo=modelo.modelo, 
-                ano=modelo.ano
+            fecha_desde = request.query_params.get('fecha_desde')
+            fecha_hasta = request.query_params.get('fecha_hasta')
+            fecha_desde = date.fromisoformat(fecha_desde) if fecha_desde else None
+            fecha_hasta = date.fromisoformat(fecha_hasta) if fecha_hasta else None
+        except ValueError:
+            return Response(
+                {'error': 'fecha_desde y fecha_hasta deben tener el formato YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
             )
+        if fecha_desde and fecha_hasta and fecha_desde > fecha_hasta:
+            return Response(
+                {'error': 'fecha_desde no puede ser posterior a fecha_hasta'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            modelo = MotoModelo.objects.get(id=modelo_id)
             
-            # Estadísticas de ventas por color
-            ventas_por_color = {}
-            ingresos_por_color = {}
-            total_vendidas = 0
-            total_ingresos = 0
-            
-            for moto in motos_individuales:
-                color = moto.color or 'Sin color'
-                
-                # Contar ventas de esta moto específica
-                ventas = VentaDetalle.objects.filter(moto=moto)
-                cantidad_vendida = ventas.aggregate(Sum('cantidad'))['cantidad__sum'] or 0
-                ingresos = ventas.aggregate(Sum('subtotal'))['subtotal__sum'] or 0
-                
-                if color not in ventas_por_color:
-                    ventas_por_color[color] = 0
-                    ingresos_por_color[color] = 0
-                
-                ventas_por_color[color] += cantidad_vendida
-                ingresos_por_color[color] += float(ingresos)
-                total_vendidas += cantidad_vendida
-                total_ingresos += float(ingresos)
+            # Estadísticas de ventas por color: una consulta agrupada
+            ventas = VentaDetalle.objects.filter(modelo_moto=modelo)
+            if fecha_desde:
+                ventas = ventas.filter(
+                    venta__fecha_venta__gte=timezone.make_aware(datetime.combine(fecha_desde, time.min))
+                )
+            if fecha_hasta:
+                ventas = ventas.filter(
+                    venta__fecha_venta__lt=timezone.make_aware(datetime.combine(fecha_hasta + timedelta(days=1), time.min))
+                )
             
-            # Inventario actual del modelo unificado con información de chasis
+            # Inventario actual del modelo unificado con información de chasis: una consulta
+            # (el manager relacionado reutiliza `modelo`, así precio_con_descuento no consulta)
             inventario_actual = {}
             stock_total_actual = 0
-            for inventario in modelo.inventario.all():
+            for inventario in modelo.inventario.order_by('color', 'fecha_ingreso'):
                 color = inventario.color
                 if color not in inventario_actual:
                     inventario_actual[color] = {
@@ -177,6 +188,26 @@ class MotoModeloEstadisticasView(APIView):
                     })
                 stock_total_actual += inventario.cantidad_stock
             
+            # Todos los colores en inventario aparecen en las ventas, aunque no se hayan vendido
+            ventas_por_color = {color: 0 for color in inventario_actual}
+            ingresos_por_color = {color: 0 for color in inventario_actual}
+            total_vendidas = 0
+            total_ingresos = 0
+            
+            filas_ventas = ventas.values('moto__color').annotate(
+                cantidad_vendida=Sum('cantidad'),
+                ingresos=Sum('subtotal')
+            ).order_by()
+            for fila in filas_ventas:
+                color = fila['moto__color'] or 'Sin color'
+                cantidad_vendida = fila['cantidad_vendida'] or 0
+                ingresos = float(fila['ingresos'] or 0)
+                
+                ventas_por_color[color] = ventas_por_color.get(color, 0) + cantidad_vendida
+                ingresos_por_color[color] = ingresos_por_color.get(color, 0) + ingresos
+                total_vendidas += cantidad_vendida
+                total_ingresos += ingresos
+            
             # Calcular ganancias
             ganancia_por_unidad = float(modelo.ganancia)
             ganancia_total_stock = ganancia_por_unidad * stock_total_actual
@@ -213,6 +244,8 @@ class MotoModeloEstadisticasView(APIView):
                     'total_vendidas': total_vendidas,
                     'total_ingresos': total_ingresos,
                     'ganancia_total_ventas': ganancia_total_ventas,
+                    'fecha_desde': fecha_desde,
+                    'fecha_hasta': fecha_hasta,
                 },
                 'resumen': {
                     'valor_inventario_actual': float(modelo.precio_venta) * stock_total_actual,
@@ -261,7 +294,7 @@ class TestImageView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class MotoInventarioListCreateView(generics.ListCreateAPIView):
+class MotoInventarioListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     serializer_class = MotoInventarioSerializer
     
     def get_queryset(self):
@@ -440,131 +473,24 @@ class TestImageView(APIView):
 
 
 class AnalyticsAvanzadosView(APIView):
-    """Vista para métricas avanzadas de inventario"""
+    """Vista para métricas avanzadas de inventario (análisis ABC y rotación)"""
     
     def get(self, request):
-        try:
-            from django.db.models import Sum, Count, Avg, F, Q
-            from ventas.models import VentaDetalle
-            from datetime import datetime, timedelta
-            
-            # Obtener todos los modelos con inventario
-            modelos = MotoModelo.objects.filter(activa=True).prefetch_related('inventario')
-            
-            # 1. ANÁLISIS ABC - Basado en valor de inventario
-            modelos_con_valor = []
-            valor_total_inventario = 0
-            
-            for modelo in modelos:
-                stock_total = sum(item.cantidad_stock for item in modelo.inventario.all())
-                valor_inventario = float(modelo.precio_venta) * stock_total
-                valor_total_inventario += valor_inventario
-                
-                if stock_total > 0:  # Solo incluir modelos con stock
-                    modelos_con_valor.append({
-                        'modelo': modelo,
-                        'stock_total': stock_total,
-                        'valor_inventario': valor_inventario,
-                        'precio_unitario': float(modelo.precio_venta)
-                    })
-            
-            # Ordenar por valor de inventario descendente
-            modelos_con_valor.sort(key=lambda x: x['valor_inventario'], reverse=True)
-            
-            # Calcular clasificación ABC
-            abc_analysis = {'A': [], 'B': [], 'C': []}
-            valor_acumulado = 0
-            
-            for item in modelos_con_valor:
-                porcentaje_acumulado = (valor_acumulado + item['valor_inventario']) / valor_total_inventario * 100
-                
-                if porcentaje_acumulado <= 80:  # A: 80% del valor
-                    categoria = 'A'
-                elif porcentaje_acumulado <= 95:  # B: siguiente 15%
-                    categoria = 'B'
-                else:  # C: último 5%
-                    categoria = 'C'
-                
-                abc_analysis[categoria].append({
-                    'modelo_id': item['modelo'].id,
-                    'nombre': f"{item['modelo'].marca} {item['modelo'].modelo}",
-                    'stock': item['stock_total'],
-                    'valor_inventario': item['valor_inventario'],
-                    'porcentaje_valor': item['valor_inventario'] / valor_total_inventario * 100
-                })
-                
-                valor_acumulado += item['valor_inventario']
-            
-            # 2. MÉTRICAS DE ROTACIÓN
-            fecha_inicio = datetime.now() - timedelta(days=365)
-            
-            metricas_rotacion = []
-            for modelo in modelos:
-                ventas_ano = VentaDetalle.objects.filter(
-                    moto__marca=modelo.marca,
-                    moto__modelo=modelo.modelo,
-                    venta__fecha_venta__gte=fecha_inicio
-                ).aggregate(
-                    total_vendido=Sum('cantidad') or 0,
-                    ingresos_total=Sum(F('precio_unitario') * F('cantidad'))
+        from datetime import date
+        from .services import AnalyticsInventarioService
+        
+        fecha_referencia = request.query_params.get('fecha_referencia')
+        if fecha_referencia:
+            try:
+                fecha_referencia = date.fromisoformat(fecha_referencia)
+            except ValueError:
+                return Response(
+                    {'error': 'fecha_referencia debe tener el formato YYYY-MM-DD'},
+                    status=status.HTTP_400_BAD_REQUEST
                 )
-                
-                stock_actual = sum(item.cantidad_stock for item in modelo.inventario.all())
-                stock_promedio = (stock_actual + (ventas_ano['total_vendido'] or 0)) / 2
-                
-                rotacion_anual = (ventas_ano['total_vendido'] or 0) / stock_promedio if stock_promedio > 0 else 0
-                dias_promedio_venta = 365 / rotacion_anual if rotacion_anual > 0 else 0
-                
-                if rotacion_anual >= 6:
-                    eficiencia = 'alta'
-                elif rotacion_anual >= 2:
-                    eficiencia = 'media'
-                else:
-                    eficiencia = 'baja'
-                
-                if stock_actual > 0 or (ventas_ano['total_vendido'] or 0) > 0:
-                    metricas_rotacion.append({
-                        'modelo_id': modelo.id,
-                        'nombre': f"{modelo.marca} {modelo.modelo}",
-                        'stock_actual': stock_actual,
-                        'ventas_ano': ventas_ano['total_vendido'] or 0,
-                        'rotacion_anual': round(rotacion_anual, 2),
-                        'dias_promedio_venta': round(dias_promedio_venta, 1),
-                        'eficiencia': eficiencia,
-                        'ingresos_ano': float(ventas_ano['ingresos_total'] or 0)
-                    })
-            
-            total_modelos_activos = len([m for m in modelos_con_valor if m['stock_total'] > 0])
-            stock_total_unidades = sum(m['stock_total'] for m in modelos_con_valor)
-            
-            return Response({
-                'abc_analysis': {
-                    'categoria_a': {
-                        'modelos': abc_analysis['A'],
-                        'cantidad_modelos': len(abc_analysis['A']),
-                        'porcentaje_modelos': len(abc_analysis['A']) / total_modelos_activos * 100 if total_modelos_activos > 0 else 0
-                    },
-                    'categoria_b': {
-                        'modelos': abc_analysis['B'],
-                        'cantidad_modelos': len(abc_analysis['B']),
-                        'porcentaje_modelos': len(abc_analysis['B']) / total_modelos_activos * 100 if total_modelos_activos > 0 else 0
-                    },
-                    'categoria_c': {
-                        'modelos': abc_analysis['C'],
-                        'cantidad_modelos': len(abc_analysis['C']),
-                        'porcentaje_modelos': len(abc_analysis['C']) / total_modelos_activos * 100 if total_modelos_activos > 0 else 0
-                    }
-                },
-                'rotacion_inventario': sorted(metricas_rotacion, key=lambda x: x['rotacion_anual'], reverse=True),
-                'metricas_generales': {
-                    'valor_total_inventario': valor_total_inventario,
-                    'total_modelos_activos': total_modelos_activos,
-                    'stock_total_unidades': stock_total_unidades,
-                    'rotacion_promedio': sum(m['rotacion_anual'] for m in metricas_rotacion) / len(metricas_rotacion) if metricas_rotacion else 0,
-                    'valor_promedio_por_unidad': valor_total_inventario / stock_total_unidades if stock_total_unidades > 0 else 0
-                }
-            })
-            
+        
+        try:
+            return Response(AnalyticsInventarioService(fecha_referencia).calcular())
         except Exception as e:
             return Response(
                 {'error': f'Error al generar analytics: {str(e)}'}, 
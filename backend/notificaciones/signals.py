@@ -5,6 +5,7 @@ from datetime import timedelta
 
 from ventas.models import Venta
 from pagos.models import CuotaVencimiento
+from pagos.signals import cuotas_generadas, cuotas_pagadas
 from motos.models import Moto
 from usuarios.models import Cliente
 from .models import Notificacion
@@ -86,6 +87,55 @@ def verificar_notificacion_pago_actualizada(sender, instance, created, **kwargs)
             )
 
 
+@receiver(cuotas_pagadas)
+def notificar_cuotas_pagadas(sender, venta_id, cuotas, **kwargs):
+    """Notificaciones de cuotas completadas por la asignación masiva de un pago"""
+    venta = Venta.objects.select_related('cliente').get(pk=venta_id)
+    cliente = venta.cliente
+    Notificacion.objects.bulk_create([
+        Notificacion(
+            tipo='pago_recibido',
+            titulo=f'Pago Recibido - {cliente.nombre} {cliente.apellido}',
+            mensaje=f'Se completó el pago de la cuota #{cuota.numero_cuota} por ${cuota.monto_cuota:,.0f}',
+            prioridad='media',
+            datos_adicionales={
+                'cuota_id': cuota.id,
+                'venta_id': venta.id,
+                'cliente_id': cliente.id,
+                'numero_cuota': cuota.numero_cuota,
+                'monto_cuota': float(cuota.monto_cuota)
+            }
+        )
+        for cuota in cuotas
+    ])
+
+
+@receiver(cuotas_generadas)
+def notificar_plan_cuotas(sender, venta, cuotas, **kwargs):
+    """Una sola notificación por plan de cuotas generado, no una por cuota"""
+    if not cuotas:
+        return
+    primera, ultima = cuotas[0], cuotas[-1]
+    Notificacion.crear_notificacion(
+        tipo='recordatorio',
+        titulo=f'Plan de Cuotas Generado - Venta #{venta.id}',
+        mensaje=(
+            f'Se generaron {len(cuotas)} cuotas de ${primera.monto_cuota:,.0f} para '
+            f'{venta.cliente.nombre} {venta.cliente.apellido}. Primera cuota: '
+            f'{primera.fecha_vencimiento:%d/%m/%Y}, última: {ultima.fecha_vencimiento:%d/%m/%Y}'
+        ),
+        prioridad='baja',
+        datos_adicionales={
+            'venta_id': venta.id,
+            'cliente_id': venta.cliente_id,
+            'cantidad_cuotas': len(cuotas),
+            'monto_cuota': float(primera.monto_cuota),
+            'primer_vencimiento': primera.fecha_vencimiento.isoformat(),
+            'ultimo_vencimiento': ultima.fecha_vencimiento.isoformat()
+        }
+    )
+
+
 @receiver(post_save, sender=Cliente)
 def crear_notificacion_cliente_nuevo(sender, instance, created, **kwargs):
     """Crear notificación cuando se registra un nuevo cliente"""
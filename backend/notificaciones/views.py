@@ -7,6 +7,7 @@ from django.shortcuts import get_object_or_404
 from django.db.models import Q, Count
 from django.utils import timezone
 
+from concesionario_app.campos_parciales import CamposParcialesMixin
 from .models import Notificacion, PreferenciaNotificacion
 from .serializers import (
     NotificacionSerializer, NotificacionCreateSerializer,
@@ -15,7 +16,7 @@ from .serializers import (
 )
 
 
-class NotificacionListView(generics.ListAPIView):
+class NotificacionListView(CamposParcialesMixin, generics.ListAPIView):
     """Lista las notificaciones del usuario autenticado"""
     serializer_class = NotificacionSerializer
     permission_classes = [IsAuthenticated]
@@ -1,8 +1,14 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 from ventas.models import Venta
+from motos.models import VersionDatos
 from datetime import datetime, timedelta
+from dateutil.relativedelta import relativedelta
+
+from .signals import cuotas_generadas, cuotas_pagadas
 
 class Pago(models.Model):
     TIPO_PAGO_CHOICES = [
@@ -40,57 +46,60 @@ class Pago(models.Model):
     fecha_cancelacion = models.DateTimeField(blank=True, null=True)
     usuario_cancelacion = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='pagos_cancelados', blank=True, null=True)
     
+    # Última modificación (creación, cambios y cancelación); base de las exportaciones incrementales
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    
     class Meta:
         verbose_name = 'Pago'
         verbose_name_plural = 'Pagos'
         ordering = ['-fecha_pago']
+        indexes = [
+            models.Index(fields=['fecha_actualizacion', 'id']),
+        ]
     
     def __str__(self):
         return f"Pago {self.id} - Venta {self.venta.id} - ${self.monto_pagado}"
     
+    @property
+    def monto_vigente(self):
+        """Monto que cuenta para el total pagado de la venta (cero si el pago está cancelado)"""
+        if self.estado != 'activo':
+            return Decimal('0')
+        return self._meta.get_field('monto_pagado').to_python(self.monto_pagado)
+    
     def save(self, *args, **kwargs):
         """
-        Al guardar un pago, actualizar automáticamente las cuotas de vencimiento
+        Al guardar un pago, actualizar el total pagado de la venta y asignar la
+        diferencia (o revertirla, si el pago se cancela o disminuye) a sus cuotas
         """
-        super().save(*args, **kwargs)
-        self.actualizar_cuotas_vencimiento()
+        with transaction.atomic():
+            monto_anterior = Decimal('0')
+            if not self._state.adding:
+                anterior = Pago.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'estado', 'monto_pagado'
+                ).first()
+                if anterior and anterior[0] == 'activo':
+                    monto_anterior = anterior[1]
+            
+            super().save(*args, **kwargs)
+            diferencia = self.monto_vigente - monto_anterior
+            self._acumular_en_venta(diferencia)
+            CuotaVencimiento.asignar_pago(self.venta_id, diferencia)
     
-    def actualizar_cuotas_vencimiento(self):
-        """
-        Distribuye el monto del pago entre las cuotas pendientes, comenzando por las más antiguas
-        """
-        cuotas_pendientes = self.venta.cuotas_programadas.filter(
-            estado__in=['pendiente', 'parcial', 'vencida']
-        ).order_by('numero_cuota')
-        
-        # Calcular el total de pagos ya distribuidos
-        total_pagos_distribuidos = sum(
-            cuota.monto_pagado for cuota in self.venta.cuotas_programadas.all()
-        )
-        
-        # Calcular total de pagos realizados
-        total_pagos = sum(
-            pago.monto_pagado for pago in self.venta.pagos.all()
-        )
-        
-        # Si hay diferencia, redistribuir
-        monto_por_distribuir = total_pagos - total_pagos_distribuidos
-        
-        if monto_por_distribuir > 0:
-            for cuota in cuotas_pendientes:
-                if monto_por_distribuir <= 0:
-                    break
-                
-                saldo_cuota = cuota.monto_cuota - cuota.monto_pagado
-                
-                if saldo_cuota > 0:
-                    monto_aplicar = min(monto_por_distribuir, saldo_cuota)
-                    cuota.monto_pagado += monto_aplicar
-                    monto_por_distribuir -= monto_aplicar
-                    
-                    # Actualizar estado de la cuota
-                    cuota.actualizar_estado_por_pagos()
-                    cuota.save()
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            monto = self.monto_vigente
+            resultado = super().delete(*args, **kwargs)
+            self._acumular_en_venta(-monto)
+            CuotaVencimiento.asignar_pago(self.venta_id, -monto)
+        return resultado
+    
+    def _acumular_en_venta(self, diferencia):
+        if not diferencia:
+            return
+        Venta.acumular_pago(self.venta_id, diferencia)
+        if Pago.venta.is_cached(self):
+            self.venta.refresh_from_db(fields=['total_pagado', 'saldo_pendiente', 'fecha_actualizacion'])
 
 class CuotaVencimiento(models.Model):
     """
@@ -157,58 +166,122 @@ class CuotaVencimiento(models.Model):
     @classmethod
     def generar_cuotas_venta(cls, venta):
         """
-        Genera automáticamente las cuotas para una venta financiada
+        Genera automáticamente las cuotas para una venta financiada.
+        
+        El plan se inserta con un solo bulk_create (sin post_save por cuota); la
+        versión de exportación y la señal cuotas_generadas se emiten una vez por venta.
         """
         if venta.tipo_venta != 'financiado' or venta.cuotas <= 0:
-            return
-        
-        # Eliminar cuotas existentes si las hay
-        cls.objects.filter(venta=venta).delete()
+            return []
         
-        # Calcular la fecha de la primera cuota (un mes después de la venta)
+        # La primera cuota vence un mes después de la venta; relativedelta ajusta
+        # los días que no existen en el mes (31 de enero -> 28/29 de febrero)
         fecha_venta = venta.fecha_venta.date()
-        if fecha_venta.month == 12:
-            fecha_primera_cuota = fecha_venta.replace(year=fecha_venta.year + 1, month=1)
-        else:
-            fecha_primera_cuota = fecha_venta.replace(month=fecha_venta.month + 1)
-        
-        for numero_cuota in range(1, venta.cuotas + 1):
-            # Calcular fecha de vencimiento agregando meses
-            mes_vencimiento = fecha_primera_cuota.month + numero_cuota - 1
-            ano_vencimiento = fecha_primera_cuota.year
-            
-            while mes_vencimiento > 12:
-                mes_vencimiento -= 12
-                ano_vencimiento += 1
-            
-            try:
-                fecha_vencimiento = fecha_primera_cuota.replace(year=ano_vencimiento, month=mes_vencimiento)
-            except ValueError:
-                # Manejar casos donde el día no existe (ej. 31 de febrero)
-                fecha_vencimiento = fecha_primera_cuota.replace(year=ano_vencimiento, month=mes_vencimiento, day=28)
-            
-            cuota = cls.objects.create(
+        cuotas = [
+            cls(
                 venta=venta,
                 numero_cuota=numero_cuota,
-                fecha_vencimiento=fecha_vencimiento,
+                fecha_vencimiento=fecha_venta + relativedelta(months=numero_cuota),
                 monto_cuota=venta.pago_mensual,
                 estado='pendiente'
             )
+            for numero_cuota in range(1, venta.cuotas + 1)
+        ]
+        
+        with transaction.atomic():
+            # Eliminar cuotas existentes si las hay
+            cls.objects.filter(venta=venta).delete()
+            cuotas = cls.objects.bulk_create(cuotas)
+            VersionDatos.registrar_cambio(cls)
+            
+            # Los pagos registrados antes de generar el plan se asignan a las cuotas nuevas
+            total_pagado = Venta.objects.filter(pk=venta.pk).values_list('total_pagado', flat=True).first()
+            cls.asignar_pago(venta.pk, total_pagado)
+        
+        cuotas_generadas.send(sender=cls, venta=venta, cuotas=cuotas)
+        return cuotas
+    
+    def estado_segun_pagos(self, hoy=None):
+        """Estado que corresponde al monto pagado y a la fecha de vencimiento"""
+        hoy = hoy or datetime.now().date()
+        if self.monto_pagado >= self.monto_cuota:
+            return 'pagada'
+        if self.monto_pagado > 0:
+            return 'parcial'
+        if self.fecha_vencimiento < hoy:
+            return 'vencida'
+        return 'pendiente'
     
     def actualizar_estado_por_pagos(self):
         """
         Actualiza el estado de la cuota basado en los pagos realizados
         """
-        if self.monto_pagado >= self.monto_cuota:
-            self.estado = 'pagada'
-        elif self.monto_pagado > 0:
-            self.estado = 'parcial'
-        elif self.esta_vencida:
-            self.estado = 'vencida'
+        self.estado = self.estado_segun_pagos()
+        self.save()
+    
+    @classmethod
+    def asignar_pago(cls, venta_id, monto):
+        """
+        Aplica un monto a las cuotas de la venta sin recalcular sus pagos anteriores.
+        
+        Un monto positivo cubre las cuotas abiertas más antiguas; uno negativo
+        (pago cancelado, eliminado o reducido) se descuenta desde la cuota pagada
+        más reciente. Las filas afectadas se bloquean y se escriben con un solo
+        bulk_update, así que debe llamarse dentro de la transacción del pago.
+        
+        Returns:
+            list[CuotaVencimiento]: Cuotas modificadas
+        """
+        if not monto:
+            return []
+        if monto > 0:
+            cuotas = cls.objects.select_for_update().filter(
+                venta_id=venta_id, estado__in=['pendiente', 'parcial', 'vencida']
+            ).order_by('numero_cuota')
         else:
-            self.estado = 'pendiente'
+            cuotas = cls.objects.select_for_update().filter(
+                venta_id=venta_id, monto_pagado__gt=0
+            ).order_by('-numero_cuota')
         
-        self.save()
+        cuotas = list(cuotas)
+        restante = abs(monto)
+        if monto < 0 and cuotas:
+            # Lo pagado de más sobre el total de las cuotas nunca se asignó: solo se
+            # revierte lo que exceda al nuevo total pagado de la venta
+            asignado = sum(cuota.monto_pagado for cuota in cuotas)
+            total_pagado = Venta.objects.filter(pk=venta_id).values_list('total_pagado', flat=True).first() or 0
+            restante = min(restante, max(asignado - total_pagado, Decimal('0')))
+        
+        hoy = datetime.now().date()
+        ahora = timezone.now()
+        modificadas = []
+        pagadas = []
+        for cuota in cuotas:
+            if restante <= 0:
+                break
+            if monto > 0:
+                aplicado = min(restante, cuota.monto_cuota - cuota.monto_pagado)
+                cuota.monto_pagado += aplicado
+            else:
+                aplicado = min(restante, cuota.monto_pagado)
+                cuota.monto_pagado -= aplicado
+            if aplicado <= 0:
+                continue
+            restante -= aplicado
+            
+            estado = cuota.estado_segun_pagos(hoy)
+            if estado == 'pagada' and cuota.estado != 'pagada':
+                pagadas.append(cuota)
+            cuota.estado = estado
+            cuota.fecha_actualizacion = ahora
+            modificadas.append(cuota)
+        
+        if modificadas:
+            cls.objects.bulk_update(modificadas, ['monto_pagado', 'estado', 'fecha_actualizacion'])
+            VersionDatos.registrar_cambio(cls)
+        if pagadas:
+            cuotas_pagadas.send(sender=cls, venta_id=venta_id, cuotas=pagadas)
+        return modificadas
 
 class AlertaPago(models.Model):
     """
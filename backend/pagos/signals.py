@@ -0,0 +1,11 @@
+from django.dispatch import Signal
+
+
+# Las cuotas se escriben con bulk_update al asignar pagos, que no dispara
+# post_save; estas señales avisan de los cambios relevantes a otras apps.
+
+# sender=CuotaVencimiento, venta_id, cuotas: cuotas que pasaron a estado 'pagada'
+cuotas_pagadas = Signal()
+
+# sender=CuotaVencimiento, venta, cuotas: plan de cuotas recién generado (una vez por venta)
+cuotas_generadas = Signal()
@@ -1,3 +1,126 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from notificaciones.models import Notificacion
+from usuarios.models import Cliente, Rol, Usuario
+from ventas.models import Venta
+from .models import CuotaVencimiento, Pago
+
+
+class AsignacionPagosTest(TestCase):
+    """Cada pago se asigna de forma incremental a las cuotas abiertas más antiguas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre_rol='admin')
+        cls.usuario = Usuario.objects.create_user(username='cobrador', password='x', rol=rol)
+        cls.cliente = Cliente.objects.create(nombre='Marta', apellido='Ruiz', cedula='003')
+
+    def setUp(self):
+        self.venta = Venta.objects.create(
+            cliente=self.cliente, usuario=self.usuario, tipo_venta='financiado',
+            monto_total=300, cuotas=3, pago_mensual=100
+        )
+        hoy = timezone.now().date()
+        for numero in range(1, 4):
+            CuotaVencimiento.objects.create(
+                venta=self.venta, numero_cuota=numero, monto_cuota=100,
+                fecha_vencimiento=hoy + timedelta(days=30 * numero)
+            )
+
+    def pagar(self, monto):
+        return Pago.objects.create(
+            venta=self.venta, monto_pagado=monto, tipo_pago='efectivo', usuario_cobrador=self.usuario
+        )
+
+    def cuotas(self):
+        return list(self.venta.cuotas_programadas.order_by('numero_cuota').values_list('monto_pagado', 'estado'))
+
+    def test_asignacion_y_reversion(self):
+        primero = self.pagar(150)
+        self.assertEqual(self.cuotas(), [
+            (Decimal('100'), 'pagada'), (Decimal('50'), 'parcial'), (Decimal('0'), 'pendiente')
+        ])
+
+        self.pagar(80)
+        self.assertEqual(self.cuotas(), [
+            (Decimal('100'), 'pagada'), (Decimal('100'), 'pagada'), (Decimal('30'), 'parcial')
+        ])
+
+        # Cancelar el primer pago descuenta desde la cuota pagada más reciente
+        primero.estado = 'cancelado'
+        primero.save()
+        self.assertEqual(self.cuotas(), [
+            (Decimal('80'), 'parcial'), (Decimal('0'), 'pendiente'), (Decimal('0'), 'pendiente')
+        ])
+
+    def test_excedente_no_se_revierte_de_las_cuotas(self):
+        self.pagar(300)
+        excedente = self.pagar(50)
+        excedente.delete()
+        self.assertEqual([estado for _, estado in self.cuotas()], ['pagada'] * 3)
+
+    def test_pago_con_consultas_constantes(self):
+        self.pagar(10)
+        with self.assertNumQueries(9):
+            self.pagar(250)
+        self.assertEqual(Notificacion.objects.filter(tipo='pago_recibido').count(), 2)
+
+    def test_cancelar_pago_por_api(self):
+        pago = self.pagar(120)
+        client = APIClient()
+        client.force_authenticate(self.usuario)
+
+        response = client.post(f'/api/pagos/{pago.id}/cancelar/', {'motivo': 'duplicado'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['nuevo_saldo_pendiente'], Decimal('300'))
+        self.assertEqual(self.cuotas(), [(Decimal('0'), 'pendiente')] * 3)
+
+
+class GeneracionCuotasTest(TestCase):
+    """El plan de cuotas se inserta en bloque y notifica una sola vez por venta"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre_rol='admin')
+        cls.usuario = Usuario.objects.create_user(username='vendedor', password='x', rol=rol)
+        cls.cliente = Cliente.objects.create(nombre='Pedro', apellido='Soto', cedula='004')
+
+    def crear_venta(self, cuotas):
+        venta = Venta.objects.create(
+            cliente=self.cliente, usuario=self.usuario, tipo_venta='financiado',
+            monto_total=cuotas * 100, cuotas=cuotas, pago_mensual=100
+        )
+        fecha_venta = timezone.make_aware(datetime(2024, 1, 31, 12))
+        Venta.objects.filter(pk=venta.pk).update(fecha_venta=fecha_venta)
+        venta.fecha_venta = fecha_venta
+        return venta
+
+    def test_consultas_no_dependen_de_la_cantidad_de_cuotas(self):
+        corta, larga = self.crear_venta(3), self.crear_venta(60)
+        with self.assertNumQueries(6):
+            CuotaVencimiento.generar_cuotas_venta(corta)
+        with self.assertNumQueries(6):
+            cuotas = CuotaVencimiento.generar_cuotas_venta(larga)
+
+        self.assertEqual(larga.cuotas_programadas.count(), 60)
+        self.assertEqual(cuotas[0].fecha_vencimiento, date(2024, 2, 29))
+        self.assertEqual(cuotas[2].fecha_vencimiento, date(2024, 4, 30))
+        self.assertEqual(cuotas[-1].fecha_vencimiento, date(2029, 1, 31))
+        self.assertEqual(
+            Notificacion.objects.filter(tipo='recordatorio', datos_adicionales__venta_id=larga.id).count(), 1
+        )
+
+    def test_regenerar_asigna_pagos_previos(self):
+        venta = self.crear_venta(3)
+        Pago.objects.create(venta=venta, monto_pagado=150, tipo_pago='efectivo', usuario_cobrador=self.usuario)
 
-# Create your tests here.
+        CuotaVencimiento.generar_cuotas_venta(venta)
+        self.assertEqual(
+            list(venta.cuotas_programadas.values_list('monto_pagado', flat=True)),
+            [Decimal('100'), Decimal('50'), Decimal('0')]
+        )
@@ -3,13 +3,14 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.db import models
 from datetime import datetime, timedelta
+from concesionario_app.campos_parciales import CamposParcialesMixin
 from .models import Pago, Reporte, Auditoria, CuotaVencimiento, AlertaPago
 from .serializers import PagoSerializer, PagoCreateSerializer, ReporteSerializer, AuditoriaSerializer, CuotaVencimientoSerializer, AlertaPagoSerializer
 from ventas.models import Venta
 from motos.models import Moto
 from usuarios.models import Cliente
 
-class PagoListCreateView(generics.ListCreateAPIView):
+class PagoListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     queryset = Pago.objects.all()
     
     def get_serializer_class(self):
@@ -47,14 +48,14 @@ class PagoDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Pago.objects.all()
     serializer_class = PagoSerializer
 
-class PagosPorVentaView(generics.ListAPIView):
+class PagosPorVentaView(CamposParcialesMixin, generics.ListAPIView):
     serializer_class = PagoSerializer
     
     def get_queryset(self):
         venta_id = self.kwargs['venta_id']
         return Pago.objects.filter(venta_id=venta_id)
 
-class ReporteListCreateView(generics.ListCreateAPIView):
+class ReporteListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     queryset = Reporte.objects.all()
     serializer_class = ReporteSerializer
     
@@ -65,7 +66,7 @@ class ReporteDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Reporte.objects.all()
     serializer_class = ReporteSerializer
 
-class AuditoriaListView(generics.ListAPIView):
+class AuditoriaListView(CamposParcialesMixin, generics.ListAPIView):
     queryset = Auditoria.objects.all()
     serializer_class = AuditoriaSerializer
     
@@ -118,16 +119,20 @@ class DashboardView(APIView):
         ).count()
         
         # Cobros pendientes
-        ventas_con_saldo = []
-        total_cuentas_por_cobrar = 0
-        for venta in Venta.objects.filter(estado='activa'):
-            if venta.saldo_pendiente > 0:
-                ventas_con_saldo.append({
-                    'venta_id': venta.id,
-                    'cliente': f"{venta.cliente.nombre} {venta.cliente.apellido}",
-                    'saldo': venta.saldo_pendiente
-                })
-                total_cuentas_por_cobrar += venta.saldo_pendiente
+        ventas_pendientes = Venta.objects.filter(
+            estado='activa', saldo_pendiente__gt=0
+        ).select_related('cliente')
+        ventas_con_saldo = [
+            {
+                'venta_id': venta.id,
+                'cliente': f"{venta.cliente.nombre} {venta.cliente.apellido}",
+                'saldo': venta.saldo_pendiente
+            }
+            for venta in ventas_pendientes
+        ]
+        total_cuentas_por_cobrar = ventas_pendientes.aggregate(
+            total=models.Sum('saldo_pendiente')
+        )['total'] or 0
 
         # Clientes activos (con ventas en los últimos 6 meses)
         hace_seis_meses = hoy - timedelta(days=180)
@@ -165,7 +170,7 @@ class DashboardView(APIView):
             'cuentas_por_cobrar': total_cuentas_por_cobrar
         })
 
-class CuotaVencimientoListView(generics.ListAPIView):
+class CuotaVencimientoListView(CamposParcialesMixin, generics.ListAPIView):
     serializer_class = CuotaVencimientoSerializer
     
     def get_queryset(self):
@@ -199,7 +204,7 @@ class GenerarCuotasVentaView(APIView):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class AlertaPagoListView(generics.ListAPIView):
+class AlertaPagoListView(CamposParcialesMixin, generics.ListAPIView):
     serializer_class = AlertaPagoSerializer
     
     def get_queryset(self):
@@ -280,6 +285,7 @@ class CancelarPagoView(APIView):
             else:
                 pago.observaciones = observacion_cancelacion
             
+            # Al guardarse, el pago devuelve su monto al saldo de la venta y lo revierte de las cuotas
             pago.save()
             
             # Registrar la cancelación en auditoría
@@ -298,9 +304,6 @@ class CancelarPagoView(APIView):
                 }
             )
             
-            # Actualizar cuotas de vencimiento para reflejar la cancelación
-            pago.actualizar_cuotas_vencimiento()
-            
             return Response({
                 'message': f'Pago cancelado exitosamente. Monto de ${monto_cancelado:,.2f} devuelto al saldo pendiente.',
                 'pago_id': pago.id,
@@ -408,25 +411,17 @@ class BuscarClientesFinanciadosView(APIView):
         """
         search_term = request.query_params.get('q', '')
         
-        # Obtener todas las ventas que no están canceladas (pueden tener saldo pendiente)
-        ventas_activas = Venta.objects.exclude(
+        # Ventas no canceladas con saldo pendiente, filtradas en la base de datos
+        ventas_con_saldo = Venta.objects.exclude(
             estado='cancelada'
-        ).select_related('cliente')
-        
-        # Filtrar solo las que tienen saldo pendiente
-        ventas_con_saldo = []
-        for venta in ventas_activas:
-            if venta.saldo_pendiente > 0:
-                ventas_con_saldo.append(venta)
+        ).filter(saldo_pendiente__gt=0).select_related('cliente')
         
         if search_term:
-            ventas_filtradas = []
-            for venta in ventas_con_saldo:
-                if (search_term.lower() in venta.cliente.nombre.lower() or
-                    search_term.lower() in venta.cliente.apellido.lower() or
-                    search_term.lower() in venta.cliente.cedula.lower()):
-                    ventas_filtradas.append(venta)
-            ventas_con_saldo = ventas_filtradas
+            ventas_con_saldo = ventas_con_saldo.filter(
+                models.Q(cliente__nombre__icontains=search_term) |
+                models.Q(cliente__apellido__icontains=search_term) |
+                models.Q(cliente__cedula__icontains=search_term)
+            )
         
         # Construir respuesta con información de la venta
         clientes_data = []
@@ -454,9 +449,6 @@ class BuscarClientesFinanciadosView(APIView):
                 total_mora = 0
                 proxima_cuota = None
             
-            # Calcular total pagado
-            total_pagado = sum(pago.monto_pagado for pago in venta.pagos.all())
-            
             cliente_data = {
                 'cliente_id': venta.cliente.id,
                 'nombre_completo': f"{venta.cliente.nombre} {venta.cliente.apellido}",
@@ -466,7 +458,7 @@ class BuscarClientesFinanciadosView(APIView):
                 'monto_total': venta.monto_total,
                 'monto_con_intereses': venta.monto_total_con_intereses,
                 'saldo_pendiente': venta.saldo_pendiente,
-                'total_pagado': total_pagado,
+                'total_pagado': venta.total_pagado,
                 'cuotas_totales': venta.cuotas,
                 'cuotas_pagadas': cuotas_pagadas,
                 'cuotas_restantes': cuotas_restantes,
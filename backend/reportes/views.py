@@ -387,27 +387,20 @@ class ReporteCobranzaView(APIView):
         
         # Cuentas por cobrar (ventas no pagadas completamente)
         cuentas_por_cobrar = []
-        for venta in ventas_periodo:
-            total_pagado = venta.pagos.aggregate(
-                total=Sum('monto_pagado')
-            )['total'] or Decimal('0')
+        for venta in ventas_periodo.filter(saldo_pendiente__gt=0).select_related('cliente'):
+            dias_vencimiento = (timezone.now().date() - venta.fecha_venta.date()).days
             
-            saldo_pendiente = venta.monto_total - total_pagado
-            
-            if saldo_pendiente > 0:
-                dias_vencimiento = (timezone.now().date() - venta.fecha_venta.date()).days
-                
-                cuentas_por_cobrar.append({
-                    'venta_id': venta.id,
-                    'cliente_nombre': f"{venta.cliente.nombre} {venta.cliente.apellido}",
-                    'cliente_documento': venta.cliente.cedula,
-                    'fecha_venta': venta.fecha_venta.date(),
-                    'total_venta': venta.monto_total,
-                    'total_pagado': total_pagado,
-                    'saldo_pendiente': saldo_pendiente,
-                    'dias_vencimiento': dias_vencimiento,
-                    'estado_morosidad': 'Al día' if dias_vencimiento <= 30 else 'Moroso' if dias_vencimiento <= 60 else 'Crítico'
-                })
+            cuentas_por_cobrar.append({
+                'venta_id': venta.id,
+                'cliente_nombre': f"{venta.cliente.nombre} {venta.cliente.apellido}",
+                'cliente_documento': venta.cliente.cedula,
+                'fecha_venta': venta.fecha_venta.date(),
+                'total_venta': venta.monto_total,
+                'total_pagado': venta.total_pagado,
+                'saldo_pendiente': venta.saldo_pendiente,
+                'dias_vencimiento': dias_vencimiento,
+                'estado_morosidad': 'Al día' if dias_vencimiento <= 30 else 'Moroso' if dias_vencimiento <= 60 else 'Crítico'
+            })
         
         # Historial de pagos
         historial_pagos = Pago.objects.filter(
@@ -626,12 +619,9 @@ class ReporteFinancieroView(APIView):
         )['valor_inventario'] or Decimal('0')
         
         # Cuentas por cobrar totales
-        cuentas_por_cobrar_total = Decimal('0')
-        for venta in Venta.objects.all():
-            total_pagado = venta.pagos.aggregate(total=Sum('monto_pagado'))['total'] or Decimal('0')
-            saldo_pendiente = venta.monto_total - total_pagado
-            if saldo_pendiente > 0:
-                cuentas_por_cobrar_total += saldo_pendiente
+        cuentas_por_cobrar_total = Venta.objects.filter(
+            saldo_pendiente__gt=0
+        ).aggregate(total=Sum('saldo_pendiente'))['total'] or Decimal('0')
         
         resumen_financiero = {
             'activos': {
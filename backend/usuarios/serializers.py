@@ -42,6 +42,14 @@ class UsuarioSerializer(serializers.ModelSerializer):
             instance.set_password(password)
         return super().update(instance, validated_data)
 
+class UsuarioResumenSerializer(serializers.ModelSerializer):
+    """Datos mínimos del usuario para listados (sin rol ni preferencias)"""
+    nombre_completo = serializers.CharField(read_only=True)
+    
+    class Meta:
+        model = Usuario
+        fields = ['id', 'username', 'first_name', 'last_name', 'nombre_completo']
+
 class UsuarioUpdateSerializer(serializers.ModelSerializer):
     """Serializer específico para actualizar datos del usuario sin contraseña"""
     nombre_completo = serializers.CharField(read_only=True)
@@ -103,6 +111,14 @@ class DocumentoSerializer(serializers.ModelSerializer):
         fields = ['id', 'propietario', 'propietario_display', 'tipo_documento', 'tipo_documento_display', 
                  'descripcion', 'archivo', 'fecha_creacion', 'cliente']
 
+class ClienteResumenSerializer(serializers.ModelSerializer):
+    """Datos mínimos del cliente para listados (sin fiador ni documentos)"""
+    nombre_completo = serializers.CharField(read_only=True)
+    
+    class Meta:
+        model = Cliente
+        fields = ['id', 'nombre', 'apellido', 'cedula', 'telefono', 'celular', 'nombre_completo']
+
 class ClienteSerializer(serializers.ModelSerializer):
     fiador = FiadorSerializer(read_only=True)
     documentos = DocumentoSerializer(many=True, read_only=True)
@@ -114,6 +130,8 @@ class ClienteSerializer(serializers.ModelSerializer):
                  'cedula', 'telefono', 'celular', 'email', 'estado_civil', 
                  'fecha_nacimiento', 'ocupacion', 'ingresos', 'referencias_personales',
                  'foto_perfil', 'fecha_registro', 'nombre_completo', 'fiador', 'documentos']
+        # '*': lo que lee to_representation además de los campos (nada: solo toca foto_perfil si se pidió)
+        dependencias_campos = {'nombre_completo': ['nombre', 'apellido'], '*': []}
     
     def get_estado_pago(self, obj):
         """Calcula el estado de pago del cliente basado en cuotas vencidas"""
@@ -175,14 +193,13 @@ class ClienteSerializer(serializers.ModelSerializer):
     
     def get_saldo_total_pendiente(self, obj):
         """Calcula el saldo total pendiente de todas las ventas activas"""
+        from django.db.models import Sum
         from ventas.models import Venta
         
-        ventas_activas = Venta.objects.filter(
+        saldo_total = Venta.objects.filter(
             cliente=obj,
             estado='activa'
-        )
-        
-        saldo_total = sum(venta.saldo_pendiente for venta in ventas_activas)
+        ).aggregate(total=Sum('saldo_pendiente'))['total'] or 0
         return float(saldo_total)
     
     def get_cuota_actual(self, obj):
@@ -247,8 +264,8 @@ class ClienteSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         
-        # Generar URL absoluta para la foto de perfil
-        if instance.foto_perfil:
+        # Generar URL absoluta para la foto de perfil (si no se omitió con ?fields=/?omit=)
+        if 'foto_perfil' in representation and instance.foto_perfil:
             from django.conf import settings
             
             imagen_url = str(instance.foto_perfil)
@@ -1,3 +1,44 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .models import Cliente, Fiador, Rol, Usuario
+
+
+class ClientesCamposParcialesTest(TestCase):
+    """?fields= en /api/usuarios/clientes/ poda relaciones y columnas sin consultas por fila"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre_rol='admin')
+        cls.usuario = Usuario.objects.create_user(username='recepcion', password='x', rol=rol)
+        for numero in range(3):
+            cliente = Cliente.objects.create(nombre='Cliente', apellido=str(numero), cedula=f'C-{numero}')
+            Fiador.objects.create(nombre='Fiador', apellido=str(numero), cedula=f'F-{numero}', direccion='Calle', cliente=cliente)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def consultar(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return consultas, response.data['results']
+
+    def test_listado_completo_con_consultas_fijas(self):
+        consultas, resultados = self.consultar('/api/usuarios/clientes/')
+        self.assertEqual(len(consultas), 3)
+        self.assertEqual(resultados[0]['fiador']['nombre'], 'Fiador')
+
+    def test_campos_parciales(self):
+        consultas, resultados = self.consultar('/api/usuarios/clientes/?fields=id,nombre_completo')
+        self.assertEqual(len(consultas), 2)
+        self.assertNotIn('usuarios_fiador', consultas[1]['sql'])
+        self.assertNotIn('direccion', consultas[1]['sql'])
+        self.assertEqual(set(resultados[0]), {'id', 'nombre_completo'})
+
+        consultas, resultados = self.consultar('/api/usuarios/clientes/?fields=id,fiador')
+        self.assertEqual(len(consultas), 2)
+        self.assertEqual(resultados[0]['fiador']['cedula'][:2], 'F-')
@@ -6,6 +6,7 @@ from rest_framework.authtoken.models import Token
 from django.contrib.auth import login
 from django.db import models
 from django.shortcuts import get_object_or_404
+from concesionario_app.campos_parciales import CamposParcialesMixin
 from .models import Usuario, Rol, Cliente, Fiador, Documento, PermisoGranular, RolPermiso
 from .serializers import (
     UsuarioSerializer, UsuarioUpdateSerializer, CambiarPasswordSerializer,
@@ -43,11 +44,11 @@ def logout_view(request):
     except Token.DoesNotExist:
         return Response({'error': 'Token no encontrado'}, status=status.HTTP_400_BAD_REQUEST)
 
-class RolListView(generics.ListAPIView):
+class RolListView(CamposParcialesMixin, generics.ListAPIView):
     queryset = Rol.objects.all()
     serializer_class = RolSerializer
 
-class UsuarioListCreateView(generics.ListCreateAPIView):
+class UsuarioListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     queryset = Usuario.objects.all()
     serializer_class = UsuarioSerializer
     
@@ -62,12 +63,12 @@ class UsuarioDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Usuario.objects.all()
     serializer_class = UsuarioSerializer
 
-class ClienteListCreateView(generics.ListCreateAPIView):
+class ClienteListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     queryset = Cliente.objects.all()
     serializer_class = ClienteSerializer
     
     def get_queryset(self):
-        queryset = Cliente.objects.all()
+        queryset = Cliente.objects.select_related('fiador').prefetch_related('documentos')
         search = self.request.query_params.get('search', None)
         if search is not None:
             queryset = queryset.filter(
@@ -81,7 +82,7 @@ class ClienteDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Cliente.objects.all()
     serializer_class = ClienteDetalleSerializer
 
-class FiadorListCreateView(generics.ListCreateAPIView):
+class FiadorListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     queryset = Fiador.objects.all()
     serializer_class = FiadorSerializer
 
@@ -89,7 +90,7 @@ class FiadorDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Fiador.objects.all()
     serializer_class = FiadorSerializer
 
-class DocumentoListCreateView(generics.ListCreateAPIView):
+class DocumentoListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     queryset = Documento.objects.all()
     serializer_class = DocumentoSerializer
     
@@ -281,7 +282,7 @@ class ConfiguracionSistemaView(APIView):
 
 # ===== VISTAS DE PERMISOS GRANULARES =====
 
-class PermisosGranularesListView(generics.ListAPIView):
+class PermisosGranularesListView(CamposParcialesMixin, generics.ListAPIView):
     """Vista para listar todos los permisos granulares"""
     queryset = PermisoGranular.objects.filter(activo=True).order_by('categoria', 'nombre')
     serializer_class = PermisoGranularSerializer
@@ -298,7 +299,7 @@ class PermisosGranularesListView(generics.ListAPIView):
             queryset = queryset.filter(categoria=categoria)
         return queryset
 
-class RolesConPermisosView(generics.ListAPIView):
+class RolesConPermisosView(CamposParcialesMixin, generics.ListAPIView):
     """Vista para listar roles con sus permisos granulares"""
     queryset = Rol.objects.all()
     serializer_class = RolConPermisosSerializer
@@ -374,7 +375,7 @@ class PermisosUsuarioView(APIView):
         serializer = PermisosUsuarioResponseSerializer(data)
         return Response(serializer.data)
 
-class UsuariosConPermisosView(generics.ListAPIView):
+class UsuariosConPermisosView(CamposParcialesMixin, generics.ListAPIView):
     """Vista para listar usuarios con información detallada de permisos"""
     queryset = Usuario.objects.select_related('rol').filter(estado=True)
     serializer_class = UsuarioConPermisosSerializer
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from ventas.models import Venta
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara total_pagado y saldo_pendiente de cada venta con la suma de sus pagos '
+        'activos y corrige las diferencias'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--solo-verificar', action='store_true',
+            help='Informa las diferencias sin corregirlas'
+        )
+
+    def handle(self, *args, **options):
+        corregir = not options['solo_verificar']
+        diferencias = Venta.reconciliar_saldos(corregir=corregir)
+
+        for fila in diferencias:
+            self.stdout.write(
+                f'Venta {fila["id"]}: total pagado {fila["total_pagado"]} (real {fila["pagado_real"]}), '
+                f'saldo {fila["saldo_pendiente"]} (real {fila["saldo_real"]})'
+            )
+
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('Los saldos de todas las ventas cuadran con sus pagos'))
+        elif corregir:
+            self.stdout.write(self.style.SUCCESS(f'{len(diferencias)} ventas corregidas'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(diferencias)} ventas con diferencias'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from ventas.models import VentaDiariaModelo
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen diario de ventas por modelo a partir de los detalles de venta'
+
+    def handle(self, *args, **options):
+        total = VentaDiariaModelo.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f'{total} registros diarios de ventas reconstruidos'))
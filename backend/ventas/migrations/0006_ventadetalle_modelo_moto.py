@@ -0,0 +1,54 @@
+# Generated by Django 5.1.4 on 2026-10-17 00:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+TAMANO_LOTE = 1000
+
+
+def copiar_modelo_desde_moto(apps, schema_editor):
+    """Copia moto.modelo_moto en cada detalle de venta, en lotes por id"""
+    VentaDetalle = apps.get_model('ventas', 'VentaDetalle')
+    Moto = apps.get_model('motos', 'Moto')
+
+    modelo_por_moto = dict(
+        Moto.objects.filter(modelo_moto__isnull=False).values_list('id', 'modelo_moto_id')
+    )
+    if not modelo_por_moto:
+        return
+
+    ultimo_id = 0
+    while True:
+        lote = list(
+            VentaDetalle.objects.filter(id__gt=ultimo_id, modelo_moto__isnull=True)
+            .order_by('id')
+            .only('id', 'moto_id')[:TAMANO_LOTE]
+        )
+        if not lote:
+            break
+        ultimo_id = lote[-1].id
+
+        por_actualizar = []
+        for detalle in lote:
+            modelo_id = modelo_por_moto.get(detalle.moto_id)
+            if modelo_id:
+                detalle.modelo_moto_id = modelo_id
+                por_actualizar.append(detalle)
+        VentaDetalle.objects.bulk_update(por_actualizar, ['modelo_moto'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('motos', '0015_moto_modelo_moto'),
+        ('ventas', '0005_venta_descripcion_cancelacion_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ventadetalle',
+            name='modelo_moto',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventas_detalle', to='motos.motomodelo'),
+        ),
+        migrations.RunPython(copiar_modelo_desde_moto, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.4 on 2026-10-17 00:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+
+def poblar_ventas_diarias(apps, schema_editor):
+    VentaDetalle = apps.get_model('ventas', 'VentaDetalle')
+    VentaDiariaModelo = apps.get_model('ventas', 'VentaDiariaModelo')
+
+    filas = VentaDetalle.objects.exclude(venta__estado='cancelada').filter(
+        modelo_moto__isnull=False
+    ).annotate(
+        fecha=TruncDate('venta__fecha_venta')
+    ).values('modelo_moto_id', 'fecha').annotate(
+        total_unidades=Sum('cantidad'),
+        total_ingresos=Sum('subtotal')
+    ).order_by()
+
+    VentaDiariaModelo.objects.bulk_create(
+        [
+            VentaDiariaModelo(
+                modelo_moto_id=fila['modelo_moto_id'],
+                fecha=fila['fecha'],
+                unidades=fila['total_unidades'] or 0,
+                ingresos=fila['total_ingresos'] or 0
+            )
+            for fila in filas
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('motos', '0015_moto_modelo_moto'),
+        ('ventas', '0006_ventadetalle_modelo_moto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiariaModelo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('modelo_moto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='motos.motomodelo')),
+            ],
+            options={
+                'verbose_name': 'Venta Diaria por Modelo',
+                'verbose_name_plural': 'Ventas Diarias por Modelo',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['fecha', 'modelo_moto'], name='ventas_vent_fecha_d9ab95_idx')],
+                'unique_together': {('modelo_moto', 'fecha')},
+            },
+        ),
+        migrations.RunPython(poblar_ventas_diarias, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-17 01:22
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def inicializar_fecha_actualizacion(apps, schema_editor):
+    """Las filas existentes toman su última fecha conocida en lugar de la fecha de la migración"""
+    Venta = apps.get_model('ventas', 'Venta')
+    Venta.objects.update(fecha_actualizacion=Coalesce('fecha_cancelacion', 'fecha_venta'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0008_permisogranular_rolpermiso'),
+        ('ventas', '0007_ventadiariamodelo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(inicializar_fecha_actualizacion, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['fecha_actualizacion', 'id'], name='ventas_vent_fecha_a_94b538_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.4 on 2026-10-17 01:35
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def calcular_saldos(apps, schema_editor):
+    """Total pagado (solo pagos activos) y saldo de las ventas existentes"""
+    Venta = apps.get_model('ventas', 'Venta')
+    Pago = apps.get_model('pagos', 'Pago')
+    pagos = Pago.objects.filter(venta=OuterRef('pk'), estado='activo').order_by().values('venta')
+    pagado = Coalesce(
+        Subquery(pagos.annotate(total=Sum('monto_pagado')).values('total')),
+        Value(0),
+        output_field=models.DecimalField(max_digits=20, decimal_places=2)
+    )
+    Venta.objects.update(total_pagado=pagado, saldo_pendiente=F('monto_total') - pagado)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0008_permisogranular_rolpermiso'),
+        ('ventas', '0008_venta_fecha_actualizacion'),
+        ('pagos', '0005_pago_fecha_actualizacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='saldo_pendiente',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=20),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='total_pagado',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=20),
+        ),
+        migrations.RunPython(calcular_saldos, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['estado', 'saldo_pendiente'], name='ventas_vent_estado_d22e70_idx'),
+        ),
+    ]
@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import models, IntegrityError, transaction
 from django.conf import settings
+from django.utils import timezone
 from usuarios.models import Cliente
-from motos.models import Moto
+from motos.models import Moto, MotoModelo, VersionDatos
+from motos.services import ReservaStockService
 
 class Venta(models.Model):
     TIPO_VENTA_CHOICES = [
@@ -45,22 +47,138 @@ class Venta(models.Model):
     fecha_cancelacion = models.DateTimeField(blank=True, null=True)
     usuario_cancelacion = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='ventas_canceladas', blank=True, null=True)
     
+    # Última modificación (creación, cambios y cancelación); base de las exportaciones incrementales
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    
+    # Suma de los pagos activos, mantenida con F() por Pago (ver acumular_pago y el
+    # comando reconciliar_saldos_ventas); permite filtrar y ordenar por saldo en SQL
+    total_pagado = models.DecimalField(max_digits=20, decimal_places=2, default=0, editable=False)
+    saldo_pendiente = models.DecimalField(max_digits=20, decimal_places=2, default=0, editable=False)
+    
     class Meta:
         verbose_name = 'Venta'
         verbose_name_plural = 'Ventas'
         ordering = ['-fecha_venta']
+        indexes = [
+            models.Index(fields=['fecha_actualizacion', 'id']),
+            models.Index(fields=['estado', 'saldo_pendiente']),
+        ]
     
     def __str__(self):
         return f"Venta {self.id} - {self.cliente.nombre} {self.cliente.apellido}"
     
-    @property
-    def saldo_pendiente(self):
-        total_pagado = sum([pago.monto_pagado for pago in self.pagos.all()])
-        return self.monto_total - total_pagado
+    # Campos cuyo valor guardado comparan las señales para mover el resumen diario
+    CAMPOS_SEGUIDOS = ('estado', 'fecha_venta')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia.recordar_valores_guardados()
+        return instancia
+    
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.recordar_valores_guardados()
+    
+    def recordar_valores_guardados(self):
+        """
+        Guarda en _valores_guardados los CAMPOS_SEGUIDOS tal como están en la base,
+        para que las señales detecten cambios sin volver a consultar la venta.
+        Los campos diferidos no se leen.
+        """
+        self._valores_guardados = {
+            campo: self.__dict__[campo] for campo in self.CAMPOS_SEGUIDOS if campo in self.__dict__
+        }
+    
+    def save(self, *args, **kwargs):
+        monto_total = self._meta.get_field('monto_total').to_python(self.monto_total)
+        if self._state.adding:
+            self.saldo_pendiente = monto_total - self.total_pagado
+            return super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'monto_total' not in update_fields:
+            return super().save(*args, **kwargs)
+        
+        # total_pagado solo cambia con F() desde los pagos: una copia en memoria
+        # desactualizada no debe pisarlo. Se lee con la fila bloqueada (los pagos
+        # esperan) y el saldo queda calculado antes de que corran las señales
+        with transaction.atomic():
+            self.total_pagado = type(self).objects.select_for_update().values_list(
+                'total_pagado', flat=True
+            ).get(pk=self.pk)
+            self.saldo_pendiente = monto_total - self.total_pagado
+            if update_fields is None:
+                kwargs['update_fields'] = [
+                    campo.name for campo in self._meta.concrete_fields
+                    if not campo.primary_key and campo.name != 'total_pagado'
+                ]
+            else:
+                kwargs['update_fields'] = {*update_fields, 'saldo_pendiente'}
+            super().save(*args, **kwargs)
+    
+    @classmethod
+    def acumular_pago(cls, venta_id, monto):
+        """Suma (o resta, con monto negativo) un pago al total pagado y al saldo de la venta"""
+        cls.objects.filter(pk=venta_id).update(
+            total_pagado=models.F('total_pagado') + monto,
+            saldo_pendiente=models.F('saldo_pendiente') - monto,
+            fecha_actualizacion=timezone.now()
+        )
+        VersionDatos.registrar_cambio(cls)
+    
+    @classmethod
+    def reconciliar_saldos(cls, corregir=True):
+        """
+        Compara total_pagado y saldo_pendiente con la suma real de los pagos activos.
+        
+        Args:
+            corregir: Reescribir los valores de las ventas con diferencias
+        
+        Returns:
+            list[dict]: Ventas con diferencias (id, total_pagado registrado y real, saldo registrado y real)
+        """
+        from django.db.models import DecimalField, OuterRef, Q, Subquery, Sum
+        from django.db.models.functions import Coalesce
+        from pagos.models import Pago
+        
+        pagos = Pago.objects.filter(venta=OuterRef('pk'), estado='activo').order_by().values('venta')
+        pagado_real = Coalesce(
+            Subquery(pagos.annotate(total=Sum('monto_pagado')).values('total')),
+            models.Value(0),
+            output_field=DecimalField(max_digits=20, decimal_places=2)
+        )
+        diferencias = list(
+            cls.objects.annotate(pagado_real=pagado_real).annotate(
+                saldo_real=models.F('monto_total') - models.F('pagado_real')
+            ).filter(
+                ~Q(total_pagado=models.F('pagado_real')) | ~Q(saldo_pendiente=models.F('saldo_real'))
+            ).order_by('id').values('id', 'total_pagado', 'pagado_real', 'saldo_pendiente', 'saldo_real')
+        )
+        
+        if corregir and diferencias:
+            ids = [fila['id'] for fila in diferencias]
+            with transaction.atomic():
+                # Se recalcula en la misma sentencia para no perder pagos registrados mientras tanto
+                for inicio in range(0, len(ids), 500):
+                    cls.objects.filter(pk__in=ids[inicio:inicio + 500]).update(
+                        total_pagado=pagado_real,
+                        saldo_pendiente=models.F('monto_total') - pagado_real,
+                        fecha_actualizacion=timezone.now()
+                    )
+                VersionDatos.registrar_cambio(cls)
+        return diferencias
 
 class VentaDetalle(models.Model):
     venta = models.ForeignKey(Venta, on_delete=models.CASCADE, related_name='detalles')
     moto = models.ForeignKey(Moto, on_delete=models.CASCADE)
+    # Copia de moto.modelo_moto para agrupar ventas por modelo sin pasar por Moto
+    modelo_moto = models.ForeignKey(
+        MotoModelo,
+        on_delete=models.SET_NULL,
+        related_name='ventas_detalle',
+        blank=True,
+        null=True
+    )
     cantidad = models.IntegerField(default=1)
     precio_unitario = models.DecimalField(max_digits=20, decimal_places=2)
     subtotal = models.DecimalField(max_digits=20, decimal_places=2)
@@ -74,19 +192,108 @@ class VentaDetalle(models.Model):
     
     def save(self, *args, **kwargs):
         self.subtotal = self.cantidad * self.precio_unitario
+        if self.modelo_moto_id is None:
+            self.modelo_moto_id = self.moto.modelo_moto_id
         
-        # Reduce motorcycle stock when creating new sale detail
+        # Reserve motorcycle stock when creating new sale detail
         if not self.pk:  # Only when creating, not updating
-            if self.moto.cantidad_stock >= self.cantidad:
-                self.moto.cantidad_stock -= self.cantidad
-                self.moto.save()
-            else:
-                raise ValueError(f"Stock insuficiente. Stock disponible: {self.moto.cantidad_stock}, solicitado: {self.cantidad}")
+            with transaction.atomic():
+                ReservaStockService().reservar_moto(self.moto, self.cantidad)
+                super().save(*args, **kwargs)
+            return
         
         super().save(*args, **kwargs)
     
     def delete(self, *args, **kwargs):
         # Restore motorcycle stock when deleting sale detail
-        self.moto.cantidad_stock += self.cantidad
-        self.moto.save()
-        super().delete(*args, **kwargs)
+        with transaction.atomic():
+            ReservaStockService().liberar_moto(self.moto, self.cantidad)
+            super().delete(*args, **kwargs)
+
+
+class VentaDiariaModelo(models.Model):
+    """
+    Resumen diario de ventas por modelo de moto (mantenido por ventas.signals).
+
+    Las ventas canceladas no cuentan; al cancelar una venta se descuentan sus detalles.
+    """
+    modelo_moto = models.ForeignKey(MotoModelo, on_delete=models.CASCADE, related_name='ventas_diarias')
+    fecha = models.DateField()
+    unidades = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = 'Venta Diaria por Modelo'
+        verbose_name_plural = 'Ventas Diarias por Modelo'
+        ordering = ['-fecha']
+        unique_together = ['modelo_moto', 'fecha']
+        indexes = [
+            models.Index(fields=['fecha', 'modelo_moto']),
+        ]
+    
+    def __str__(self):
+        return f"{self.modelo_moto_id} - {self.fecha}: {self.unidades} unidades"
+    
+    @classmethod
+    def acumular(cls, modelo_moto_id, fecha_venta, unidades, ingresos):
+        """Suma (o resta, con valores negativos) unidades e ingresos al día de la venta"""
+        if not modelo_moto_id:
+            return
+        fecha = timezone.localdate(fecha_venta) if timezone.is_aware(fecha_venta) else fecha_venta.date()
+        
+        actualizados = cls.objects.filter(modelo_moto_id=modelo_moto_id, fecha=fecha).update(
+            unidades=models.F('unidades') + unidades,
+            ingresos=models.F('ingresos') + ingresos
+        )
+        if actualizados:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(modelo_moto_id=modelo_moto_id, fecha=fecha, unidades=unidades, ingresos=ingresos)
+        except IntegrityError:
+            # Otra transacción creó la fila del día al mismo tiempo
+            cls.objects.filter(modelo_moto_id=modelo_moto_id, fecha=fecha).update(
+                unidades=models.F('unidades') + unidades,
+                ingresos=models.F('ingresos') + ingresos
+            )
+    
+    @classmethod
+    def acumular_venta(cls, venta, signo=1, fecha_venta=None):
+        """
+        Suma (signo=1) o descuenta (signo=-1) todos los detalles de una venta
+        en el día de fecha_venta (por defecto, el de la venta)
+        """
+        fecha_venta = fecha_venta or venta.fecha_venta
+        for detalle in venta.detalles.all():
+            cls.acumular(detalle.modelo_moto_id, fecha_venta, signo * detalle.cantidad, signo * detalle.subtotal)
+    
+    @classmethod
+    def reconstruir(cls):
+        """Reconstruye la tabla completa desde VentaDetalle con una consulta agrupada"""
+        from django.db.models import Sum
+        from django.db.models.functions import TruncDate
+        
+        filas = VentaDetalle.objects.exclude(venta__estado='cancelada').filter(
+            modelo_moto__isnull=False
+        ).annotate(
+            fecha=TruncDate('venta__fecha_venta')
+        ).values('modelo_moto_id', 'fecha').annotate(
+            total_unidades=Sum('cantidad'),
+            total_ingresos=Sum('subtotal')
+        ).order_by()
+        
+        with transaction.atomic():
+            cls.objects.all().delete()
+            registros = cls.objects.bulk_create(
+                [
+                    cls(
+                        modelo_moto_id=fila['modelo_moto_id'],
+                        fecha=fila['fecha'],
+                        unidades=fila['total_unidades'] or 0,
+                        ingresos=fila['total_ingresos'] or 0
+                    )
+                    for fila in filas
+                ],
+                batch_size=1000
+            )
+        return len(registros)
@@ -1,6 +1,12 @@
+import copy
+
 from rest_framework import serializers
+from django.db import transaction
+from django.db.models import Prefetch
 from .models import Venta, VentaDetalle
-from usuarios.serializers import ClienteSerializer, UsuarioSerializer
+from usuarios.serializers import (
+    ClienteSerializer, ClienteResumenSerializer, UsuarioSerializer, UsuarioResumenSerializer
+)
 
 class VentaDetalleSerializer(serializers.ModelSerializer):
     producto_info = serializers.SerializerMethodField()
@@ -33,7 +39,6 @@ class VentaSerializer(serializers.ModelSerializer):
     usuario_info = UsuarioSerializer(source='usuario', read_only=True)
     usuario_cancelacion_info = UsuarioSerializer(source='usuario_cancelacion', read_only=True)
     detalles = VentaDetalleSerializer(many=True, read_only=True)
-    saldo_pendiente = serializers.ReadOnlyField()
     tipo_venta_display = serializers.CharField(source='get_tipo_venta_display', read_only=True)
     estado_display = serializers.CharField(source='get_estado_display', read_only=True)
     motivo_cancelacion_display = serializers.CharField(source='get_motivo_cancelacion_display', read_only=True)
@@ -47,7 +52,9 @@ class VentaSerializer(serializers.ModelSerializer):
                  'monto_total_con_intereses', 'estado', 'estado_display',
                  'motivo_cancelacion', 'motivo_cancelacion_display', 'descripcion_cancelacion',
                  'fecha_cancelacion', 'usuario_cancelacion', 'usuario_cancelacion_info',
-                 'detalles', 'saldo_pendiente', 'documentos_generados']
+                 'detalles', 'total_pagado', 'saldo_pendiente', 'documentos_generados']
+        # Columnas que leen los campos calculados (?fields= poda el queryset con .only())
+        dependencias_campos = {'documentos_generados': ['tipo_venta', 'fecha_venta']}
     
     def get_documentos_generados(self, obj):
         """Obtener lista de documentos que se generarían/han generado para esta venta"""
@@ -82,6 +89,90 @@ class VentaSerializer(serializers.ModelSerializer):
         
         return documentos_base
 
+    @classmethod
+    def preparar_queryset(cls, queryset):
+        """Carga en bloque todo lo que anida la representación completa"""
+        return queryset.select_related(
+            'cliente__fiador', 'usuario__rol', 'usuario_cancelacion__rol'
+        ).prefetch_related(
+            'cliente__documentos',
+            Prefetch('detalles', queryset=VentaDetalle.objects.select_related('moto'))
+        )
+
+class VentaListSerializer(VentaSerializer):
+    """
+    Representación compacta de una venta para listados.
+    
+    Los bloques anidados pesados se piden con ?expand=<nombre>[,<nombre>] (claves
+    de EXPANSIONES) y preparar_queryset carga solo las relaciones que usan.
+    """
+    EXPANSIONES = {
+        'cliente': {
+            'campos': ['cliente_info'],
+            'select_related': ['cliente__fiador'],
+            'prefetch_related': ['cliente__documentos'],
+        },
+        'usuarios': {
+            'campos': ['usuario_info', 'usuario_cancelacion_info'],
+            'select_related': ['usuario__rol', 'usuario_cancelacion__rol'],
+            'prefetch_related': [],
+        },
+        'detalles': {
+            'campos': ['detalles'],
+            'select_related': [],
+            'prefetch_related': [Prefetch('detalles', queryset=VentaDetalle.objects.select_related('moto'))],
+        },
+        'documentos': {
+            'campos': ['documentos_generados'],
+            'select_related': [],
+            'prefetch_related': [],
+        },
+    }
+    
+    cliente_info = ClienteResumenSerializer(source='cliente', read_only=True)
+    usuario_info = UsuarioResumenSerializer(source='usuario', read_only=True)
+    
+    class Meta(VentaSerializer.Meta):
+        fields = ['id', 'cliente', 'cliente_info', 'usuario', 'usuario_info',
+                 'fecha_venta', 'tipo_venta', 'tipo_venta_display', 'monto_total',
+                 'monto_inicial', 'cuotas', 'tasa_interes', 'pago_mensual',
+                 'monto_total_con_intereses', 'estado', 'estado_display',
+                 'motivo_cancelacion', 'motivo_cancelacion_display', 'descripcion_cancelacion',
+                 'fecha_cancelacion', 'usuario_cancelacion', 'total_pagado', 'saldo_pendiente']
+    
+    @classmethod
+    def leer_expansiones(cls, valor):
+        """
+        Convierte el parámetro ?expand= en un conjunto de expansiones válidas.
+        
+        Raises:
+            serializers.ValidationError: Si se pide una expansión desconocida
+        """
+        expansiones = {nombre.strip() for nombre in (valor or '').split(',') if nombre.strip()}
+        desconocidas = expansiones - set(cls.EXPANSIONES)
+        if desconocidas:
+            raise serializers.ValidationError({
+                'expand': f"Expansiones inválidas: {', '.join(sorted(desconocidas))}. "
+                          f"Opciones: {', '.join(cls.EXPANSIONES)}"
+            })
+        return expansiones
+    
+    @classmethod
+    def preparar_queryset(cls, queryset, expansiones=()):
+        select_related = ['cliente', 'usuario']
+        prefetch_related = []
+        for nombre in expansiones:
+            select_related.extend(cls.EXPANSIONES[nombre]['select_related'])
+            prefetch_related.extend(cls.EXPANSIONES[nombre]['prefetch_related'])
+        return queryset.select_related(*select_related).prefetch_related(*prefetch_related)
+    
+    def get_fields(self):
+        campos = super().get_fields()
+        for nombre in self.context.get('expand', ()):
+            for campo in self.EXPANSIONES[nombre]['campos']:
+                campos[campo] = copy.deepcopy(VentaSerializer._declared_fields[campo])
+        return campos
+
 class VentaDetalleCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = VentaDetalle
@@ -117,14 +208,17 @@ class VentaCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         detalles_data = validated_data.pop('detalles')
         validated_data['usuario'] = self.context['request'].user
-        venta = Venta.objects.create(**validated_data)
         
-        for detalle_data in detalles_data:
-            VentaDetalle.objects.create(venta=venta, **detalle_data)
-        
-        # Generar cuotas automáticamente si es venta financiada
-        if venta.tipo_venta == 'financiado':
-            from pagos.models import CuotaVencimiento
-            CuotaVencimiento.generar_cuotas_venta(venta)
+        # Si algún detalle se queda sin stock (StockInsuficienteError) no queda nada a medias
+        with transaction.atomic():
+            venta = Venta.objects.create(**validated_data)
+            
+            for detalle_data in detalles_data:
+                VentaDetalle.objects.create(venta=venta, **detalle_data)
+            
+            # Generar cuotas automáticamente si es venta financiada
+            if venta.tipo_venta == 'financiado':
+                from pagos.models import CuotaVencimiento
+                CuotaVencimiento.generar_cuotas_venta(venta)
             
         return venta
\ No newline at end of file
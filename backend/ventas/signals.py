@@ -0,0 +1,51 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Venta, VentaDetalle, VentaDiariaModelo
+
+
+@receiver(post_save, sender=VentaDetalle)
+def acumular_venta_diaria(sender, instance, created, **kwargs):
+    """Suma cada detalle nuevo al resumen diario de su modelo"""
+    if created and instance.venta.estado != 'cancelada':
+        VentaDiariaModelo.acumular(
+            instance.modelo_moto_id, instance.venta.fecha_venta, instance.cantidad, instance.subtotal
+        )
+
+
+@receiver(post_delete, sender=VentaDetalle)
+def descontar_detalle_eliminado(sender, instance, **kwargs):
+    """Descuenta del resumen diario los detalles eliminados de ventas no canceladas"""
+    venta = instance.venta
+    if venta.estado != 'cancelada':
+        VentaDiariaModelo.acumular(
+            instance.modelo_moto_id, venta.fecha_venta, -instance.cantidad, -instance.subtotal
+        )
+
+
+@receiver(post_save, sender=Venta)
+def actualizar_ventas_diarias_por_estado(sender, instance, created, **kwargs):
+    """
+    Descuenta las ventas canceladas del resumen diario (y las repone si se
+    reactivan), y mueve sus detalles de día si cambia fecha_venta.
+
+    Compara con los valores que la venta tenía al leerse de la base
+    (Venta.from_db), así que no hace falta consultarla antes de guardar.
+    """
+    update_fields = kwargs.get('update_fields')
+    anteriores = getattr(instance, '_valores_guardados', {})
+    actuales = {**anteriores, **{
+        campo: getattr(instance, campo) for campo in Venta.CAMPOS_SEGUIDOS
+        if update_fields is None or campo in update_fields
+    }}
+    instance._valores_guardados = actuales
+    if created or any(campo not in anteriores for campo in Venta.CAMPOS_SEGUIDOS):
+        return
+    
+    contaba = anteriores['estado'] != 'cancelada'
+    cuenta = actuales['estado'] != 'cancelada'
+    cambio_fecha = anteriores['fecha_venta'] != actuales['fecha_venta']
+    if contaba and (not cuenta or cambio_fecha):
+        VentaDiariaModelo.acumular_venta(instance, signo=-1, fecha_venta=anteriores['fecha_venta'])
+    if cuenta and (not contaba or cambio_fecha):
+        VentaDiariaModelo.acumular_venta(instance, signo=1, fecha_venta=actuales['fecha_venta'])
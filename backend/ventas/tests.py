@@ -1,3 +1,460 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from motos.models import Moto, MotoModelo, MotoInventario
+from motos.services import ReservaStockService, StockInsuficienteError
+from usuarios.models import Cliente, Rol, Usuario
+from pagos.models import Pago
+from .models import Venta, VentaDetalle
+
+
+def crear_moto(cantidad_stock, chasis='CH-1'):
+    return Moto.objects.create(
+        marca='Honda', modelo='CB190', ano=2024, chasis=chasis,
+        precio_compra=1000, precio_venta=1500, cantidad_stock=cantidad_stock
+    )
+
+
+class ReservaStockTest(TestCase):
+    """El stock se descuenta con una sola sentencia condicional y nunca queda negativo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre_rol='admin')
+        cls.usuario = Usuario.objects.create_user(username='vendedor', password='x', rol=rol)
+        cls.cliente = Cliente.objects.create(nombre='Ana', apellido='Pérez', cedula='001')
+
+    def test_reserva_y_conflicto(self):
+        moto = crear_moto(2)
+        servicio = ReservaStockService()
+
+        self.assertEqual(servicio.reservar_moto(moto, 2), 0)
+        with self.assertRaises(StockInsuficienteError) as contexto:
+            servicio.reservar_moto(moto, 1)
+        self.assertEqual(contexto.exception.disponible, 0)
+
+        moto.refresh_from_db()
+        self.assertEqual(moto.cantidad_stock, 0)
+
+    def test_reserva_usa_stock_de_la_base_no_el_de_memoria(self):
+        moto = crear_moto(1)
+        copia_obsoleta = Moto.objects.get(pk=moto.pk)
+        ReservaStockService().reservar_moto(moto, 1)
+
+        # La copia aún cree que hay 1 unidad, pero la base ya no
+        with self.assertRaises(StockInsuficienteError):
+            ReservaStockService().reservar_moto(copia_obsoleta, 1)
+
+    def test_detalle_de_venta_reserva_y_libera(self):
+        moto = crear_moto(3)
+        venta = Venta.objects.create(cliente=self.cliente, usuario=self.usuario, tipo_venta='contado', monto_total=0)
+
+        detalle = VentaDetalle.objects.create(venta=venta, moto=moto, cantidad=2, precio_unitario=1500)
+        moto.refresh_from_db()
+        self.assertEqual(moto.cantidad_stock, 1)
+
+        with self.assertRaises(StockInsuficienteError):
+            VentaDetalle.objects.create(venta=venta, moto=moto, cantidad=2, precio_unitario=1500)
+        self.assertEqual(venta.detalles.count(), 1)
+
+        detalle.delete()
+        moto.refresh_from_db()
+        self.assertEqual(moto.cantidad_stock, 3)
+
+    def test_reserva_de_inventario_actualiza_resumen(self):
+        modelo = MotoModelo.objects.create(marca='Honda', modelo='XR', ano=2024, precio_compra=1, precio_venta=2)
+        MotoInventario.objects.create(modelo=modelo, color='Rojo', cantidad_stock=1)
+
+        ReservaStockService().reservar_inventario(modelo, 1)
+        modelo.stock_resumen.refresh_from_db()
+        self.assertEqual(modelo.stock_resumen.total_unidades, 0)
+
+        with self.assertRaises(StockInsuficienteError):
+            ReservaStockService().reservar_inventario(modelo, 1)
+
+    def test_reserva_de_inventario_reparte_entre_filas(self):
+        modelo = MotoModelo.objects.create(marca='Honda', modelo='XR', ano=2024, precio_compra=1, precio_venta=2)
+        rojo_1 = MotoInventario.objects.create(modelo=modelo, color='Rojo', cantidad_stock=1)
+        rojo_2 = MotoInventario.objects.create(modelo=modelo, color='Rojo', cantidad_stock=2)
+        azul = MotoInventario.objects.create(modelo=modelo, color='Azul', cantidad_stock=5)
+
+        with self.assertRaises(StockInsuficienteError) as contexto:
+            ReservaStockService().reservar_inventario(modelo, 4, color='rojo')
+        self.assertEqual(contexto.exception.disponible, 3)
+        rojo_1.refresh_from_db()
+        self.assertEqual(rojo_1.cantidad_stock, 1)
+
+        self.assertEqual(ReservaStockService().reservar_inventario(modelo, 2, color='Rojo'), rojo_1)
+        for fila, stock in ((rojo_1, 0), (rojo_2, 1), (azul, 5)):
+            fila.refresh_from_db()
+            self.assertEqual(fila.cantidad_stock, stock)
+        modelo.stock_resumen.refresh_from_db()
+        self.assertEqual(modelo.stock_resumen.unidades_por_color, {'Rojo': 1, 'Azul': 5})
+
+    def test_api_responde_conflicto(self):
+        moto = crear_moto(1)
+        client = APIClient()
+        client.force_authenticate(self.usuario)
+        payload = {
+            'cliente_id': self.cliente.id,
+            'tipo_venta': 'contado',
+            'motorcycle': {'tipo': 'individual', 'moto_id': moto.id, 'cantidad': 2},
+            'payment': {'monto_total': 3000},
+        }
+
+        response = client.post('/api/ventas/create-from-form/', payload, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Venta.objects.exists())
+
+    def vender_modelo(self, modelo, cantidad, color=None):
+        client = APIClient()
+        client.force_authenticate(self.usuario)
+        payload = {
+            'cliente_id': self.cliente.id,
+            'tipo_venta': 'contado',
+            'motorcycle': {'tipo': 'modelo', 'modelo_id': modelo.id, 'cantidad': cantidad, 'color': color},
+            'payment': {'monto_total': 3000},
+        }
+        return client.post('/api/ventas/create-from-form/', payload, format='json')
+
+    def test_api_modelo_sin_stock_no_deja_reserva(self):
+        modelo = MotoModelo.objects.create(marca='Honda', modelo='XR', ano=2024, precio_compra=1, precio_venta=2)
+        inventario = MotoInventario.objects.create(modelo=modelo, color='Rojo', cantidad_stock=1)
+
+        response = self.vender_modelo(modelo, 2)
+        self.assertEqual(response.status_code, 409)
+        inventario.refresh_from_db()
+        self.assertEqual(inventario.cantidad_stock, 1)
+        self.assertFalse(Moto.objects.exists())
+        self.assertFalse(Venta.objects.exists())
+
+    def test_api_modelo_reserva_la_cantidad_pedida(self):
+        modelo = MotoModelo.objects.create(marca='Honda', modelo='XR', ano=2024, precio_compra=1, precio_venta=2)
+        inventario = MotoInventario.objects.create(modelo=modelo, color='Rojo', cantidad_stock=3)
+
+        response = self.vender_modelo(modelo, 2)
+        self.assertEqual(response.status_code, 201)
+        inventario.refresh_from_db()
+        self.assertEqual(inventario.cantidad_stock, 1)
+        moto = Moto.objects.get()
+        self.assertEqual(moto.cantidad_stock, 0)
+        self.assertEqual(Venta.objects.get().detalles.get().cantidad, 2)
+
+    def test_api_modelo_reserva_del_color_pedido(self):
+        modelo = MotoModelo.objects.create(marca='Honda', modelo='XR', ano=2024, precio_compra=1, precio_venta=2)
+        rojo = MotoInventario.objects.create(modelo=modelo, color='Rojo', cantidad_stock=1)
+        azul = MotoInventario.objects.create(modelo=modelo, color='Azul', cantidad_stock=1)
+
+        response = self.vender_modelo(modelo, 1, color='Azul')
+        self.assertEqual(response.status_code, 201)
+        rojo.refresh_from_db()
+        azul.refresh_from_db()
+        self.assertEqual((rojo.cantidad_stock, azul.cantidad_stock), (1, 0))
+        self.assertEqual(Moto.objects.get().color, 'Azul')
+
+
+class SaldoVentaTest(TestCase):
+    """total_pagado y saldo_pendiente se mantienen en SQL con cada pago"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre_rol='admin')
+        cls.usuario = Usuario.objects.create_user(username='cajero', password='x', rol=rol)
+        cls.cliente = Cliente.objects.create(nombre='Luis', apellido='Gómez', cedula='002')
+
+    def setUp(self):
+        self.venta = Venta.objects.create(
+            cliente=self.cliente, usuario=self.usuario, tipo_venta='contado', monto_total=1000
+        )
+
+    def pagar(self, monto):
+        return Pago.objects.create(
+            venta=self.venta, monto_pagado=monto, tipo_pago='efectivo', usuario_cobrador=self.usuario
+        )
+
+    def assertSaldo(self, pagado, saldo):
+        self.venta.refresh_from_db()
+        self.assertEqual(self.venta.total_pagado, Decimal(pagado))
+        self.assertEqual(self.venta.saldo_pendiente, Decimal(saldo))
+
+    def test_pagos_y_cancelacion(self):
+        self.assertSaldo('0', '1000')
+        pago = self.pagar(300)
+        self.pagar(200)
+        self.assertSaldo('500', '500')
+
+        pago.monto_pagado = 350
+        pago.save()
+        self.assertSaldo('550', '450')
+
+        pago.estado = 'cancelado'
+        pago.save()
+        self.assertSaldo('200', '800')
+
+        Pago.objects.get(estado='activo').delete()
+        self.assertSaldo('0', '1000')
+
+    def test_copia_desactualizada_no_pisa_el_total(self):
+        copia = Venta.objects.get(pk=self.venta.pk)
+        self.pagar(400)
+
+        copia.monto_total = 1200
+        copia.save()
+        self.assertEqual(copia.total_pagado, Decimal('400'))
+        self.assertSaldo('400', '800')
+
+    def test_update_fields_con_monto_total(self):
+        from django.db.models.signals import post_save
+
+        copia = Venta.objects.get(pk=self.venta.pk)
+        self.pagar(400)
+        vistos = []
+
+        def receptor(sender, instance, **kwargs):
+            vistos.append((instance.total_pagado, instance.saldo_pendiente))
+
+        post_save.connect(receptor, sender=Venta)
+        self.addCleanup(post_save.disconnect, receptor, sender=Venta)
+        copia.monto_total = 1500
+        copia.save(update_fields=['monto_total'])
+
+        # Los receptores ya ven el saldo calculado, no una expresión
+        self.assertEqual(vistos, [(Decimal('400'), Decimal('1100'))])
+        self.assertSaldo('400', '1100')
+
+        # Sin monto_total en update_fields el saldo no se toca
+        copia.cuotas = 3
+        copia.save(update_fields=['cuotas'])
+        self.assertSaldo('400', '1100')
+
+    def test_reconciliacion(self):
+        self.pagar(250)
+        Venta.objects.filter(pk=self.venta.pk).update(total_pagado=0, saldo_pendiente=1000)
+
+        diferencias = Venta.reconciliar_saldos(corregir=False)
+        self.assertEqual([fila['id'] for fila in diferencias], [self.venta.pk])
+        self.assertEqual(diferencias[0]['pagado_real'], Decimal('250'))
+        self.assertSaldo('0', '1000')
+
+        salida = StringIO()
+        call_command('reconciliar_saldos_ventas', stdout=salida)
+        self.assertIn('1 ventas corregidas', salida.getvalue())
+        self.assertSaldo('250', '750')
+        self.assertEqual(Venta.reconciliar_saldos(), [])
+
+
+class VentaListadoTest(TestCase):
+    """El listado es compacto y su costo en consultas no depende de la cantidad de ventas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre_rol='admin')
+        cls.usuario = Usuario.objects.create_user(username='gerente', password='x', rol=rol)
+        cls.moto = crear_moto(100, chasis='CH-LISTA')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def crear_ventas(self, cantidad):
+        inicio = Cliente.objects.count()
+        for numero in range(inicio, inicio + cantidad):
+            cliente = Cliente.objects.create(nombre='Cliente', apellido=str(numero), cedula=f'L-{numero}')
+            venta = Venta.objects.create(cliente=cliente, usuario=self.usuario, tipo_venta='contado', monto_total=1500)
+            VentaDetalle.objects.create(venta=venta, moto=self.moto, cantidad=1, precio_unitario=1500)
+
+    def consultas_listado(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(consultas), response.data['results']
+
+    def test_listado_compacto_y_expansiones(self):
+        self.crear_ventas(2)
+        pocas, _ = self.consultas_listado('/api/ventas/')
+        pocas_expandidas, _ = self.consultas_listado('/api/ventas/?expand=cliente,usuarios,detalles,documentos')
+
+        self.crear_ventas(8)
+        muchas, resultados = self.consultas_listado('/api/ventas/')
+        muchas_expandidas, expandidos = self.consultas_listado('/api/ventas/?expand=cliente,usuarios,detalles,documentos')
+
+        self.assertEqual(pocas, muchas)
+        self.assertEqual(pocas_expandidas, muchas_expandidas)
+        self.assertNotIn('detalles', resultados[0])
+        self.assertNotIn('documentos', resultados[0]['cliente_info'])
+        self.assertEqual(resultados[0]['saldo_pendiente'], '1500.00')
+        self.assertEqual(expandidos[0]['detalles'][0]['producto_info']['chasis'], 'CH-LISTA')
+        self.assertIn('documentos', expandidos[0]['cliente_info'])
+        self.assertIn('rol_info', expandidos[0]['usuario_info'])
+
+    def test_campos_parciales(self):
+        self.crear_ventas(2)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get('/api/ventas/?fields=id,cliente_info,saldo_pendiente')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'cliente_info', 'saldo_pendiente'})
+        pagina = consultas[-1]['sql']
+        self.assertIn('usuarios_cliente', pagina)
+        self.assertNotIn('usuarios_usuario', pagina)
+        self.assertNotIn('monto_inicial', pagina)
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get('/api/ventas/?expand=detalles,documentos&omit=detalles,cliente_info,usuario_info')
+        self.assertIn('documentos_generados', response.data['results'][0])
+        self.assertEqual(len(consultas), 2)
+        self.assertNotIn('JOIN', consultas[-1]['sql'])
+
+        response = self.client.get('/api/ventas/?fields=detalles')
+        self.assertEqual(response.status_code, 400)
+
+    def test_expansion_invalida(self):
+        response = self.client.get('/api/ventas/?expand=pagos')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('expand', response.data)
+
+    def test_detalle_completo(self):
+        self.crear_ventas(1)
+        venta = Venta.objects.get()
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/ventas/{venta.id}/')
+        self.assertEqual(len(response.data['detalles']), 1)
+        self.assertEqual(response.data['cliente_info']['documentos'], [])
+
+
+class VentaDiariaTest(TestCase):
+    """El resumen diario por modelo sigue a los detalles, las cancelaciones y la fecha de la venta"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre_rol='admin')
+        cls.usuario = Usuario.objects.create_user(username='diario', password='x', rol=rol)
+        cls.cliente = Cliente.objects.create(nombre='Eva', apellido='Ruiz', cedula='004')
+        cls.modelo = MotoModelo.objects.create(
+            marca='Honda', modelo='CB190', ano=2024, precio_compra=1000, precio_venta=1500
+        )
+
+    def vender(self, cantidad=2):
+        moto = Moto.objects.create(
+            marca='Honda', modelo='CB190', ano=2024, chasis=f'CH-D{Moto.objects.count()}',
+            precio_compra=1000, precio_venta=1500, cantidad_stock=5, modelo_moto=self.modelo
+        )
+        venta = Venta.objects.create(cliente=self.cliente, usuario=self.usuario, tipo_venta='contado', monto_total=0)
+        detalle = VentaDetalle.objects.create(venta=venta, moto=moto, cantidad=cantidad, precio_unitario=1500)
+        return venta, detalle
+
+    def resumen(self):
+        from .models import VentaDiariaModelo
+
+        return {
+            (fila.fecha, fila.unidades, fila.ingresos)
+            for fila in VentaDiariaModelo.objects.filter(modelo_moto=self.modelo).exclude(unidades=0)
+        }
+
+    def test_detalles_y_cancelacion(self):
+        hoy = timezone.localdate()
+        venta, detalle = self.vender(2)
+        self.vender(1)
+        self.assertEqual(self.resumen(), {(hoy, 3, Decimal('4500'))})
+
+        venta.estado = 'cancelada'
+        venta.save()
+        self.assertEqual(self.resumen(), {(hoy, 1, Decimal('1500'))})
+
+        # Guardar de nuevo sin cambiar el estado no vuelve a descontar
+        venta.save()
+        self.assertEqual(self.resumen(), {(hoy, 1, Decimal('1500'))})
+
+        venta.estado = 'activa'
+        venta.save()
+        self.assertEqual(self.resumen(), {(hoy, 3, Decimal('4500'))})
+
+        detalle.delete()
+        self.assertEqual(self.resumen(), {(hoy, 1, Decimal('1500'))})
+
+    def test_cambio_de_fecha_mueve_el_resumen(self):
+        venta, _ = self.vender(2)
+        venta = Venta.objects.get(pk=venta.pk)
+        venta.fecha_venta = venta.fecha_venta - timedelta(days=3)
+
+        # El estado anterior sale de la carga de la venta, sin otra consulta antes de guardar
+        with CaptureQueriesContext(connection) as consultas:
+            venta.save()
+        self.assertEqual(sum('FROM "ventas_venta"' in consulta['sql'] for consulta in consultas), 1)
+        self.assertEqual(self.resumen(), {(timezone.localdate(venta.fecha_venta), 2, Decimal('3000'))})
+
+        # Una venta cancelada no cuenta en ningún día
+        venta.estado = 'cancelada'
+        venta.fecha_venta = venta.fecha_venta + timedelta(days=1)
+        venta.save()
+        self.assertEqual(self.resumen(), set())
+
+    def test_migracion_copia_el_modelo_de_la_moto(self):
+        import importlib
+        from unittest import mock
+
+        from django.apps import apps
+
+        migracion = importlib.import_module('ventas.migrations.0006_ventadetalle_modelo_moto')
+        detalles = [self.vender(1)[1] for _ in range(3)]
+        self.assertEqual(detalles[0].modelo_moto, self.modelo)
+        VentaDetalle.objects.update(modelo_moto=None)
+
+        with mock.patch.object(migracion, 'TAMANO_LOTE', 2):
+            migracion.copiar_modelo_desde_moto(apps, None)
+        self.assertEqual(VentaDetalle.objects.filter(modelo_moto=self.modelo).count(), 3)
+
+    def test_reconstruir_coincide_con_lo_incremental(self):
+        from .models import VentaDiariaModelo
+
+        venta, _ = self.vender(2)
+        self.vender(1)
+        venta.estado = 'cancelada'
+        venta.save()
+        incremental = self.resumen()
+
+        VentaDiariaModelo.objects.all().delete()
+        call_command('reconstruir_ventas_diarias', stdout=StringIO())
+        self.assertEqual(self.resumen(), incremental)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ReservaStockConcurrenteTest(TransactionTestCase):
+    """Ventas en paralelo no sobrevenden (solo en motores con bloqueo de filas, p. ej. PostgreSQL)"""
+
+    def test_sin_sobreventa(self):
+        stock_inicial, hilos, intentos = 20, 8, 10
+        moto = crear_moto(stock_inicial, chasis='CH-PARALELO')
+        reservadas = []
+        candado = threading.Lock()
+
+        def vender():
+            exitosas = 0
+            try:
+                for _ in range(intentos):
+                    try:
+                        ReservaStockService().reservar_moto(Moto(pk=moto.pk), 1)
+                        exitosas += 1
+                    except StockInsuficienteError:
+                        pass
+            finally:
+                connections.close_all()
+            with candado:
+                reservadas.append(exitosas)
+
+        trabajadores = [threading.Thread(target=vender) for _ in range(hilos)]
+        for trabajador in trabajadores:
+            trabajador.start()
+        for trabajador in trabajadores:
+            trabajador.join()
+
+        moto.refresh_from_db()
+        self.assertEqual(sum(reservadas), stock_inicial)
+        self.assertEqual(moto.cantidad_stock, 0)
@@ -7,19 +7,39 @@ from django.template.loader import get_template
 from django.utils import timezone
 from datetime import datetime
 from django.db import transaction
+from concesionario_app.campos_parciales import CamposParcialesMixin
 from .models import Venta, VentaDetalle
-from .serializers import VentaSerializer, VentaCreateSerializer, VentaDetalleSerializer
+from .serializers import VentaSerializer, VentaListSerializer, VentaCreateSerializer, VentaDetalleSerializer
 from usuarios.models import Cliente
 from motos.models import Moto, MotoModelo, MotoInventario
-from pagos.models import Pago
+from motos.services import ReservaStockService, StockInsuficienteError
+from pagos.models import CuotaVencimiento, Pago
 
-class VentaListCreateView(generics.ListCreateAPIView):
+class VentaListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     queryset = Venta.objects.all()
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return VentaCreateSerializer
-        return VentaSerializer
+        return VentaListSerializer
+    
+    def get_expansiones(self):
+        """Bloques anidados pedidos con ?expand= (ver VentaListSerializer.EXPANSIONES)"""
+        if not hasattr(self, '_expansiones'):
+            self._expansiones = VentaListSerializer.leer_expansiones(self.request.query_params.get('expand'))
+        return self._expansiones
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.method == 'GET':
+            context['expand'] = self.get_expansiones()
+        return context
+    
+    def create(self, request, *args, **kwargs):
+        try:
+            return super().create(request, *args, **kwargs)
+        except StockInsuficienteError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
     
     def get_queryset(self):
         queryset = Venta.objects.all()
@@ -33,12 +53,19 @@ class VentaListCreateView(generics.ListCreateAPIView):
             queryset = queryset.filter(estado=estado)
         if tipo_venta is not None:
             queryset = queryset.filter(tipo_venta=tipo_venta)
-            
+        
+        if self.request.method == 'GET':
+            queryset = VentaListSerializer.preparar_queryset(queryset, self.get_expansiones())
         return queryset
 
 class VentaDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Venta.objects.all()
     
+    def get_queryset(self):
+        if self.request.method == 'GET':
+            return VentaSerializer.preparar_queryset(Venta.objects.all())
+        return Venta.objects.all()
+    
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
             return VentaCreateSerializer
@@ -68,7 +95,7 @@ class VentaDetailView(generics.RetrieveUpdateDestroyAPIView):
         
         return super().partial_update(request, *args, **kwargs)
 
-class VentaDetalleListCreateView(generics.ListCreateAPIView):
+class VentaDetalleListCreateView(CamposParcialesMixin, generics.ListCreateAPIView):
     queryset = VentaDetalle.objects.all()
     serializer_class = VentaDetalleSerializer
     
@@ -83,11 +110,11 @@ class VentaDetalleDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = VentaDetalle.objects.all()
     serializer_class = VentaDetalleSerializer
 
-class VentaActivaListView(generics.ListAPIView):
+class VentaActivaListView(CamposParcialesMixin, generics.ListAPIView):
     serializer_class = VentaSerializer
     
     def get_queryset(self):
-        return Venta.objects.filter(estado='activa')
+        return VentaSerializer.preparar_queryset(Venta.objects.filter(estado='activa'))
 
 class CalcularVentaView(APIView):
     permission_classes = [IsAuthenticated]
@@ -206,16 +233,16 @@ class ClienteVentasView(APIView):
     def get(self, request, cliente_id):
         try:
             # Obtener ventas activas
-            ventas_activas = Venta.objects.filter(
+            ventas_activas = VentaSerializer.preparar_queryset(Venta.objects.filter(
                 cliente_id=cliente_id, 
                 estado='activa'
-            ).order_by('-fecha_venta')
+            )).order_by('-fecha_venta')
             
             # Obtener ventas finalizadas/canceladas
-            ventas_finalizadas = Venta.objects.filter(
+            ventas_finalizadas = VentaSerializer.preparar_queryset(Venta.objects.filter(
                 cliente_id=cliente_id, 
                 estado__in=['finalizada', 'cancelada']
-            ).order_by('-fecha_venta')
+            )).order_by('-fecha_venta')
             
             # Serializar los datos
             activas_data = VentaSerializer(ventas_activas, many=True).data
@@ -244,39 +271,41 @@ class CancelarVentaView(APIView):
         Cancela una venta específica y devuelve el stock de motocicletas al inventario
         """
         try:
-            venta = Venta.objects.get(pk=pk)
-            
-            # Verificar que la venta no esté ya cancelada
-            if venta.estado == 'cancelada':
-                return Response({'error': 'Esta venta ya está cancelada'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Obtener datos de la cancelación
-            motivo = request.data.get('motivo', 'otros')
-            descripcion = request.data.get('descripcion', '')
-            
-            # Devolver stock de motocicletas al inventario
-            stock_devuelto = []
-            for detalle in venta.detalles.all():
-                moto = detalle.moto
-                cantidad_devuelta = detalle.cantidad
+            with transaction.atomic():
+                # Bloquear la venta para que dos cancelaciones simultáneas no devuelvan el stock dos veces
+                venta = Venta.objects.select_for_update().get(pk=pk)
                 
-                # Aumentar el stock de la moto
-                moto.cantidad_stock += cantidad_devuelta
-                moto.save()
+                # Verificar que la venta no esté ya cancelada
+                if venta.estado == 'cancelada':
+                    return Response({'error': 'Esta venta ya está cancelada'}, status=status.HTTP_400_BAD_REQUEST)
                 
-                stock_devuelto.append({
-                    'moto': f"{moto.marca} {moto.modelo}",
-                    'cantidad': cantidad_devuelta,
-                    'nuevo_stock': moto.cantidad_stock
-                })
-            
-            # Marcar la venta como cancelada
-            venta.estado = 'cancelada'
-            venta.motivo_cancelacion = motivo
-            venta.descripcion_cancelacion = descripcion
-            venta.fecha_cancelacion = timezone.now()
-            venta.usuario_cancelacion = request.user
-            venta.save()
+                # Obtener datos de la cancelación
+                motivo = request.data.get('motivo', 'otros')
+                descripcion = request.data.get('descripcion', '')
+                
+                # Devolver stock de motocicletas al inventario
+                stock_devuelto = []
+                reserva = ReservaStockService()
+                for detalle in venta.detalles.select_related('moto'):
+                    moto = detalle.moto
+                    cantidad_devuelta = detalle.cantidad
+                    
+                    # Aumentar el stock de la moto
+                    reserva.liberar_moto(moto, cantidad_devuelta)
+                    
+                    stock_devuelto.append({
+                        'moto': f"{moto.marca} {moto.modelo}",
+                        'cantidad': cantidad_devuelta,
+                        'nuevo_stock': moto.cantidad_stock
+                    })
+                
+                # Marcar la venta como cancelada
+                venta.estado = 'cancelada'
+                venta.motivo_cancelacion = motivo
+                venta.descripcion_cancelacion = descripcion
+                venta.fecha_cancelacion = timezone.now()
+                venta.usuario_cancelacion = request.user
+                venta.save()
             
             # Registrar la cancelación en auditoría
             from pagos.models import Auditoria
@@ -362,6 +391,7 @@ class CreateVentaFromFormView(APIView):
                 
                 # Procesar datos de motocicleta
                 motorcycle_tipo = motorcycle_data.get('tipo')
+                cantidad_requerida = motorcycle_data.get('cantidad', 1)
                 moto_obj = None
                 
                 if motorcycle_tipo == 'individual':
@@ -402,12 +432,9 @@ class CreateVentaFromFormView(APIView):
                         )
                     
                     # Buscar una moto disponible del modelo y color especificado
-                    # El modelo Moto no tiene relación directa con MotoModelo, usar campos de texto
                     moto_query = Moto.objects.filter(
-                        marca=modelo.marca,
-                        modelo=modelo.modelo,
-                        ano=modelo.ano,
-                        cantidad_stock__gt=0
+                        modelo_moto=modelo,
+                        cantidad_stock__gte=cantidad_requerida
                     )
                     
                     if color:
@@ -421,15 +448,16 @@ class CreateVentaFromFormView(APIView):
                     if not moto_obj:
                         # Si no hay moto disponible, crear una nueva del inventario
                         try:
-                            inventario_item = MotoInventario.objects.filter(
-                                modelo=modelo,
-                                cantidad_stock__gt=0
-                            ).first()
-                            
-                            if not inventario_item:
+                            # Reservar primero la cantidad pedida: el descuento condicional evita
+                            # vender dos veces la misma unidad y no escribe nada si no alcanza
+                            try:
+                                inventario_item = ReservaStockService().reservar_inventario(
+                                    modelo, cantidad_requerida, color=color
+                                )
+                            except StockInsuficienteError:
                                 return Response(
                                     {'error': f'No hay stock disponible para el modelo {modelo.marca} {modelo.modelo}'},
-                                    status=status.HTTP_400_BAD_REQUEST
+                                    status=status.HTTP_409_CONFLICT
                                 )
                             
                             # Crear nueva moto desde inventario
@@ -437,11 +465,12 @@ class CreateVentaFromFormView(APIView):
                                 marca=modelo.marca,
                                 modelo=modelo.modelo,
                                 ano=modelo.ano,
+                                modelo_moto=modelo,
                                 chasis=chasis or f"{modelo.modelo}_{timezone.now().strftime('%Y%m%d_%H%M%S')}",
                                 color=color or inventario_item.color,
                                 precio_compra=inventario_item.precio_compra_individual or modelo.precio_compra,
                                 precio_venta=inventario_item.precio_con_descuento,
-                                cantidad_stock=1,
+                                cantidad_stock=cantidad_requerida,
                                 condicion=modelo.condicion,
                                 proveedor=modelo.proveedor,
                                 # Copiar especificaciones técnicas del modelo
@@ -456,12 +485,10 @@ class CreateVentaFromFormView(APIView):
                                 descripcion=modelo.descripcion
                             )
                             
-                            # Reducir stock del inventario
-                            inventario_item.cantidad_stock -= 1
-                            inventario_item.save()
-                            
                         except Exception as e:
                             print(f"Error creando moto desde inventario: {str(e)}")
+                            # No dejar confirmada la reserva del inventario
+                            transaction.set_rollback(True)
                             return Response(
                                 {'error': f'Error creando motocicleta desde inventario: {str(e)}'},
                                 status=status.HTTP_400_BAD_REQUEST
@@ -472,12 +499,10 @@ class CreateVentaFromFormView(APIView):
                         status=status.HTTP_400_BAD_REQUEST
                     )
                 
-                # Validar stock disponible
-                cantidad_requerida = motorcycle_data.get('cantidad', 1)
+                # Validar stock disponible; la excepción revierte lo ya escrito en la transacción
                 if moto_obj.cantidad_stock < cantidad_requerida:
-                    return Response(
-                        {'error': f'Stock insuficiente. Disponible: {moto_obj.cantidad_stock}, solicitado: {cantidad_requerida}'},
-                        status=status.HTTP_400_BAD_REQUEST
+                    raise StockInsuficienteError(
+                        f'{moto_obj.marca} {moto_obj.modelo}', moto_obj.cantidad_stock, cantidad_requerida
                     )
                 
                 # Crear la venta
@@ -522,7 +547,7 @@ class CreateVentaFromFormView(APIView):
                 
                 # Crear cuotas de vencimiento si es financiado
                 if tipo_venta == 'financiado' and venta.cuotas > 1:
-                    self._crear_cuotas_vencimiento(venta)
+                    CuotaVencimiento.generar_cuotas_venta(venta)
                 
                 # Crear pago inicial si hay monto inicial > 0
                 pago_inicial = None
@@ -559,6 +584,8 @@ class CreateVentaFromFormView(APIView):
                 print(f"Venta creada exitosamente: {venta.id}")
                 return Response(response_data, status=status.HTTP_201_CREATED)
                 
+        except StockInsuficienteError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
         except Exception as e:
             print(f"Error en CreateVentaFromFormView: {str(e)}")
             import traceback
@@ -567,28 +594,3 @@ class CreateVentaFromFormView(APIView):
                 {'error': f'Error interno del servidor: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-    
-    def _crear_cuotas_vencimiento(self, venta):
-        """
-        Crea las cuotas de vencimiento para ventas financiadas
-        """
-        try:
-            from pagos.models import CuotaVencimiento
-            from dateutil.relativedelta import relativedelta
-            
-            fecha_primera_cuota = timezone.now().date() + relativedelta(months=1)
-            
-            for numero_cuota in range(1, venta.cuotas + 1):
-                fecha_vencimiento = fecha_primera_cuota + relativedelta(months=numero_cuota-1)
-                
-                CuotaVencimiento.objects.create(
-                    venta=venta,
-                    numero_cuota=numero_cuota,
-                    monto_cuota=venta.pago_mensual,
-                    fecha_vencimiento=fecha_vencimiento,
-                    estado='pendiente'
-                )
-                
-        except Exception as e:
-            print(f"Error creando cuotas de vencimiento: {e}")
-            # No fallar la venta por esto, solo registrar el error
@@ -1,4 +1,4 @@
-import React, { useState, useRef, useCallback } from 'react';
+import React, { useState, useRef, useCallback, useEffect } from 'react';
 import {
   Download,
   Upload,
@@ -19,6 +19,10 @@ interface ImportExportManagerProps {
   defaultType?: 'inventory' | 'clientes' | 'proveedores' | 'ventas' | 'pagos' | 'documentos' | 'locations';
 }
 
+// Consulta del estado de una importación en segundo plano
+const IMPORT_POLL_INTERVAL_MS = 2000;
+const IMPORT_POLL_MAX_ATTEMPTS = 150; // 5 minutos
+
 interface ImportPreview {
   total_rows: number;
   preview_rows: number;
@@ -39,6 +43,14 @@ const ImportExportManager: React.FC<ImportExportManagerProps> = ({ onClose, defa
   const [processResult, setProcessResult] = useState<any>(null);
   const [showPreview, setShowPreview] = useState(false);
   const fileInputRef = useRef<HTMLInputElement>(null);
+  const mountedRef = useRef(true);
+
+  useEffect(() => {
+    mountedRef.current = true;
+    return () => {
+      mountedRef.current = false;
+    };
+  }, []);
 
   const handleExport = useCallback(async () => {
     setIsProcessing(true);
@@ -221,6 +233,32 @@ const ImportExportManager: React.FC<ImportExportManagerProps> = ({ onClose, defa
     }
   }, [selectedFile, importType]);
 
+  // Devuelve null si el componente se desmontó mientras se esperaba
+  const waitForImportJob = async (statusUrl: string) => {
+    for (let attempt = 0; attempt < IMPORT_POLL_MAX_ATTEMPTS; attempt++) {
+      await new Promise(resolve => setTimeout(resolve, IMPORT_POLL_INTERVAL_MS));
+      if (!mountedRef.current) {
+        return null;
+      }
+      const response = await fetch(statusUrl, {
+        headers: {
+          'Authorization': `Bearer ${localStorage.getItem('access_token')}`
+        }
+      });
+      const job = await response.json();
+      if (!response.ok) {
+        return { success: false, message: job.error || 'Error consultando la importación' };
+      }
+      if (job.estado === 'completado' || job.estado === 'fallido') {
+        return job.resultado;
+      }
+    }
+    return {
+      success: true,
+      message: 'La importación sigue en proceso. Revise el inventario en unos minutos para ver el resultado.'
+    };
+  };
+
   const handleExecuteImport = useCallback(async () => {
     if (!selectedFile) return;
 
@@ -239,7 +277,17 @@ const ImportExportManager: React.FC<ImportExportManagerProps> = ({ onClose, defa
       });
 
       if (response.ok) {
-        const result = await response.json();
+        let result = await response.json();
+        if (response.status === 202 && result.status_url) {
+          // Procesada en segundo plano: consultar el estado hasta que termine
+          result = await waitForImportJob(result.status_url);
+          if (result === null) {
+            return;
+          }
+        } else if (result.job_id) {
+          // Sin worker el servidor la procesa en la petición y devuelve el estado final
+          result = result.resultado;
+        }
         setProcessResult(result);
         setImportPreview(null);
         setSelectedFile(null);
@@ -260,7 +308,9 @@ const ImportExportManager: React.FC<ImportExportManagerProps> = ({ onClose, defa
         message: 'Error durante la importación'
       });
     } finally {
-      setIsProcessing(false);
+      if (mountedRef.current) {
+        setIsProcessing(false);
+      }
     }
   }, [selectedFile, importType]);
 
@@ -37,7 +37,9 @@ interface VentaCalculation {
 }
 
 export const ventaService = {
-  async getVentas(page = 1, search = '', estado?: string): Promise<VentaListResponse> {
+  // El listado es compacto: los bloques anidados se piden con `expand`
+  // (cliente, usuarios, detalles, documentos)
+  async getVentas(page = 1, search = '', estado?: string, expand = 'detalles,documentos'): Promise<VentaListResponse> {
     const params = new URLSearchParams();
     params.append('page', page.toString());
     if (search) {
@@ -46,6 +48,9 @@ export const ventaService = {
     if (estado) {
       params.append('estado', estado);
     }
+    if (expand) {
+      params.append('expand', expand);
+    }
     
     const response = await api.get(`/ventas/?${params.toString()}`);
     return response.data as VentaListResponse;
@@ -77,7 +82,7 @@ export const ventaService = {
   },
 
   async getVentasByCliente(clienteId: number): Promise<Venta[]> {
-    const response = await api.get(`/ventas/?cliente=${clienteId}`);
+    const response = await api.get(`/ventas/?cliente=${clienteId}&expand=detalles`);
     const data = response.data as VentaListResponse;
     return data.results;
   },